@@ -1,17 +1,28 @@
 import logging.config
 
+import settings
 from scheduler import Scheduler
+from scheduler.history import SQLiteRunHistory
+from scheduler.metrics import MetricsRegistry
+from scheduler.pool import ResourcePool
 
 from jobs.meat_recipes import job as meat_recipes
+from jobs.spark import spark_session
 
 
 logging.config.fileConfig('logging.conf')
 
-sched = Scheduler()
+sched = Scheduler(pool=ResourcePool(spark=settings.SPARK_SLOTS, network=settings.NETWORK_SLOTS),
+                  history=SQLiteRunHistory(settings.HISTORY_DB))
+metrics = MetricsRegistry()
+sched.hooks.append(metrics)
 
 
 sched.register(meat_recipes)
+sched.add_resource(spark_session)
 
 
 if __name__ == "__main__":
+    if settings.METRICS_PORT:
+        metrics.serve(settings.METRICS_PORT)
     sched.run()
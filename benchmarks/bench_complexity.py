@@ -0,0 +1,52 @@
+"""
+Compares the Python UDF and the native Spark version of recipe complexity.
+
+Usage:
+    python -m benchmarks.bench_complexity [rows]
+"""
+import random
+import sys
+import time
+
+from pyspark.sql import SparkSession
+from pyspark.sql.functions import col
+
+from jobs.complexity import complexity, complexity_column
+
+
+def random_duration(rnd):
+    hours = rnd.choice(["", f"{rnd.randint(1, 3)}H"])
+    minutes = rnd.choice(["", f"{rnd.randint(0, 59)}M"])
+    return rnd.choice(["", "PT", f"PT{hours}{minutes}", f"PT{rnd.randint(1, 90)}M"])
+
+
+def recipes(spark, rows, seed=0):
+    rnd = random.Random(seed)
+    data = [(random_duration(rnd), random_duration(rnd)) for _ in range(rows)]
+    return spark.createDataFrame(data, ["prepTime", "cookTime"]).cache()
+
+
+def measure(df, column):
+    started = time.perf_counter()
+    df.withColumn("complexity", column).groupBy("complexity").count().collect()
+    return time.perf_counter() - started
+
+
+def main(rows=1000000):
+    spark = SparkSession.builder.master("local[*]").appName(__name__).getOrCreate()
+    df = recipes(spark, rows)
+    df.count()
+
+    udf_column = complexity("prepTime", "cookTime")
+    native_column = complexity_column(col("prepTime"), col("cookTime"))
+    mismatches = df.filter(~udf_column.eqNullSafe(native_column)).count()
+
+    udf_time = measure(df, udf_column)
+    native_time = measure(df, native_column)
+    print(f"rows={rows} mismatches={mismatches}")
+    print(f"python udf: {udf_time:.3f}s")
+    print(f"native:     {native_time:.3f}s ({udf_time / native_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
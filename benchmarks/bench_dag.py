@@ -0,0 +1,80 @@
+"""
+Measures DAG construction and traversal on synthetic graphs.
+
+Usage:
+    python -m benchmarks.bench_dag [nodes]
+"""
+import random
+import sys
+
+from scheduler.dag import DAG
+
+from benchmarks.timing import measure
+
+
+def chain(nodes):
+    return [(i + 1, i) for i in range(nodes - 1)]
+
+
+def fan_out(nodes):
+    return [(i, 0) for i in range(1, nodes)]
+
+
+def diamonds(nodes):
+    """
+    Consecutive diamonds: 0 -> (1, 2) -> 3 -> (4, 5) -> 6 ...
+    """
+    edges = []
+    for top in range(0, nodes - 3, 3):
+        edges += [(top + 1, top), (top + 2, top), (top + 3, top + 1), (top + 3, top + 2)]
+    return edges
+
+
+def random_dag(nodes, degree=3, seed=0):
+    rnd = random.Random(seed)
+    return [(i, rnd.randrange(i)) for i in range(1, nodes) for _ in range(min(i, degree))]
+
+
+GRAPHS = dict(chain=chain, fan_out=fan_out, diamonds=diamonds, random=random_dag)
+
+
+def build(nodes, edges, bulk=False):
+    dag = DAG()
+    for node in range(nodes):
+        dag.add_node(node)
+    if bulk:
+        dag.add_edges(edges)
+    else:
+        for ind_node, dep_node in edges:
+            dag.add_edge(ind_node, dep_node)
+    return dag
+
+
+def run(nodes=100000, repeat=3):
+    results = dict()
+    for name, make in GRAPHS.items():
+        edges = make(nodes)
+        # edges are added in a random order to exercise reordering
+        shuffled = list(edges)
+        random.Random(1).shuffle(shuffled)
+        results[f"dag.add_edge.{name}.{nodes}"] = measure(lambda: build(nodes, shuffled), repeat=repeat)
+        results[f"dag.add_edges.{name}.{nodes}"] = measure(lambda: build(nodes, shuffled, bulk=True), repeat=repeat)
+        dag = build(nodes, edges, bulk=True)
+        results[f"dag.travers.{name}.{nodes}"] = measure(lambda: list(dag.travers()), repeat=repeat)
+        sink = max(range(nodes), key=dag.order.get)
+
+        def fresh():
+            dag._upstream.clear()
+            return dag
+
+        results[f"dag.upstream.{name}.{nodes}"] = measure(lambda d: d.upstream(sink), setup=fresh, repeat=repeat)
+    return results
+
+
+def main(nodes=100000):
+    for name, result in run(nodes).items():
+        print(f"{name}: {result['min']:.4f}s")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
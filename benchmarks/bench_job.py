@@ -0,0 +1,77 @@
+"""
+Measures `Job.run` overhead with no-op tasks and memory taken by a task.
+
+Usage:
+    python -m benchmarks.bench_job [tasks]
+"""
+import asyncio
+import sys
+import tracemalloc
+
+from concurrent.futures import ThreadPoolExecutor
+
+from scheduler import Job, Task
+from scheduler.clock import VirtualClock
+
+from benchmarks.bench_dag import GRAPHS
+from benchmarks.timing import measure
+
+
+def noop(*args):
+    pass
+
+
+async def async_noop(*args):
+    pass
+
+
+def make_job(tasks, shape="random", func=noop):
+    job = Job("bench", clock=VirtualClock())
+    task_list = [Task(func, f"task{i}", job) for i in range(tasks)]
+    job.set_upstreams((task_list[dep], task_list[ind]) for ind, dep in GRAPHS[shape](tasks))
+    return job
+
+
+def memory_per_task(tasks, shape="random"):
+    """
+    :return: bytes allocated per task by building a job, task ids included
+    """
+    tracemalloc.start()
+    try:
+        job = make_job(tasks, shape)
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del job
+    return size / tasks
+
+
+def run(tasks=10000, repeat=3):
+    results = dict()
+    results[f"job.memory_per_task.random.{tasks}"] = dict(min=memory_per_task(tasks), repeat=1, unit="B")
+    for shape in ("chain", "fan_out", "random"):
+        job = make_job(tasks, shape)
+        results[f"job.run.inline.{shape}.{tasks}"] = measure(job.run, repeat=repeat)
+    job = make_job(tasks)
+    with ThreadPoolExecutor(4) as executor:
+        results[f"job.run.threads.random.{tasks}"] = measure(lambda: job.run(executor), repeat=repeat)
+    job = make_job(tasks, func=async_noop)
+
+    def run_async():
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(job.run_async())
+        finally:
+            loop.close()
+
+    results[f"job.run_async.random.{tasks}"] = measure(run_async, repeat=repeat)
+    return results
+
+
+def main(tasks=10000):
+    for name, result in run(tasks).items():
+        print(f"{name}: {result['min']:.4f}{result.get('unit', 's')}")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
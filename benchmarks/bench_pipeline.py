@@ -0,0 +1,85 @@
+"""
+Compares the fused single-pass pipeline with the staged one converting
+recipes JSON to ORC before retrieving meat recipes.
+
+Usage:
+    python -m benchmarks.bench_pipeline [rows]
+"""
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from pyspark.sql import SparkSession
+
+from jobs.recipes import read_recipes, select_meat_recipes
+
+INGREDIENTS = ["beef", "chicken breast", "pork belly", "salmon", "tofu", "flour", "eggs", "milk",
+               "potatoes", "onion", "garlic", "bacon", "sausage", "rice", "tomatoes"]
+
+
+def random_duration(rnd):
+    return rnd.choice(["", "PT", f"PT{rnd.randint(1, 90)}M", f"PT{rnd.randint(1, 3)}H{rnd.randint(0, 59)}M"])
+
+
+def write_recipes(path, rows, seed=0):
+    rnd = random.Random(seed)
+    with open(path, "w") as f:
+        for i in range(rows):
+            recipe = {
+                "name": f"Recipe {i}",
+                "ingredients": "\n".join(f"1 cup {item}" for item in rnd.sample(INGREDIENTS, 4)),
+                "url": f"http://example.com/recipes/{i}",
+                "image": f"http://example.com/images/{i}.jpg",
+                "cookTime": random_duration(rnd),
+                "recipeYield": str(rnd.randint(1, 8)),
+                "datePublished": "2013-04-01",
+                "prepTime": random_duration(rnd),
+                "description": "Lorem ipsum " * rnd.randint(1, 20),
+            }
+            f.write(json.dumps(recipe) + "\n")
+
+
+def staged(spark, json_path, workdir):
+    orc_path = os.path.join(workdir, "recipes.orc")
+    spark.read.json(json_path).write.format("orc").save(orc_path, mode="overwrite")
+    recipes = spark.read.format("orc").load(orc_path)
+    select_meat_recipes(recipes).write.format("orc").save(os.path.join(workdir, "staged.orc"), mode="overwrite")
+
+
+def fused(spark, json_path, workdir):
+    recipes = read_recipes(spark, json_path)
+    select_meat_recipes(recipes).write.format("orc").save(os.path.join(workdir, "fused.orc"), mode="overwrite")
+
+
+def measure(pipeline, *args):
+    started = time.perf_counter()
+    pipeline(*args)
+    return time.perf_counter() - started
+
+
+def main(rows=200000):
+    spark = SparkSession.builder.master("local[*]").appName(__name__).getOrCreate()
+    workdir = tempfile.mkdtemp()
+    try:
+        json_path = os.path.join(workdir, "recipes.json")
+        write_recipes(json_path, rows)
+        # warm up the JVM so the first measured pipeline is not penalized
+        fused(spark, json_path, workdir)
+
+        staged_time = measure(staged, spark, json_path, workdir)
+        fused_time = measure(fused, spark, json_path, workdir)
+        staged_rows = spark.read.format("orc").load(os.path.join(workdir, "staged.orc")).count()
+        fused_rows = spark.read.format("orc").load(os.path.join(workdir, "fused.orc")).count()
+        print(f"rows={rows} staged output={staged_rows} fused output={fused_rows}")
+        print(f"staged: {staged_time:.3f}s")
+        print(f"fused:  {fused_time:.3f}s ({staged_time / fused_time:.1f}x)")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
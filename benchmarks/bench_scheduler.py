@@ -0,0 +1,55 @@
+"""
+Measures `Scheduler.run_pending` with many registered jobs on a virtual
+clock, so results do not depend on the time the benchmark is started.
+
+Usage:
+    python -m benchmarks.bench_scheduler [jobs]
+"""
+import sys
+
+from scheduler import Job, Scheduler, Task
+from scheduler.clock import VirtualClock
+
+from benchmarks.timing import measure
+
+START = 1577836800.0  # 2020-01-01 00:00:00 UTC
+
+
+async def noop():
+    pass
+
+
+def make_scheduler(jobs, clock):
+    scheduler = Scheduler(clock=clock)
+    for i in range(jobs):
+        job = Job(f"job{i}")
+        job.every().minute.at(second=i % 60)
+        Task(noop, "noop", job)
+        scheduler.register(job)
+    return scheduler
+
+
+def run(jobs=10000, repeat=3):
+    results = dict()
+    # the last second of a minute, fire times of all jobs in it have passed
+    clock = VirtualClock(START + 59.5)
+    scheduler = make_scheduler(jobs, clock)
+
+    def all_due():
+        clock.advance(60)
+        return scheduler
+
+    results[f"scheduler.run_pending.due.{jobs}"] = measure(lambda s: s.run_pending(), setup=all_due, repeat=repeat)
+    # fire times are already consumed, nothing is run
+    results[f"scheduler.run_pending.idle.{jobs}"] = measure(scheduler.run_pending, repeat=repeat)
+    results[f"scheduler.register.{jobs}"] = measure(lambda: make_scheduler(jobs, VirtualClock(START)), repeat=repeat)
+    return results
+
+
+def main(jobs=10000):
+    for name, result in run(jobs).items():
+        print(f"{name}: {result['min']:.4f}s")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,90 @@
+"""
+Runs scheduler benchmarks and stores results as JSON to compare commits.
+
+Usage:
+    python -m benchmarks.suite [--quick] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from benchmarks import bench_dag, bench_job, bench_scheduler
+
+SIZES = dict(full=dict(nodes=100000, tasks=10000, jobs=10000), quick=dict(nodes=10000, tasks=1000, jobs=1000))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(quick=False, repeat=3):
+    sizes = SIZES["quick" if quick else "full"]
+    results = dict()
+    results.update(bench_dag.run(sizes["nodes"], repeat))
+    results.update(bench_job.run(sizes["tasks"], repeat))
+    results.update(bench_scheduler.run(sizes["jobs"], repeat))
+    return dict(
+        commit=git_commit(),
+        created=time.time(),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        results=results,
+    )
+
+
+def compare(baseline, current, threshold):
+    """
+    Prints min times, or other measures such as bytes, of both runs.
+
+    :return: names of benchmarks slower than the baseline by more than `threshold`
+    """
+    regressions = []
+    for name, result in sorted(current["results"].items()):
+        base = baseline["results"].get(name)
+        unit = result.get("unit", "s")
+        if base is None:
+            print(f"{name}: {result['min']:.4f}{unit} (new)")
+            continue
+        ratio = result["min"] / base["min"] if base["min"] else float("inf")
+        marker = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            marker = " REGRESSION"
+        print(f"{name}: {base['min']:.4f}{unit} -> {result['min']:.4f}{unit} ({ratio:.2f}x){marker}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="run on smaller inputs")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="file to store results in")
+    parser.add_argument("--compare", help="results of a baseline run")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown, default 0.1")
+    args = parser.parse_args(argv)
+
+    current = run(args.quick, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmarks regressed against {baseline.get('commit')}")
+            return 1
+    else:
+        for name, result in sorted(current["results"].items()):
+            print(f"{name}: {result['min']:.4f}{result.get('unit', 's')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
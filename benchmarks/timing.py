@@ -0,0 +1,18 @@
+import statistics
+import time
+
+
+def measure(func, setup=None, repeat=5):
+    """
+    Calls `func` `repeat` times, with the result of `setup` if given.
+    Setup time is not measured.
+
+    :return: dict of min and median seconds
+    """
+    times = []
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        started = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - started)
+    return dict(min=min(times), median=statistics.median(times), repeat=repeat)
@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+import isodate
+from isodate.isoerror import ISO8601Error
+from pyspark.sql.functions import bround, regexp_extract, regexp_replace, udf, when
+from pyspark.sql.types import StringType
+
+_NUMBER = r"([0-9]+(?:[,.][0-9]+)?)"
+# The same format as isodate.isoduration.ISO8601_PERIOD_REGEX
+ISO8601_DURATION = (
+    rf"^([+-])?P(?!\b)(?:{_NUMBER}Y)?(?:{_NUMBER}M)?(?:{_NUMBER}W)?(?:{_NUMBER}D)?"
+    rf"(?:T(?:{_NUMBER}H)?(?:{_NUMBER}M)?(?:{_NUMBER}S)?)?$"
+)
+SIGN, YEARS, MONTHS, WEEKS, DAYS, HOURS, MINUTES, SECONDS = range(1, 9)
+EASY_LIMIT = timedelta(minutes=30)
+HARD_LIMIT = timedelta(hours=1)
+MICROSECONDS = 10 ** 6
+
+
+def parse_duration(raw_duration):
+    try:
+        duration = isodate.parse_duration(raw_duration)
+    except ISO8601Error:
+        return None
+    else:
+        return duration
+
+
+def _complexity(prep_time, cook_time):
+    prep_time = parse_duration(prep_time)
+    cook_time = parse_duration(cook_time)
+    if not all((prep_time, cook_time)):
+        return
+    total = prep_time + cook_time
+    if total < EASY_LIMIT:
+        return "easy"
+    elif total > HARD_LIMIT:
+        return "hard"
+    else:
+        return "medium"
+
+
+# Python UDF version kept as the reference for complexity_column
+complexity = udf(_complexity, StringType())
+
+
+def _component(column, group):
+    value = regexp_extract(column, ISO8601_DURATION, group)
+    return when(value == "", 0.0).otherwise(regexp_replace(value, ",", ".").cast("double"))
+
+
+def duration_microseconds(column):
+    """
+    Parses ISO 8601 durations with Spark SQL functions.
+
+    :return: column of durations in microseconds, null for unparseable,
+        zero or missing durations and durations with years or months
+        since they have no fixed length
+    """
+    seconds = (
+        _component(column, WEEKS) * 7 * 24 * 3600
+        + _component(column, DAYS) * 24 * 3600
+        + _component(column, HOURS) * 3600
+        + _component(column, MINUTES) * 60
+        + _component(column, SECONDS)
+    )
+    # timedelta rounds to microseconds half to even, as bround does
+    microseconds = bround(seconds * MICROSECONDS).cast("long")
+    sign = when(regexp_extract(column, ISO8601_DURATION, SIGN) == "-", -1).otherwise(1)
+    calendar = (_component(column, YEARS) != 0) | (_component(column, MONTHS) != 0)
+    return when(column.rlike(ISO8601_DURATION) & ~calendar & (microseconds != 0), sign * microseconds)
+
+
+def complexity_column(prep_time, cook_time):
+    """
+    Native Spark version of `_complexity`, rows are not sent to Python workers.
+    """
+    total = duration_microseconds(prep_time) + duration_microseconds(cook_time)
+    return (
+        when(total < EASY_LIMIT.total_seconds() * MICROSECONDS, "easy")
+        .when(total > HARD_LIMIT.total_seconds() * MICROSECONDS, "hard")
+        .when(total.isNotNull(), "medium")
+    )
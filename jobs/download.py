@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+
+from http import HTTPStatus
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class Downloader:
+    """
+    Streams HTTP resources to disk.
+
+    ETag and Last-Modified of the last download are kept next to the file
+    (`<path>.meta`) and sent as If-None-Match/If-Modified-Since, so an
+    unchanged resource is not downloaded again. The body is written to
+    `<path>.part` and moved to `path` when completed, an interrupted
+    transfer is resumed with a Range request. The session and its
+    connection pool are reused across downloads.
+    """
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, session=None, timeout=60):
+        self.session = session or requests.Session()
+        self.timeout = timeout
+
+    def download(self, url, path):
+        """
+        :return: True if the file was downloaded, False if it is not modified
+        """
+        part_path = f"{path}.part"
+        meta = self._read_meta(path) if os.path.exists(path) else dict()
+        part_meta = self._read_meta(part_path) if os.path.exists(part_path) else dict()
+
+        headers = dict()
+        validator = part_meta.get("etag") or part_meta.get("last_modified")
+        offset = os.path.getsize(part_path) if validator else 0
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = validator
+            headers["Accept-Encoding"] = "identity"
+        else:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as res:
+            if res.status_code == HTTPStatus.NOT_MODIFIED:
+                logger.info(f"{url} is not modified since the last download")
+                return False
+            if res.status_code == HTTPStatus.PARTIAL_CONTENT:
+                logger.info(f"Resuming download of {url} from byte {offset}")
+                mode = "ab"
+            elif res.status_code == HTTPStatus.OK:
+                mode = "wb"
+            else:
+                raise Exception(f"Bad status code: {res.status_code}")
+
+            meta = {
+                "etag": res.headers.get("ETag") or part_meta.get("etag"),
+                "last_modified": res.headers.get("Last-Modified") or part_meta.get("last_modified"),
+            }
+            if mode == "wb":
+                offset = 0
+                self._write_meta(part_path, meta)
+            with open(part_path, mode) as f:
+                for chunk in res.iter_content(self.CHUNK_SIZE):
+                    f.write(chunk)
+            expected_size = self._expected_size(res, offset)
+
+        size = os.path.getsize(part_path)
+        if expected_size is not None and size != expected_size:
+            raise Exception(f"Download of {url} is interrupted at byte {size} of {expected_size}")
+        os.replace(part_path, path)
+        self._write_meta(path, meta)
+        os.remove(f"{part_path}.meta")
+        return True
+
+    @staticmethod
+    def _expected_size(res, offset):
+        if res.headers.get("Content-Encoding", "identity") != "identity":
+            return None
+        content_range = res.headers.get("Content-Range")
+        if content_range and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            return int(total) if total.isdigit() else None
+        content_length = res.headers.get("Content-Length")
+        return offset + int(content_length) if content_length and content_length.isdigit() else None
+
+    @staticmethod
+    def _read_meta(path):
+        try:
+            with open(f"{path}.meta") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return dict()
+
+    @staticmethod
+    def _write_meta(path, meta):
+        tmp_path = f"{path}.meta.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, f"{path}.meta")
@@ -0,0 +1,130 @@
+"""
+Incremental output: only records not processed by previous runs are
+transformed and appended as new partitions, so a run costs in proportion
+to the change of the input.
+
+Every record is identified by a hash of all its fields, hashes of
+processed records are kept next to the data (`_keys/`), one directory
+per run until there are `MAX_KEY_DIRECTORIES`, then they are compacted
+into one when the manifest is published. A changed record
+gets a new hash and is processed again, its previous version stays in the
+output. Data is visible to readers after the manifest swap only, use
+`load_output` to read it.
+"""
+import datetime
+import logging
+import os
+import shutil
+import uuid
+
+from pyspark.sql.functions import coalesce, col, concat_ws, lit, sha2
+
+from jobs.manifest import Manifest
+from jobs.write_metrics import count_rows, write_metrics
+
+logger = logging.getLogger(__name__)
+
+PARTITION_COLUMNS = ["complexity", "ingestion_date"]
+KEY_COLUMN = "record_hash"
+MAX_KEY_DIRECTORIES = 16
+
+
+def record_hash(columns):
+    """
+    :return: column with SHA-256 of the record fields, nulls differ from empty strings
+    """
+    return sha2(concat_ws("\x1f", *(coalesce(col(c).cast("string"), lit("\x00")) for c in columns)), 256)
+
+
+def load_output(spark, path):
+    """
+    :return: DataFrame of data files committed to the manifest or None if there are none
+    """
+    manifest = Manifest.read(path)
+    if not manifest.files:
+        return None
+    return spark.read.format("orc").option("basePath", path).load(manifest.paths(path))
+
+
+def write_incremental(spark, records, path, transform, ingestion_date=None):
+    """
+    Appends transformed records not processed by previous runs to `path`
+    partitioned by complexity and ingestion date.
+
+    :param records: all input records
+    :param transform: function selecting output rows from new records,
+        the result must have a complexity column
+    :param ingestion_date: partition value, today by default
+    :return: write metrics of the new data
+    """
+    ingestion_date = ingestion_date or datetime.date.today().isoformat()
+    run_id = uuid.uuid4().hex
+    os.makedirs(path, exist_ok=True)
+    manifest = Manifest.read(path)
+
+    keyed = records.withColumn(KEY_COLUMN, record_hash(records.columns))
+    if manifest.keys:
+        processed = spark.read.format("orc").load(manifest.paths(path, manifest.keys))
+        keyed = keyed.join(processed, KEY_COLUMN, "left_anti")
+    new = keyed.persist()
+    try:
+        staging_path = os.path.join(path, "_staging", run_id)
+        output = transform(new).drop(KEY_COLUMN).withColumn("ingestion_date", lit(ingestion_date))
+        with write_metrics(spark, staging_path) as metrics:
+            output.write.format("orc").partitionBy(*PARTITION_COLUMNS).save(staging_path)
+        keys_name = os.path.join("_keys", run_id)
+        keys_path = os.path.join(path, keys_name)
+        new.select(KEY_COLUMN).write.format("orc").save(keys_path)
+    finally:
+        new.unpersist()
+
+    files = _move_files(staging_path, path)
+    # new records may give no output rows, their keys are kept anyway
+    if not files and not count_rows(spark, keys_path):
+        logger.info(f"No new records for {path}")
+        shutil.rmtree(keys_path)
+        return metrics
+    keys, dropped_keys = [keys_name], []
+    if len(manifest.keys) + 1 > MAX_KEY_DIRECTORIES:
+        dropped_keys = manifest.keys + [keys_name]
+        keys = [_compact_keys(spark, path, dropped_keys, run_id)]
+    manifest = manifest.publish(path, files=files, keys=keys, dropped_keys=dropped_keys)
+    for name in dropped_keys:
+        shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+    logger.info(f"Published {manifest} of {path}, {len(files)} files added")
+    return metrics
+
+
+def _compact_keys(spark, path, names, run_id):
+    """
+    Rewrites keys of `names` into one directory, small files of many runs
+    are merged into files of the scan split size.
+
+    :return: name of the new directory relative to `path`
+    """
+    name = os.path.join("_keys", f"{run_id}-compacted")
+    spark.read.format("orc").load([os.path.join(path, n) for n in names])\
+        .write.format("orc").save(os.path.join(path, name))
+    logger.info(f"Compacted {len(names)} key directories of {path}")
+    return name
+
+
+def _move_files(staging_path, path):
+    """
+    Moves data files from the staging directory into the same partition
+    directories of `path`. File names are unique per Spark write.
+
+    :return: moved files relative to `path`
+    """
+    files = []
+    for directory, _, names in os.walk(staging_path):
+        partition = os.path.relpath(directory, staging_path)
+        for name in names:
+            if name.startswith((".", "_")):
+                continue
+            target = os.path.normpath(os.path.join(partition, name))
+            os.makedirs(os.path.join(path, partition), exist_ok=True)
+            os.replace(os.path.join(directory, name), os.path.join(path, target))
+            files.append(target)
+    shutil.rmtree(staging_path)
+    return files
@@ -0,0 +1,20 @@
+from pyspark.sql.functions import when
+
+from meat_ingredients import MATCHER
+
+
+def ingredient_category(ingredients, matcher=MATCHER):
+    """
+    Spark version of `IngredientMatcher.match`. Branches are evaluated in
+    order and a regular expression runs only if its keyword is found.
+
+    :param ingredients: column of lower-cased ingredients
+    :return: column of matched categories, null if nothing matched
+    """
+    category = None
+    for rule in matcher.rules:
+        condition = ingredients.contains(rule.keyword)
+        if rule.pattern is not None:
+            condition = condition & ingredients.rlike(rule.expression)
+        category = when(condition, rule.category) if category is None else category.when(condition, rule.category)
+    return category
@@ -0,0 +1,64 @@
+import json
+import os
+import time
+
+MANIFEST_NAME = "_manifest.json"
+
+
+class Manifest:
+    """
+    List of committed data files of a dataset directory.
+
+    Writers add files to the directory first and then publish a new
+    manifest version atomically with `os.replace`, so readers going through
+    the manifest never see files of an unfinished write.
+
+    :param version: increasing number of the published manifest
+    :param files: data files relative to the dataset directory
+    :param keys: files with keys of processed records
+    """
+    def __init__(self, version=0, files=(), keys=()):
+        self.version = version
+        self.files = list(files)
+        self.keys = list(keys)
+
+    @classmethod
+    def read(cls, path):
+        """
+        :param path: dataset directory
+        :return: the last published manifest, empty if there is none
+        """
+        try:
+            with open(os.path.join(path, MANIFEST_NAME)) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls()
+        return cls(data["version"], data["files"], data["keys"])
+
+    def publish(self, path, files=(), keys=(), dropped_keys=()):
+        """
+        Atomically replaces the manifest of `path` with a next version
+        including `files` and `keys`.
+
+        :param dropped_keys: keys left out of the next version, e.g. compacted ones
+        :return: the published manifest
+        """
+        keys = [name for name in self.keys if name not in dropped_keys] + list(keys)
+        manifest = Manifest(self.version + 1, self.files + list(files), keys)
+        data = dict(version=manifest.version, files=manifest.files, keys=manifest.keys, published=time.time())
+        tmp_path = os.path.join(path, f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(path, MANIFEST_NAME))
+        return manifest
+
+    def paths(self, path, names=None):
+        """
+        :return: absolute paths of data files (or of `names`)
+        """
+        return [os.path.join(path, name) for name in (self.files if names is None else names)]
+
+    def __repr__(self):
+        return f"<Manifest version={self.version} files={len(self.files)}>"
@@ -1,93 +1,142 @@
+import hashlib
 import os
 import logging
 
-from datetime import timedelta
-from http import HTTPStatus
-
-import isodate
-import requests
-from isodate.isoerror import ISO8601Error
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import lower, udf
-from pyspark.sql.types import StringType
-
 import settings
-from meat_ingredients import EXPRESSIONS
+from jobs.download import Downloader
+from jobs.incremental import write_incremental
+from jobs.recipes import read_recipes, select_meat_recipes
+from jobs.spark import spark_session
+from jobs.write_metrics import write_metrics
 from scheduler import Job, Task
+from scheduler.cache import FileArtifact, ResultCache
+from scheduler.metrics import report
+from scheduler.retry import RetryPolicy
+from scheduler.state import SQLiteStateBackend
+from scheduler.task import FanOut, SkipDownstream
 
 logger = logging.getLogger(__name__)
 
-spark = SparkSession.builder.master("local[*]").appName(__name__).getOrCreate()
 file_name = os.path.join(settings.WORKDIR, "recipes.json")
 orc_path = os.path.join(settings.WORKDIR, "recipes.orc")
 final_orc_path = os.path.join(settings.WORKDIR, "meat_recipes.orc")
+index_file_name = os.path.join(settings.WORKDIR, "recipes.index")
+shards_path = os.path.join(settings.WORKDIR, "recipes")
 url = settings.RECIPES_URL
-expr = "|".join(EXPRESSIONS)
+downloader = Downloader(timeout=settings.DOWNLOAD_TIMEOUT)
 
 
-def parse_duration(raw_duration):
-    try:
-        duration = isodate.parse_duration(raw_duration)
-    except ISO8601Error:
-        return None
-    else:
-        return duration
-
-
-def _complexity(prep_time, cook_time):
-    prep_time = parse_duration(prep_time)
-    cook_time = parse_duration(cook_time)
-    if not all((prep_time, cook_time)):
-        return
-    total = prep_time + cook_time
-    if total < timedelta(minutes=30):
-        return "easy"
-    elif total > timedelta(hours=1):
-        return "hard"
+def retrieve_recipes():
+    logger.info("Start recipes retrieving")
+    if not downloader.download(url, file_name):
+        raise SkipDownstream("Recipes are not modified")
+    logger.info(f"Finished recipes retrieving. Content length={os.path.getsize(file_name)}. Saved in {file_name}.")
+    return FileArtifact(file_name)
+
+
+def save_recipes_orc(recipes_file):
+    logger.info("Start recipes saving as ORC")
+    with spark_session as spark:
+        recipes = read_recipes(spark, os.fspath(recipes_file))
+        with write_metrics(spark, orc_path) as metrics:
+            recipes.write.format("orc").save(orc_path, mode="overwrite")
+    report(**metrics)
+    logger.info(f"Finished recipes saving as ORC. DataFrame length={metrics['rows']}. Saved in {orc_path}")
+    return orc_path
+
+
+def save_meat_recipes(spark, recipes):
+    if settings.OUTPUT_MODE == "incremental":
+        metrics = write_incremental(spark, recipes, final_orc_path, select_meat_recipes)
     else:
-        return "medium"
+        with write_metrics(spark, final_orc_path) as metrics:
+            select_meat_recipes(recipes).write.format("orc").save(final_orc_path, mode="overwrite")
+    report(**metrics)
+    return metrics
+
 
+def retrieve_meat_recipes(recipes_orc_path):
+    logger.info("Start meat recipes retrieving")
+    with spark_session as spark:
+        recipes = spark.read.format("orc").load(recipes_orc_path)
+        metrics = save_meat_recipes(spark, recipes)
+    logger.info(f"Finished meat recipes retrieving. DataFrame length={metrics['rows']}. Saved in {final_orc_path}")
 
-complexity = udf(_complexity, StringType())
 
+def process_recipes(recipes_file):
+    logger.info("Start recipes processing")
+    with spark_session as spark:
+        recipes = read_recipes(spark, os.fspath(recipes_file))
+        metrics = save_meat_recipes(spark, recipes)
+    logger.info(f"Finished recipes processing. DataFrame length={metrics['rows']}. Saved in {final_orc_path}")
 
-def retrieve_recipes():
-    logger.info("Start recipes retrieving")
-    res = requests.get(url)
-    if res.status_code != HTTPStatus.OK:
-        raise Exception(f"Bad status code: {res.status_code}")
-    with open(file_name, "wb") as f:
-        f.write(res.content)
-    logger.info(f"Finished recipes retrieving. Content length={len(res.content)}. Saved in {file_name}.")
-    return file_name
 
+def retrieve_shard_urls():
+    logger.info("Start recipes index retrieving")
+    downloader.download(url, index_file_name)
+    with open(index_file_name) as f:
+        shard_urls = [line.strip() for line in f if line.strip()]
+    logger.info(f"Finished recipes index retrieving. Shards={len(shard_urls)}")
+    return shard_urls
 
-def save_recipes_orc():
-    logger.info("Start recipes saving as ORC")
-    recipes = spark.read.json(file_name)
-    recipes.write.format("orc").save(orc_path, mode="overwrite")
-    logger.info(f"Finished recipes saving as ORC. DataFrame length={recipes.count()}. Saved in {orc_path}")
 
+def retrieve_recipes_shard(shard_url):
+    os.makedirs(shards_path, exist_ok=True)
+    shard_file_name = os.path.join(shards_path, f"{hashlib.sha1(shard_url.encode()).hexdigest()[:16]}.json")
+    downloaded = downloader.download(shard_url, shard_file_name)
+    logger.info(f"Recipes shard {shard_url} is {'downloaded' if downloaded else 'not modified'}")
+    return FileArtifact(shard_file_name), downloaded
 
-def retrieve_meat_recipes():
-    logger.info("Start meat recipes retrieving")
-    recipes = spark.read.format("orc").load(orc_path)
-    filtered = recipes[lower(recipes.ingredients).rlike(expr)]
-    filtered.withColumn("complexity", complexity("prepTime", "cookTime"))\
-        .write.format("orc").save(final_orc_path, mode="overwrite")
-    logger.info(f"Finished meat recipes retrieving. DataFrame length={filtered.count()}. Saved in {final_orc_path}")
 
+def collect_shards(shards):
+    if not any(downloaded for _, downloaded in shards):
+        raise SkipDownstream("Recipes shards are not modified")
+    return [shard_file for shard_file, _ in shards]
 
-job = Job()
-job.every().minute.at(second=10)
 
-retrieve_recipes_task = Task(retrieve_recipes, "retrieve_recipes", job)
-save_recipes_orc_task = Task(save_recipes_orc, "save_recipes_orc", job)
-retrieve_meat_recipes_task = Task(retrieve_meat_recipes, "retrieve_meat_recipes", job)
+def process_recipes_shards(shard_files):
+    logger.info(f"Start processing of {len(shard_files)} recipes shards")
+    with spark_session as spark:
+        recipes = read_recipes(spark, [os.fspath(shard_file) for shard_file in shard_files])
+        metrics = save_meat_recipes(spark, recipes)
+    logger.info(f"Finished recipes shards processing. DataFrame length={metrics['rows']}. Saved in {final_orc_path}")
+
 
+job = Job("meat_recipes", max_instances=1, skip_if_running=True, state=SQLiteStateBackend(settings.STATE_DB),
+          deadline=settings.JOB_DEADLINE)
+job.every().minute.at(second=10)
 
-retrieve_recipes_task.set_upstream(save_recipes_orc_task)
-save_recipes_orc_task.set_upstream(retrieve_meat_recipes_task)
+cache = ResultCache(max_entries=16)
+# a stalled download times out in the downloader and, like transient HTTP errors, is retried;
+# downloads run in the worker, so they share the session and its connection pool
+download_options = dict(retry=RetryPolicy(max_attempts=settings.DOWNLOAD_ATTEMPTS, backoff=10),
+                        resources={"network": 1})
+# Spark tasks share the cores of one session, the scheduler pool limits them
+spark_options = dict(resources={"spark": 1})
+
+if settings.PIPELINE_MODE == "sharded":
+    # shards are downloaded concurrently, their number is known from the index only
+    retrieve_shard_urls_task = Task(retrieve_shard_urls, "retrieve_shard_urls", job, **download_options)
+    retrieve_shards_task = FanOut(retrieve_recipes_shard, "retrieve_shards", job, idempotent=True,
+                                  inputs=[retrieve_shard_urls_task], reduce=collect_shards, **download_options)
+    process_recipes_task = Task(process_recipes_shards, "process_recipes", job, idempotent=True,
+                                inputs=[retrieve_shards_task], **spark_options)
+else:
+    retrieve_recipes_task = Task(retrieve_recipes, "retrieve_recipes", job, idempotent=True, **download_options)
+    if settings.PIPELINE_MODE == "staged":
+        # ORC is not rewritten while the downloaded JSON is the same
+        save_recipes_orc_task = Task(save_recipes_orc, "save_recipes_orc", job, idempotent=True,
+                                     inputs=[retrieve_recipes_task], cache=cache, **spark_options)
+        retrieve_meat_recipes_task = Task(retrieve_meat_recipes, "retrieve_meat_recipes", job, idempotent=True,
+                                          inputs=[save_recipes_orc_task], **spark_options)
+    else:
+        # goes before the snapshot when Spark slots are short
+        process_recipes_task = Task(process_recipes, "process_recipes", job, idempotent=True,
+                                    inputs=[retrieve_recipes_task], cache=cache, priority=1, **spark_options)
+        if settings.RAW_SNAPSHOT:
+            # runs next to process_recipes, nothing waits for the snapshot
+            save_recipes_orc_task = Task(save_recipes_orc, "save_recipes_orc", job, idempotent=True,
+                                         inputs=[retrieve_recipes_task], cache=cache, **spark_options)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,34 @@
+from pyspark.sql.functions import col, lower
+from pyspark.sql.types import StringType, StructField, StructType
+
+from jobs.complexity import complexity_column
+from jobs.ingredients import ingredient_category
+
+RECIPES_SCHEMA_VERSION = 1
+RECIPES_SCHEMAS = {
+    1: StructType([
+        StructField("name", StringType()),
+        StructField("ingredients", StringType()),
+        StructField("url", StringType()),
+        StructField("image", StringType()),
+        StructField("cookTime", StringType()),
+        StructField("recipeYield", StringType()),
+        StructField("datePublished", StringType()),
+        StructField("prepTime", StringType()),
+        StructField("description", StringType()),
+    ]),
+}
+
+
+def read_recipes(spark, path, schema_version=RECIPES_SCHEMA_VERSION):
+    """
+    Reads recipes JSON with an explicit schema, so the file is scanned
+    once instead of twice for schema inference.
+    """
+    return spark.read.json(path, schema=RECIPES_SCHEMAS[schema_version])
+
+
+def select_meat_recipes(recipes):
+    categorized = recipes.withColumn("category", ingredient_category(lower(col("ingredients"))))
+    return categorized.where(col("category").isNotNull())\
+        .withColumn("complexity", complexity_column(col("prepTime"), col("cookTime")))
@@ -0,0 +1,17 @@
+from pyspark.sql import SparkSession
+
+import settings
+from scheduler.resource import LazyResource
+
+
+def create_session():
+    builder = SparkSession.builder.master(settings.SPARK_MASTER).appName("spark_lab")\
+        .config("spark.sql.shuffle.partitions", settings.SPARK_SHUFFLE_PARTITIONS)\
+        .config("spark.driver.memory", settings.SPARK_DRIVER_MEMORY)\
+        .config("spark.sql.execution.arrow.enabled", str(settings.SPARK_ARROW).lower())
+    return builder.getOrCreate()
+
+
+# the JVM is started by the first task using the session, not at import
+spark_session = LazyResource(create_session, close=SparkSession.stop, idle_timeout=settings.SPARK_IDLE_TIMEOUT,
+                             name="spark")
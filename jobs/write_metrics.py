@@ -0,0 +1,47 @@
+import os
+
+from contextlib import contextmanager
+
+
+@contextmanager
+def write_metrics(spark, path):
+    """
+    Measures ORC files written to `path` within the block:
+
+        >>> with write_metrics(spark, path) as metrics:
+        ...     df.write.format("orc").save(path)
+        >>> metrics
+        {'rows': 1042, 'bytes': 52711}
+
+    Rows are counted from the written files on the JVM, reading no
+    columns, so the lineage of the written DataFrame is not run again
+    and its rows do not pass through Python workers. Only files of
+    `path` are counted, so concurrent writes to other paths are not
+    mixed in.
+    """
+    metrics = dict()
+    yield metrics
+    metrics.update(rows=count_rows(spark, path), bytes=data_size(path))
+
+
+def count_rows(spark, path):
+    """
+    :return: number of rows of ORC files under `path`
+    """
+    if not data_files(path):
+        return 0
+    return spark.read.format("orc").load(path).count()
+
+
+def data_files(path):
+    """
+    :return: paths of data files under `path`, hidden and metadata files are skipped
+    """
+    files = []
+    for directory, _, names in os.walk(path):
+        files.extend(os.path.join(directory, name) for name in names if not name.startswith((".", "_")))
+    return files
+
+
+def data_size(path):
+    return sum(os.path.getsize(file) for file in data_files(path))
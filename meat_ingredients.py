@@ -1,21 +1,71 @@
-EXPRESSIONS = [
-    "meat",
-    "chick((?!\w)|en)",  # Chicken
-    "duck",  # Duck
-    "foie gras",  # Foie Gras
-    "game",  # Game
-    "ham",  # Ham
-    "lamb"  # Lamb
-    "prosciutto",  # Prosciutto
-    "rabbit",  # Rabbit
-    "sausage",  # Sausage
-    "turkey",  # Turkey
-    "goat(?![\s-\.]*milk|[\s-\.]*cheese)",  # Goat
-    "mutton",  # Mutton,
-    "pork",  # Pork
-    "veal",  # Veal
-    "cornish game hen",  # Cornish Game Hen
-    "quail",  # Quail
-    "ostrich",  # Ostrich
-    "goose",  # Goose
+import re
+
+# (category, expression) pairs. Expressions match lower-cased ingredients,
+# the first matching category wins, so specific ones go before generic ones.
+INGREDIENTS = [
+    ("chicken", r"chick((?!\w)|en)"),
+    ("duck", "duck"),
+    ("foie gras", "foie gras"),
+    ("cornish game hen", "cornish game hen"),
+    ("game", "game"),
+    ("ham", "ham"),
+    ("lamb", "lamb"),
+    ("prosciutto", "prosciutto"),
+    ("rabbit", "rabbit"),
+    ("sausage", "sausage"),
+    ("turkey", "turkey"),
+    ("goat", r"goat(?![\s.-]*milk|[\s.-]*cheese)"),
+    ("mutton", "mutton"),
+    ("pork", "pork"),
+    ("veal", "veal"),
+    ("quail", "quail"),
+    ("ostrich", "ostrich"),
+    ("goose", "goose"),
+    ("meat", "meat"),
 ]
+
+EXPRESSIONS = [expression for _, expression in INGREDIENTS]
+
+_LITERAL = re.compile(r"[a-z ]+")
+
+
+class Rule:
+    """
+    Matches an ingredient category. `keyword` is a plain substring every
+    match contains: it is the whole expression for literal rules, and a
+    cheap prefilter for rules which need a regular expression.
+    """
+    def __init__(self, category, expression):
+        self.category = category
+        self.expression = expression
+        literal = _LITERAL.match(expression)
+        self.keyword = literal.group() if literal else ""
+        self.pattern = None if self.keyword == expression else re.compile(expression)
+
+    def match(self, text):
+        return self.keyword in text and (self.pattern is None or self.pattern.search(text) is not None)
+
+    def __repr__(self):
+        return f"<Rule category={self.category!r} expression={self.expression!r}>"
+
+
+class IngredientMatcher:
+    """
+    Finds the category of lower-cased ingredients. Regular expressions run
+    only on texts containing their keyword, so texts are not backtracked
+    through one large alternation.
+    """
+    def __init__(self, ingredients=INGREDIENTS):
+        self.rules = [Rule(category, expression) for category, expression in ingredients]
+
+    def match(self, text):
+        """
+        :return: the first matching category or None
+        """
+        for rule in self.rules:
+            if rule.match(text):
+                return rule.category
+        return None
+
+
+MATCHER = IngredientMatcher()
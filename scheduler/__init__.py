@@ -1,3 +1,3 @@
 from .job import Job
 from .task import Task
-from .scheduler import Scheduler
+from .scheduler import Scheduler, AsyncScheduler
@@ -0,0 +1,115 @@
+import hashlib
+import logging
+import os
+import pickle
+
+from collections import OrderedDict
+
+from .clock import SYSTEM_CLOCK
+
+logger = logging.getLogger(__name__)
+
+
+class FileArtifact(os.PathLike):
+    """
+    Path to a file produced by a task. It is fingerprinted by the file
+    content, so tasks taking it are cached while the content is the same.
+
+    The content is hashed when the artifact is made, i.e. by the task in
+    its worker, and kept with the size and mtime of the file. Cache keys
+    are then made by the scheduler from a `stat` only, the file is hashed
+    again only if it has changed since.
+    """
+    CHUNK_SIZE = 1 << 20
+    # defaults of artifacts pickled before the digest was kept
+    _stat = None
+    _digest = None
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        if os.path.isfile(self.path):
+            self.fingerprint()
+
+    def __fspath__(self):
+        return self.path
+
+    def fingerprint(self):
+        stat = os.stat(self.path)
+        stat = (stat.st_size, stat.st_mtime_ns)
+        if stat != self._stat:
+            self._digest = self._hash()
+            self._stat = stat
+        return self._digest
+
+    def _hash(self):
+        digest = hashlib.sha256()
+        with open(self.path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def __eq__(self, other):
+        return isinstance(other, FileArtifact) and self.path == other.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def __repr__(self):
+        return f"<FileArtifact path={self.path!r}>"
+
+
+def fingerprint(value):
+    if hasattr(value, "fingerprint"):
+        return value.fingerprint()
+    return hashlib.sha256(pickle.dumps(value, protocol=4)).hexdigest()
+
+
+def code_version(func):
+    code = getattr(func, "__code__", None)
+    if code is None:
+        return getattr(func, "__qualname__", repr(func))
+    return hashlib.sha256(code.co_code + repr(code.co_consts).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    In-memory cache of task results keyed on the task id, version and
+    fingerprints of task inputs. Least recently used results are evicted
+    above `max_entries`, results older than `ttl` seconds are expired.
+    """
+    def __init__(self, max_entries=128, ttl=None, clock=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock or SYSTEM_CLOCK
+        self.entries = OrderedDict()
+
+    def key(self, task, args):
+        """
+        :return: cache key or None if inputs can't be fingerprinted
+        """
+        try:
+            fingerprints = [fingerprint(arg) for arg in args]
+        except Exception as exc:
+            logger.warning(f"Inputs of task {task} can't be fingerprinted, cache is not used: {exc}")
+            return None
+        version = task.version if task.version is not None else code_version(task.task)
+        return hashlib.sha256(repr((task.job.name, task.id, version, fingerprints)).encode()).hexdigest()
+
+    def get(self, key):
+        """
+        :return: (True, result) or (False, None) if there is no result
+        """
+        if key not in self.entries:
+            return False, None
+        stored, result = self.entries[key]
+        if self.ttl is not None and self.clock.time() - stored > self.ttl:
+            del self.entries[key]
+            return False, None
+        self.entries.move_to_end(key)
+        return True, result
+
+    def put(self, key, result):
+        self.entries[key] = (self.clock.time(), result)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
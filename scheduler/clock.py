@@ -0,0 +1,105 @@
+import asyncio
+import selectors
+import time
+
+
+class Clock:
+    """
+    Source of time of jobs and schedulers, the system clock by default.
+    """
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+    def blocking_sleep(self, seconds):
+        """
+        Blocks the calling thread, for runs outside of an event loop.
+        """
+        time.sleep(seconds)
+
+
+class VirtualClock(Clock):
+    """
+    Clock moved only by `advance` (or by sleeping on it), so runs using it
+    are deterministic and do not wait for real time.
+
+    Out of a `VirtualTimeLoop` a sleep moves the clock at once. On the
+    loop sleeps are ordered by their wake up times and the clock jumps to
+    the next one when all coroutines wait.
+    """
+    def __init__(self, start=0.0):
+        self.start = start
+        # kept apart from `start` so small steps are not lost to float precision
+        self.elapsed = 0.0
+
+    def time(self):
+        return self.start + self.elapsed
+
+    def monotonic(self):
+        return self.elapsed
+
+    def advance(self, seconds):
+        self.elapsed += seconds
+
+    async def sleep(self, seconds):
+        loop = asyncio.get_event_loop()
+        if isinstance(loop, VirtualTimeLoop) and loop.clock is self:
+            await asyncio.sleep(seconds)
+            return
+        self.advance(seconds)
+        await asyncio.sleep(0)
+
+    def blocking_sleep(self, seconds):
+        self.advance(seconds)
+
+
+class _VirtualTimeSelector(selectors.DefaultSelector):
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+        self.executor_calls = 0
+
+    def select(self, timeout=None):
+        if timeout is not None and timeout > 0:
+            if self.executor_calls:
+                # virtual time stands still while executor threads work
+                timeout = None
+            else:
+                # the loop waits for its next timer, move the clock to it instead
+                self.clock.advance(timeout)
+                timeout = 0
+        return super().select(timeout)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop on the time of a `VirtualClock`: `asyncio.sleep` and timers
+    fire at once in the order of their times. While functions run in the
+    executor the clock is stopped and the loop waits for them for real.
+    """
+    def __init__(self, clock: VirtualClock):
+        self._virtual_selector = _VirtualTimeSelector(clock)
+        super().__init__(self._virtual_selector)
+        self.clock = clock
+        # timers due within this are run, covers rounding of virtual steps
+        self._clock_resolution = 1e-6
+
+    def run_in_executor(self, executor, func, *args):
+        future = super().run_in_executor(executor, func, *args)
+        self._virtual_selector.executor_calls += 1
+        future.add_done_callback(self._executor_call_done)
+        return future
+
+    def _executor_call_done(self, future):
+        self._virtual_selector.executor_calls -= 1
+
+    def time(self):
+        return self.clock.monotonic()
+
+
+SYSTEM_CLOCK = Clock()
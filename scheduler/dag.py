@@ -1,45 +1,302 @@
+from array import array
+from collections.abc import Mapping
+
+# neighbours of a node are kept in a tuple up to this number, in a set above it
+MAX_TUPLE_DEGREE = 8
+
+
 class CyclicDependenceError(Exception):
     ...
 
 
+def _add(adjacency, i, j):
+    neighbours = adjacency[i]
+    if type(neighbours) is tuple:
+        if len(neighbours) < MAX_TUPLE_DEGREE:
+            adjacency[i] = neighbours + (j,)
+            return
+        neighbours = adjacency[i] = set(neighbours)
+    neighbours.add(j)
+
+
+def _discard(adjacency, i, j):
+    neighbours = adjacency[i]
+    if type(neighbours) is tuple:
+        if j in neighbours:
+            adjacency[i] = tuple(k for k in neighbours if k != j)
+    else:
+        neighbours.discard(j)
+
+
+class _AdjacencyView(Mapping):
+    """
+    Read-only mapping of nodes to frozensets of their neighbours.
+    """
+    def __init__(self, dag, adjacency):
+        self._dag = dag
+        self._adjacency = adjacency
+
+    def __getitem__(self, node):
+        nodes = self._dag.nodes
+        return frozenset(nodes[j] for j in self._adjacency[self._dag.index[node]])
+
+    def __iter__(self):
+        return iter(self._dag.index)
+
+    def __len__(self):
+        return len(self._dag.index)
+
+
+class _OrderView(Mapping):
+    """
+    Read-only mapping of nodes to their topological positions.
+    """
+    def __init__(self, dag):
+        self._dag = dag
+
+    def __getitem__(self, node):
+        return self._dag.positions[self._dag.index[node]]
+
+    def __iter__(self):
+        return iter(self._dag.index)
+
+    def __len__(self):
+        return len(self._dag.index)
+
+
+class CompiledDAG:
+    """
+    Downstream adjacency in compressed sparse row arrays: downstream nodes
+    of node `i` are `indices[indptr[i]:indptr[i + 1]]`, `in_degree[i]` is
+    the number of its upstream nodes.
+    """
+    __slots__ = ("nodes", "indptr", "indices", "in_degree")
+
+    def __init__(self, dag):
+        self.nodes = list(dag.nodes)
+        self.indptr = array("q", [0])
+        self.indices = array("q")
+        self.in_degree = array("q")
+        for upstream, downstream in zip(dag.up, dag.down):
+            self.indices.extend(downstream)
+            self.indptr.append(len(self.indices))
+            self.in_degree.append(len(upstream))
+
+
 class DAG:
+    """
+    Nodes are numbered by integer indices kept in `index`, so adjacency and
+    topological positions are stored as small tuples and arrays of numbers
+    rather than a set per node.
+
+    `graph` maps a node to its upstream nodes, `reverse` to its downstream
+    nodes and `order` to its topological position; these are read-only views.
+    Traversals run over `CompiledDAG` arrays compiled on demand and kept
+    until the DAG changes.
+    """
     def __init__(self):
-        self.graph = dict()
+        self.index = dict()
+        self.nodes = []
+        self.up = []
+        self.down = []
+        self.positions = array("q")
+        self.graph = _AdjacencyView(self, self.up)
+        self.reverse = _AdjacencyView(self, self.down)
+        self.order = _OrderView(self)
+        self._next_order = 0
+        self._independent = set()
+        self._upstream = dict()
+        self._compiled = None
 
     def add_node(self, node):
-        if node in self.graph:
+        if node in self.index:
             raise KeyError(f"{node!r} already exists")
-        self.graph[node] = set()
+        i = len(self.nodes)
+        self.nodes.append(node)
+        self.up.append(())
+        self.down.append(())
+        self.positions.append(self._next_order)
+        self.index[node] = i
+        self._next_order += 1
+        self._independent.add(node)
+        self._compiled = None
 
     def add_edge(self, ind_node, dep_node):
-        if ind_node not in self.graph:
+        i, j = self._check_edge(ind_node, dep_node)
+        self._reorder(j, i)
+        self._link(i, j)
+
+    def add_edges(self, edges):
+        """
+        Adds a batch of edges validating the whole batch with one traversal.
+        Either all edges are added or, if they produce a cycle, none of them.
+
+        :param edges: iterable of (ind_node, dep_node) pairs
+        :return:
+        """
+        edges = [self._check_edge(ind_node, dep_node) for ind_node, dep_node in edges]
+        added = []
+        for i, j in edges:
+            if j not in self.up[i]:
+                self._link(i, j)
+                added.append((i, j))
+        try:
+            order = list(self._travers())
+        except CyclicDependenceError:
+            for i, j in added:
+                self._unlink(i, j)
+            raise
+        for position, i in enumerate(order):
+            self.positions[i] = position
+        self._next_order = len(order)
+
+    def _check_edge(self, ind_node, dep_node):
+        if ind_node not in self.index:
             raise KeyError(f"{ind_node!r} not exists")
-        if dep_node not in self.graph:
+        if dep_node not in self.index:
             raise KeyError(f"{dep_node!r} not exists")
-        if ind_node in self.upstream(dep_node):
+        return self.index[ind_node], self.index[dep_node]
+
+    def _link(self, i, j):
+        if j in self.up[i]:
+            return
+        _add(self.up, i, j)
+        _add(self.down, j, i)
+        self._independent.discard(self.nodes[j])
+        self._upstream.clear()
+        self._compiled = None
+
+    def _unlink(self, i, j):
+        _discard(self.up, i, j)
+        _discard(self.down, j, i)
+        if not self.down[j]:
+            self._independent.add(self.nodes[j])
+        self._upstream.clear()
+        self._compiled = None
+
+    def _reorder(self, before, after):
+        """
+        Keeps `order` topological when `before` has to precede `after`
+        (Pearce-Kelly). Nothing is searched if the order already holds,
+        otherwise only nodes between the two positions are visited.
+        """
+        positions = self.positions
+        lower, upper = positions[after], positions[before]
+        if upper < lower:
+            return
+        forward = self._collect(after, self.down, lower, upper)
+        if before in forward:
             raise CyclicDependenceError()
-        self.graph[ind_node].add(dep_node)
+        backward = self._collect(before, self.up, lower, upper)
+        nodes = sorted(backward, key=positions.__getitem__) + sorted(forward, key=positions.__getitem__)
+        for i, position in zip(nodes, sorted(positions[i] for i in nodes)):
+            positions[i] = position
+
+    def _collect(self, i, adjacency, lower, upper):
+        positions = self.positions
+        collected = {i}
+        stack = [i]
+        while stack:
+            for j in adjacency[stack.pop()]:
+                if j not in collected and lower <= positions[j] <= upper:
+                    collected.add(j)
+                    stack.append(j)
+        return collected
+
+    def is_upstream(self, node, other):
+        """
+        Checks if `other` has to be completed before `node`.
+        """
+        i, j = self.index[node], self.index[other]
+        if self.positions[j] >= self.positions[i]:
+            return False
+        return j in self._collect(i, self.up, self.positions[j], self.positions[i])
+
+    def in_degree(self):
+        return {node: len(self.up[i]) for node, i in self.index.items()}
+
+    def compile(self):
+        """
+        :return: `CompiledDAG` of the current nodes and edges
+        """
+        if self._compiled is None:
+            self._compiled = CompiledDAG(self)
+        return self._compiled
 
     def travers(self):
-        independent = self.get_independent()
-        yield from self._do_travers(independent)
+        """
+        Yields every node exactly once so that all nodes of its upstream
+        are yielded before it (Kahn's algorithm, O(V + E)).
+        """
+        nodes = self.nodes
+        for i in self._travers():
+            yield nodes[i]
 
-    def _do_travers(self, nodes):
-        for node in nodes:
-            dep_nodes = self.graph[node]
-            yield from self._do_travers(dep_nodes)
-            yield node
+    def _travers(self):
+        for level in self._ready_sets():
+            yield from level
+
+    def ready_sets(self):
+        """
+        Yields sets of nodes level by level: nodes of one set depend only
+        on nodes of previous sets, so they can be run together.
+        """
+        nodes = self.nodes
+        for level in self._ready_sets():
+            yield set(nodes[i] for i in level)
+
+    def _ready_sets(self):
+        compiled = self.compile()
+        indptr, indices = compiled.indptr, compiled.indices
+        in_degree = array("q", compiled.in_degree)
+        ready = [i for i in range(len(compiled.nodes)) if not in_degree[i]]
+        visited = 0
+        while ready:
+            yield ready
+            visited += len(ready)
+            next_ready = []
+            for i in ready:
+                for j in indices[indptr[i]:indptr[i + 1]]:
+                    in_degree[j] -= 1
+                    if not in_degree[j]:
+                        next_ready.append(j)
+            ready = next_ready
+        if visited != len(self.index):
+            raise CyclicDependenceError()
+
+    def direct_upstream(self, node):
+        """
+        :return: tuple of nodes with edges to the node, cheaper than `graph[node]`
+        """
+        nodes = self.nodes
+        return tuple(nodes[j] for j in self.up[self.index[node]])
+
+    def direct_downstream(self, node):
+        """
+        :return: tuple of nodes with edges from the node, cheaper than `reverse[node]`
+        """
+        nodes = self.nodes
+        return tuple(nodes[j] for j in self.down[self.index[node]])
 
     def get_independent(self):
-        dependent = self.get_dependent()
-        return set(node for node in self.graph.keys() if node not in dependent)
+        return set(self._independent)
 
     def get_dependent(self):
-        return set(node for dependent in self.graph.values() for node in dependent)
+        return set(node for node in self.index if node not in self._independent)
 
     def upstream(self, node):
-        nodes = self.graph[node]
-        return set(node for node in self._do_travers(nodes))
+        if node not in self._upstream:
+            i = self.index[node]
+            upstream = self._collect(i, self.up, 0, self.positions[i])
+            upstream.discard(i)
+            self._upstream[node] = frozenset(self.nodes[j] for j in upstream)
+        return set(self._upstream[node])
+
+    def downstream(self, node):
+        i = self.index[node]
+        downstream = self._collect(i, self.down, self.positions[i], self._next_order)
+        downstream.discard(i)
+        return set(self.nodes[j] for j in downstream)
 
 
 # dag = DAG()
@@ -0,0 +1,438 @@
+"""
+Distributed execution of tasks.
+
+`BrokerExecutor` puts task calls onto a broker queue and N `Worker`
+processes pull them, run them and put the results back:
+
+    >>> broker = SQLiteBroker("/var/lib/scheduler/queue.db")
+    >>> with BrokerExecutor(broker) as executor:
+    ...     job.run(executor=executor)
+
+Workers of the same host are started with:
+
+    python -m scheduler.distributed /var/lib/scheduler/queue.db
+
+SQLite locking does not work on network filesystems, so the queue file
+must not be shared by hosts. Workers of other hosts connect to a
+`BrokerServer` serving the queue of the coordinator host instead:
+
+    >>> BrokerServer(broker, ("0.0.0.0", 5000), authkey=b"secret").start()
+
+    SCHEDULER_BROKER_KEY=secret python -m scheduler.distributed --connect coordinator:5000
+"""
+import argparse
+import logging
+import os
+import pickle
+import socket
+import sys
+import threading
+import time
+import traceback
+import uuid
+
+from concurrent.futures import Executor, Future
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from .storage import SQLiteStorage
+
+logger = logging.getLogger(__name__)
+
+
+class Broker:
+    """
+    Work queue shared by the coordinator and workers.
+    """
+    def put(self, payload: bytes):
+        """
+        :return: id of the message
+        """
+        raise NotImplementedError()
+
+    def claim(self, worker_id):
+        """
+        :return: (id, payload) of the oldest queued message or None
+        """
+        raise NotImplementedError()
+
+    def complete(self, message_id, result: bytes):
+        raise NotImplementedError()
+
+    def fetch_results(self, message_ids):
+        """
+        Removes completed messages from the queue.
+
+        :return: dict of results by message id
+        """
+        raise NotImplementedError()
+
+    def cancel(self, message_id):
+        """
+        Removes the message, a result of a claimed one is dropped when it comes.
+        """
+        raise NotImplementedError()
+
+    def heartbeat(self, worker_id):
+        raise NotImplementedError()
+
+    def requeue_lost(self, timeout):
+        """
+        Puts messages claimed by workers without heartbeat for `timeout`
+        seconds back to the queue.
+
+        :return: number of requeued messages
+        """
+        raise NotImplementedError()
+
+
+class SQLiteBroker(SQLiteStorage, Broker):
+    """
+    Broker over a SQLite database file. All processes using it must run
+    on the host keeping the file, see `BrokerServer` for other hosts.
+    """
+    QUEUED = "queued"
+    CLAIMED = "claimed"
+    CANCELLED = "cancelled"
+    DONE = "done"
+    CHUNK_SIZE = 500
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            payload BLOB NOT NULL,
+            status TEXT NOT NULL,
+            worker TEXT,
+            result BLOB
+        );
+        CREATE INDEX IF NOT EXISTS messages_status ON messages (status);
+        CREATE TABLE IF NOT EXISTS workers (
+            id TEXT PRIMARY KEY,
+            heartbeat REAL NOT NULL
+        );
+    """
+
+    def put(self, payload):
+        with self._connection() as connection:
+            cursor = connection.execute(
+                "INSERT INTO messages (payload, status) VALUES (?, ?)", (payload, self.QUEUED))
+            return cursor.lastrowid
+
+    def claim(self, worker_id):
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT id, payload FROM messages WHERE status = ? ORDER BY id LIMIT 1", (self.QUEUED,)).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE messages SET status = ?, worker = ? WHERE id = ?", (self.CLAIMED, worker_id, row[0]))
+            return row
+
+    def complete(self, message_id, result):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM messages WHERE id = ? AND status = ?", (message_id, self.CANCELLED))
+            connection.execute(
+                "UPDATE messages SET status = ?, result = ?, payload = x'' WHERE id = ?",
+                (self.DONE, result, message_id))
+
+    def fetch_results(self, message_ids):
+        message_ids = list(message_ids)
+        results = dict()
+        with self._connection() as connection:
+            for i in range(0, len(message_ids), self.CHUNK_SIZE):
+                chunk = message_ids[i:i + self.CHUNK_SIZE]
+                params = ",".join("?" * len(chunk))
+                rows = connection.execute(
+                    f"SELECT id, result FROM messages WHERE status = ? AND id IN ({params})",
+                    [self.DONE] + chunk).fetchall()
+                connection.execute(
+                    f"DELETE FROM messages WHERE status = ? AND id IN ({params})", [self.DONE] + chunk)
+                results.update(rows)
+        return results
+
+    def cancel(self, message_id):
+        with self._connection() as connection:
+            connection.execute(
+                "DELETE FROM messages WHERE id = ? AND status IN (?, ?)", (message_id, self.QUEUED, self.DONE))
+            connection.execute(
+                "UPDATE messages SET status = ?, payload = x'' WHERE id = ? AND status = ?",
+                (self.CANCELLED, message_id, self.CLAIMED))
+
+    def heartbeat(self, worker_id):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO workers (id, heartbeat) VALUES (?, ?)", (worker_id, time.time()))
+
+    def requeue_lost(self, timeout):
+        with self._connection() as connection:
+            # lost workers never complete cancelled messages
+            connection.execute(
+                "DELETE FROM messages WHERE status = ? AND worker NOT IN (SELECT id FROM workers WHERE heartbeat >= ?)",
+                (self.CANCELLED, time.time() - timeout))
+            cursor = connection.execute(
+                "UPDATE messages SET status = ?, worker = NULL WHERE status = ? AND worker NOT IN "
+                "(SELECT id FROM workers WHERE heartbeat >= ?)",
+                (self.QUEUED, self.CLAIMED, time.time() - timeout))
+            return cursor.rowcount
+
+
+class BrokerServer:
+    """
+    Serves a broker to `SocketBroker`s of other hosts over TCP. Every
+    connection is served by its own thread. Messages are pickled, so
+    clients are authenticated by `authkey` before anything is read.
+
+    :param address: (host, port) to listen on, port 0 picks a free one
+    """
+    METHODS = ("put", "claim", "complete", "fetch_results", "cancel", "heartbeat", "requeue_lost")
+
+    def __init__(self, broker: Broker, address=("localhost", 0), authkey: bytes = None):
+        if not authkey:
+            raise ValueError("authkey is required to serve a broker")
+        self.broker = broker
+        self.authkey = authkey
+        self._listener = Listener(address, authkey=authkey)
+        self.address = self._listener.address
+        self._closed = threading.Event()
+
+    def serve_forever(self):
+        while not self._closed.is_set():
+            try:
+                connection = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                if self._closed.is_set():
+                    break
+                logger.warning("Broker client rejected", exc_info=True)
+                continue
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+        self._listener.close()
+
+    def start(self):
+        """
+        Serves the broker from a daemon thread.
+
+        :return: the server
+        """
+        threading.Thread(target=self.serve_forever, name="broker-server", daemon=True).start()
+        return self
+
+    def _serve(self, connection):
+        with connection:
+            while True:
+                try:
+                    method, args = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if method not in self.METHODS:
+                        raise AttributeError(f"Broker has no method {method}")
+                    result = (True, getattr(self.broker, method)(*args))
+                except Exception as exc:
+                    result = (False, exc)
+                connection.send(result)
+
+    def close(self):
+        self._closed.set()
+        try:
+            # wakes up the accepting thread
+            Client(self.address, authkey=self.authkey).close()
+        except OSError:
+            pass
+
+
+class SocketBroker(Broker):
+    """
+    Broker served by a `BrokerServer` of another host. Every thread uses
+    its own connection, so a worker heartbeats while it runs a task.
+    """
+    def __init__(self, address, authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+        self._local = threading.local()
+
+    def _call(self, method, *args):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = Client(self.address, authkey=self.authkey)
+        try:
+            connection.send((method, args))
+            ok, value = connection.recv()
+        except (EOFError, OSError):
+            # connect again on the next call
+            self._local.connection = None
+            connection.close()
+            raise
+        if not ok:
+            raise value
+        return value
+
+    def put(self, payload):
+        return self._call("put", payload)
+
+    def claim(self, worker_id):
+        return self._call("claim", worker_id)
+
+    def complete(self, message_id, result):
+        self._call("complete", message_id, result)
+
+    def fetch_results(self, message_ids):
+        return self._call("fetch_results", list(message_ids))
+
+    def cancel(self, message_id):
+        self._call("cancel", message_id)
+
+    def heartbeat(self, worker_id):
+        self._call("heartbeat", worker_id)
+
+    def requeue_lost(self, timeout):
+        return self._call("requeue_lost", timeout)
+
+
+def _dump_result(ok, value):
+    try:
+        return pickle.dumps((ok, value))
+    except Exception:
+        if ok:
+            raise
+        return pickle.dumps((ok, RuntimeError("".join(traceback.format_exception_only(type(value), value)))))
+
+
+class BrokerExecutor(Executor):
+    """
+    `concurrent.futures` executor putting calls onto the broker. A poller
+    thread collects results and requeues calls of workers which stopped
+    sending heartbeats for `worker_timeout` seconds.
+    """
+    def __init__(self, broker: Broker, poll_interval=0.1, worker_timeout=30):
+        self.broker = broker
+        self.poll_interval = poll_interval
+        self.worker_timeout = worker_timeout
+        self.futures = dict()
+        self._lock = threading.Lock()
+        self._shutdown = threading.Event()
+        self._poller = threading.Thread(target=self._poll, name="broker-executor", daemon=True)
+        self._poller.start()
+
+    def submit(self, fn, *args, **kwargs):
+        if self._shutdown.is_set():
+            raise RuntimeError("cannot schedule new futures after shutdown")
+        future = Future()
+        message_id = self.broker.put(pickle.dumps((fn, args, kwargs)))
+        with self._lock:
+            self.futures[message_id] = future
+        return future
+
+    def _poll(self):
+        while not (self._shutdown.is_set() and not self.futures):
+            try:
+                self._collect()
+            except Exception as exc:
+                logger.error("Broker polling failed:", exc_info=exc)
+            self._shutdown.wait(self.poll_interval)
+
+    def _collect(self):
+        with self._lock:
+            futures = dict(self.futures)
+        for message_id, future in futures.items():
+            if future.cancelled():
+                self.broker.cancel(message_id)
+                self._forget(message_id)
+        requeued = self.broker.requeue_lost(self.worker_timeout)
+        if requeued:
+            logger.warning(f"{requeued} tasks of lost workers requeued")
+        for message_id, result in self.broker.fetch_results(futures).items():
+            future = self._forget(message_id)
+            if future is None or not future.set_running_or_notify_cancel():
+                continue
+            ok, value = pickle.loads(result)
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def _forget(self, message_id):
+        with self._lock:
+            return self.futures.pop(message_id, None)
+
+    def shutdown(self, wait=True, **kwargs):
+        self._shutdown.set()
+        if wait:
+            self._poller.join()
+
+
+class Worker:
+    """
+    Pulls calls from the broker, runs them and puts results back.
+    Heartbeats are sent from a separate thread so long calls keep the
+    worker alive.
+    """
+    def __init__(self, broker: Broker, worker_id=None, poll_interval=0.1, heartbeat_interval=5):
+        self.broker = broker
+        self.id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.should_stop = threading.Event()
+
+    def run(self):
+        self.broker.heartbeat(self.id)
+        heartbeat = threading.Thread(target=self._heartbeat, name=f"heartbeat-{self.id}", daemon=True)
+        heartbeat.start()
+        logger.info(f"Worker {self.id} started")
+        while not self.should_stop.is_set():
+            message = self.broker.claim(self.id)
+            if message is None:
+                self.should_stop.wait(self.poll_interval)
+                continue
+            self.execute(*message)
+        heartbeat.join()
+        logger.info(f"Worker {self.id} stopped")
+
+    def execute(self, message_id, payload):
+        try:
+            fn, args, kwargs = pickle.loads(payload)
+            result = _dump_result(True, fn(*args, **kwargs))
+        except Exception as exc:
+            result = _dump_result(False, exc)
+        self.broker.complete(message_id, result)
+
+    def _heartbeat(self):
+        while not self.should_stop.wait(self.heartbeat_interval):
+            self.broker.heartbeat(self.id)
+
+    def stop(self):
+        self.should_stop.set()
+
+
+def _address(value):
+    host, _, port = value.rpartition(":")
+    return host, int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m scheduler.distributed",
+                                     description="Runs a worker, or serves a queue to workers of other hosts.")
+    parser.add_argument("queue", nargs="?", help="SQLite queue file of this host")
+    parser.add_argument("--connect", type=_address, metavar="HOST:PORT", help="queue served by another host")
+    parser.add_argument("--serve", type=_address, metavar="HOST:PORT", help="serve the queue instead of running a worker")
+    args = parser.parse_args(argv)
+    if (args.queue is None) == (args.connect is None):
+        parser.error("give either a queue file or --connect")
+    if args.serve and args.connect:
+        parser.error("--serve needs a queue file")
+    authkey = os.environ.get("SCHEDULER_BROKER_KEY", "").encode()
+    if (args.serve or args.connect) and not authkey:
+        parser.error("set SCHEDULER_BROKER_KEY to authenticate workers")
+
+    logging.basicConfig(level=logging.INFO)
+    if args.serve:
+        server = BrokerServer(SQLiteBroker(args.queue), args.serve, authkey)
+        logger.info(f"Serving {args.queue} on {server.address}")
+        server.serve_forever()
+    elif args.connect:
+        Worker(SocketBroker(args.connect, authkey)).run()
+    else:
+        Worker(SQLiteBroker(args.queue)).run()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,114 @@
+import statistics
+
+from .storage import SQLiteStorage
+
+
+class RunHistory:
+    """
+    Keeps durations and statuses of the last runs of jobs and their tasks,
+    so runs are planned by how long tasks took before.
+    """
+    def record(self, job_name, started, wall_time, status, tasks):
+        """
+        :param tasks: list of (task id, seconds or None, status) of tasks run
+        """
+        raise NotImplementedError()
+
+    def task_durations(self, job_name):
+        """
+        :return: dict of lists of seconds of completed runs by task id, oldest first
+        """
+        raise NotImplementedError()
+
+    def job_durations(self, job_name):
+        """
+        :return: list of seconds of completed runs of the job, oldest first;
+            runs with skipped tasks are recorded as skipped and not listed
+        """
+        raise NotImplementedError()
+
+    def estimates(self, job_name):
+        """
+        :return: dict of expected seconds of tasks by their id, the median of recent runs
+        """
+        return {task_id: statistics.median(durations)
+                for task_id, durations in self.task_durations(job_name).items()}
+
+    def expected_duration(self, job_name):
+        """
+        :return: median seconds of recent completed runs of the job, None if there were none
+        """
+        durations = self.job_durations(job_name)
+        return statistics.median(durations) if durations else None
+
+
+class SQLiteRunHistory(SQLiteStorage, RunHistory):
+    """
+    Every job keeps a ring of `size` records: the record of a new run
+    replaces the oldest one, so the file does not grow with runs and an
+    append writes rows in place. Records of tasks share the slot of their
+    run and are deleted with it, so durations of tasks not run lately,
+    e.g. skipped ones, are forgotten too.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS job_history (
+            job TEXT NOT NULL,
+            slot INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            started REAL NOT NULL,
+            duration REAL,
+            status TEXT NOT NULL,
+            PRIMARY KEY (job, slot)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS task_history (
+            job TEXT NOT NULL,
+            task_id TEXT NOT NULL,
+            slot INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            started REAL NOT NULL,
+            duration REAL,
+            status TEXT NOT NULL,
+            PRIMARY KEY (job, task_id, slot)
+        ) WITHOUT ROWID;
+    """
+    COMPLETED = "completed"
+
+    def __init__(self, path, size=20, timeout=30):
+        """
+        :param size: number of runs kept for every job and task
+        """
+        super().__init__(path, timeout)
+        self.size = size
+
+    def record(self, job_name, started, wall_time, status, tasks):
+        with self._connection() as connection:
+            seq = connection.execute(
+                "SELECT COALESCE(MAX(seq), -1) + 1 FROM job_history WHERE job = ?", (job_name,)).fetchone()[0]
+            connection.execute(
+                "INSERT OR REPLACE INTO job_history (job, slot, seq, started, duration, status) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_name, seq % self.size, seq, started, wall_time, status))
+            connection.execute("DELETE FROM task_history WHERE job = ? AND slot = ?", (job_name, seq % self.size))
+            connection.executemany(
+                "INSERT OR REPLACE INTO task_history (job, task_id, slot, seq, started, duration, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((job_name, task_id, seq % self.size, seq, started, duration, task_status)
+                 for task_id, duration, task_status in tasks))
+
+    def task_durations(self, job_name):
+        durations = dict()
+        # rows of a smaller ring are kept until their slots are written again
+        rows = self._connect().execute(
+            "SELECT task_id, duration FROM task_history WHERE job = ? AND status = ? AND duration IS NOT NULL "
+            "AND seq > (SELECT MAX(seq) FROM job_history WHERE job = ?) - ? ORDER BY seq",
+            (job_name, self.COMPLETED, job_name, self.size))
+        for task_id, duration in rows:
+            durations.setdefault(task_id, []).append(duration)
+        return durations
+
+    def job_durations(self, job_name):
+        rows = self._connect().execute(
+            "SELECT duration FROM job_history WHERE job = ? AND status = ? AND duration IS NOT NULL "
+            "AND seq > (SELECT MAX(seq) FROM job_history WHERE job = ?) - ? ORDER BY seq",
+            (job_name, self.COMPLETED, job_name, self.size))
+        return [duration for duration, in rows]
@@ -1,9 +1,12 @@
 import datetime
 import logging
-import time
+import random
 
+from .clock import SYSTEM_CLOCK
 from .task import Task
 from .dag import DAG
+from .runner import JobRunner
+from .schedule import CronSchedule, IntervalSchedule
 from .utils import estimate_next_call, from_time
 from .typing import Unit
 
@@ -12,14 +15,51 @@ logger = logging.getLogger(__name__)
 
 
 class Job:
-    def __init__(self, name=None):
+    """
+    :param name: job name
+    :param max_instances: max number of runs of the job at once
+    :param coalesce: run once instead of once per missed fire time
+    :param skip_if_running: skip the fire time if `max_instances` runs are
+        in progress, otherwise the run waits for one of them to finish
+    :param jitter: max random delay in seconds added to every fire time
+        to spread jobs sharing one slot
+    :param state: `StateBackend` keeping task statuses, so a failed or
+        interrupted run is resumed by the next one
+    :param hooks: `RunHooks` notified about runs of the job
+    :param clock: `Clock` of fire times, the system clock by default;
+        the scheduler registering the job sets its own clock
+    :param deadline: seconds a run may take, then its unfinished tasks are
+        cancelled and `JobDeadlineError` is raised
+    :param pool: `ResourcePool` limiting tasks by their resources; the
+        scheduler registering the job sets its pool if the job has none
+    :param history: `RunHistory` of durations of runs, used to order tasks
+        and to warn about runs longer than the job interval; the scheduler
+        registering a named job sets its history if the job has none
+    """
+    def __init__(self, name=None, max_instances=1, coalesce=True, skip_if_running=True, jitter=0, state=None,
+                 hooks=(), clock=None, deadline=None, pool=None, history=None):
         self.name = name
         self.tasks = dict()
         self.dag = DAG()
         self.interval = 0
         self.unit = None
-        self.at_time = None
+        self.at_time = 0
+        self.calendar = None
         self.last_run = None
+        self.last_fire_time = None
+        self.max_instances = max_instances
+        self.coalesce = coalesce
+        self.skip_if_running = skip_if_running
+        self.jitter = jitter
+        self.state = state
+        self.instances = 0
+        self.backlog = 0
+        self.hooks = list(hooks)
+        self.run_stats = None
+        self.clock = clock or SYSTEM_CLOCK
+        self.deadline = deadline
+        self.pool = pool
+        self.history = history
 
     def add_task(self, task: Task):
         self.tasks[task.id] = task
@@ -28,27 +68,49 @@ class Job:
     def set_upstream(self, ind_task: Task, dep_task: Task):
         self.dag.add_edge(dep_task.id, ind_task.id)
 
+    def set_upstreams(self, edges):
+        self.dag.add_edges((dep_task.id, ind_task.id) for ind_task, dep_task in edges)
+
     def upstream(self, task: Task):
-        upstream = self.dag.upstream(task.id)
-        return set(t for t in self.tasks.values() if t.id in upstream)
+        return set(self.tasks[task_id] for task_id in self.dag.upstream(task.id))
 
     def get_independent(self):
-        independent = self.dag.get_independent()
-        return set(t for t in self.tasks.values() if t.id in independent)
-
-    def run(self):
-        self.last_run = time.time()
+        return set(self.tasks[task_id] for task_id in self.dag.get_independent())
+
+    def ready_sets(self):
+        for level in self.dag.ready_sets():
+            yield set(self.tasks[task_id] for task_id in level)
+
+    def run(self, executor=None, max_concurrency=None, hooks=(), fire_time=None):
+        """
+        Runs all tasks of the job. Independent tasks are run concurrently
+        if `executor` is given.
+
+        :param executor: `concurrent.futures.Executor`, tasks are run
+            one by one in the calling thread if not set
+        :param max_concurrency: max number of tasks submitted at once
+        :param hooks: `RunHooks` notified in addition to the job hooks
+        :param fire_time: scheduled time of the run
+        :return: dict of task results by task id
+        """
+        self.last_run = self.clock.time()
+        runner = JobRunner(self, executor, max_concurrency, hooks, fire_time)
         try:
-            for task_id in self.dag.travers():
-                task = self.tasks[task_id]
-                if task.pending:
-                    task.run()
+            return runner.run()
         finally:
-            self.reset_tasks()
-
-    def reset_tasks(self):
-        for task in self.tasks.values():
-            task.reset()
+            self.run_stats = runner.stats
+
+    async def run_async(self, executor=None, max_concurrency=None, hooks=(), fire_time=None):
+        """
+        Runs all tasks of the job on the current event loop. Coroutine tasks
+        are awaited, other tasks are run in `executor`.
+        """
+        self.last_run = self.clock.time()
+        runner = JobRunner(self, executor, max_concurrency, hooks, fire_time)
+        try:
+            return await runner.run_async()
+        finally:
+            self.run_stats = runner.stats
 
     def every(self, interval=1):
         self.interval = interval
@@ -66,22 +128,77 @@ class Job:
 
     @property
     def day(self):
-        raise NotImplementedError()
+        self.unit = Unit.DAY
+        return self
 
     def at(self, **kwargs):
         t = datetime.time(**kwargs)
         self.at_time = from_time(t)
+        return self
+
+    def cron(self, expression, timezone=None, blackouts=()):
+        """
+        Schedules the job by a cron expression instead of `every`:
+
+            >>> job.cron("0 9 * * MON-FRI", timezone="Europe/Berlin")
+
+        See `CronSchedule` for parameters.
+        """
+        self.calendar = CronSchedule(expression, timezone, blackouts)
+        return self
+
+    @property
+    def scheduled(self):
+        return self.calendar is not None or self.unit is not None
+
+    @property
+    def period(self):
+        return self.interval * Unit.seconds(self.unit)
+
+    @property
+    def schedule(self):
+        """
+        :return: `Schedule` of the job or None if it is not scheduled
+        """
+        if self.calendar is not None:
+            return self.calendar
+        if self.unit is not None:
+            return IntervalSchedule(self.period, self.at_time)
+        return None
+
+    def next_fire_time(self, t):
+        """
+        Returns the first fire time strictly after `t`, None if there is none.
+        """
+        return self.schedule.next_after(t)
+
+    def fire_times(self, start, end):
+        """
+        Yields fire times from `start` (a fire time) to `end` inclusive.
+        """
+        fire_time = start
+        while fire_time is not None and fire_time <= end:
+            yield fire_time
+            fire_time = self.next_fire_time(fire_time)
+
+    def start_time(self, fire_time):
+        return fire_time + random.uniform(0, self.jitter) if self.jitter else fire_time
 
     @property
     def next_run(self):
-        return estimate_next_call(time.time(), self.interval * Unit.seconds(self.unit)) + self.at_time - self.interval * Unit.seconds(self.unit)
+        if self.calendar is not None:
+            return self.calendar.previous(self.clock.time())
+        return estimate_next_call(self.clock.time(), self.interval * Unit.seconds(self.unit)) + self.at_time - self.interval * Unit.seconds(self.unit)
 
     @property
     def should_run(self):
         next_run = self.next_run
-        if self.last_run and self.last_run > next_run:
+        if next_run is None:
+            return False
+        last_run = self.last_fire_time if self.last_fire_time is not None else self.last_run
+        if last_run and last_run >= next_run:
             return False
-        return time.time() > next_run
+        return self.clock.time() >= next_run
 
     def __repr__(self):
         return f"<Job name={self.name!r}>"
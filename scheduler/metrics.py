@@ -0,0 +1,235 @@
+"""
+Structured metrics reported by running tasks.
+
+Task functions call `report` to attach metrics, e.g. the number of
+written rows, to the task instead of logging them:
+
+    >>> def save():
+    ...     rows = write()
+    ...     report(rows=rows)
+
+After the run metrics are available as `metrics` of the `TaskRun`
+passed to hooks. Every run task also gets `started`, `wall_time`,
+`cpu_time`, `process_max_rss` and `queue_latency` metrics, the last
+finished run of a job leaves its stats in `job.run_stats`.
+
+`process_max_rss` is the peak memory of the process running the task
+when it ended, not memory taken by the task: tasks sharing a worker
+process report the peak of the biggest task run so far. Only a task
+with a `timeout` runs in a process of its own.
+
+`RunHooks` are notified about finished tasks and job runs,
+`MetricsRegistry` aggregates them for Prometheus:
+
+    >>> registry = MetricsRegistry()
+    >>> scheduler.hooks.append(registry)
+    >>> registry.serve(9100)
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# thread CPU time is not available before Python 3.7
+thread_time = getattr(time, "thread_time", time.process_time)
+
+try:
+    from asyncio import current_task
+except ImportError:  # Python 3.6
+    current_task = asyncio.Task.current_task
+
+_local = threading.local()
+_task_metrics = dict()
+
+
+def report(**metrics):
+    """
+    Adds metrics of the task being run. Calls outside of a task are ignored.
+    """
+    collected = _task_metrics.get(current_async_task())
+    if collected is None:
+        collected = getattr(_local, "metrics", None)
+    if collected is None:
+        logger.debug(f"Metrics {metrics} are reported outside of a task, ignored")
+        return
+    collected.update(metrics)
+
+
+@contextmanager
+def collect(task=None):
+    """
+    Collects metrics reported inside the block into the yielded dict.
+
+    :param task: asyncio task to collect metrics of, metrics of the
+        current thread are collected if not set
+    """
+    metrics = dict()
+    if task is not None:
+        _task_metrics[task] = metrics
+        try:
+            yield metrics
+        finally:
+            del _task_metrics[task]
+        return
+    previous = getattr(_local, "metrics", None)
+    _local.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _local.metrics = previous
+
+
+def current_async_task():
+    """
+    :return: asyncio task being run or None out of an event loop
+    """
+    try:
+        return current_task()
+    except RuntimeError:
+        return None
+
+
+def max_rss():
+    """
+    :return: peak resident set size of the process in bytes or None
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class RunHooks:
+    """
+    Callbacks of job runs. Exceptions raised by hooks are logged and ignored.
+    """
+    def task_finished(self, job, task):
+        """
+        Called when a task run by the job finished.
+
+        :param task: `TaskRun` with `status` and `metrics` of the task in the run
+        """
+
+    def job_finished(self, job, stats):
+        """
+        Called when a job run finished.
+
+        :param stats: dict with `started`, `wall_time`, `status`,
+            `critical_path` (task ids), `critical_path_time`, `process_max_rss`,
+            `queue_latency` if the run was fired by a scheduler and
+            `expected_time` if the job has a `RunHistory`
+        """
+
+    def pending_finished(self, jobs, wall_time):
+        """
+        Called when `Scheduler.run_pending` ran `jobs`.
+        """
+
+
+def notify(hooks, event, *args):
+    for hook in hooks:
+        try:
+            getattr(hook, event)(*args)
+        except Exception as exc:
+            logger.error(f"Hook {hook} {event} failed:", exc_info=exc)
+
+
+class MetricsRegistry(RunHooks):
+    """
+    Aggregates run metrics and renders them in the Prometheus text format.
+    """
+    def __init__(self):
+        self.counters = defaultdict(float)
+        self.gauges = dict()
+        self._lock = threading.Lock()
+
+    def _inc(self, name, labels, value=1):
+        self.counters[(name, labels)] += value
+
+    def _observe(self, name, labels, value):
+        if value is not None:
+            self._inc(f"{name}_sum", labels, value)
+            self._inc(f"{name}_count", labels)
+
+    def task_finished(self, job, task):
+        labels = (("job", str(job.name)), ("task", str(task.id)))
+        with self._lock:
+            self._inc("scheduler_task_runs_total", labels + (("status", task.status),))
+            self._observe("scheduler_task_wall_seconds", labels, task.metrics.get("wall_time"))
+            self._observe("scheduler_task_cpu_seconds", labels, task.metrics.get("cpu_time"))
+            self._observe("scheduler_task_queue_latency_seconds", labels, task.metrics.get("queue_latency"))
+
+    def job_finished(self, job, stats):
+        labels = (("job", str(job.name)),)
+        with self._lock:
+            self._inc("scheduler_job_runs_total", labels + (("status", stats["status"]),))
+            self._observe("scheduler_job_wall_seconds", labels, stats["wall_time"])
+            self._observe("scheduler_job_queue_latency_seconds", labels, stats.get("queue_latency"))
+            self.gauges[("scheduler_job_critical_path_seconds", labels)] = stats["critical_path_time"]
+            self.gauges[("scheduler_job_last_run_timestamp_seconds", labels)] = stats["started"]
+            if stats["process_max_rss"] is not None:
+                self.gauges[("process_max_rss_bytes", ())] = stats["process_max_rss"]
+
+    def pending_finished(self, jobs, wall_time):
+        with self._lock:
+            self._observe("scheduler_run_pending_seconds", (), wall_time)
+            self._inc("scheduler_run_pending_jobs_total", (), len(jobs))
+
+    def render(self):
+        """
+        :return: metrics in the Prometheus text exposition format
+        """
+        with self._lock:
+            samples = sorted(self.counters.items()) + sorted(self.gauges.items())
+        lines = []
+        for (name, labels), value in samples:
+            if labels:
+                label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+                lines.append(f"{name}{{{label_text}}} {value}")
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host=""):
+        """
+        Serves metrics on `http://host:port/metrics` from a daemon thread.
+
+        :return: the HTTP server, call its `shutdown` to stop it
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"Metrics are served on port {server.server_address[1]}")
+        return server
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
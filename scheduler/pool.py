@@ -0,0 +1,68 @@
+import threading
+
+from collections import defaultdict
+from concurrent.futures import Future
+
+
+class ResourcePool:
+    """
+    Capacities of named resources shared by runs of jobs. Tasks declare
+    amounts they need and are started only while the amounts fit:
+
+        >>> pool = ResourcePool(spark=2, network=8, memory=16)
+        >>> Task(convert, "convert", job, resources={"spark": 1, "memory": 6})
+
+    Resources without a capacity are not limited.
+    """
+    def __init__(self, **capacities):
+        self.capacities = capacities
+        self.used = defaultdict(float)
+        self.releases = 0
+        self._lock = threading.Lock()
+        self._waiters = []
+
+    def check(self, requirements):
+        """
+        Raises ValueError if the requirements can never be satisfied.
+        """
+        for name, amount in requirements.items():
+            if name in self.capacities and amount > self.capacities[name]:
+                raise ValueError(f"{amount} of {name!r} exceeds its capacity {self.capacities[name]}")
+
+    def acquire(self, requirements):
+        """
+        :return: True if the amounts are taken, False if they don't fit now
+        """
+        with self._lock:
+            for name, amount in requirements.items():
+                if name in self.capacities and self.used[name] + amount > self.capacities[name]:
+                    return False
+            for name, amount in requirements.items():
+                self.used[name] += amount
+            return True
+
+    def release(self, requirements):
+        with self._lock:
+            for name, amount in requirements.items():
+                self.used[name] -= amount
+            self.releases += 1
+            waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            waiter.set_result(None)
+
+    def released(self, since=None):
+        """
+        :param since: value of `releases` seen by the caller, the future is
+            completed at once if there were releases after it
+        :return: `concurrent.futures.Future` completed by the next release
+        """
+        future = Future()
+        with self._lock:
+            if since is not None and since != self.releases:
+                future.set_result(None)
+            else:
+                self._waiters.append(future)
+        return future
+
+    def __repr__(self):
+        return f"<ResourcePool capacities={self.capacities}>"
@@ -0,0 +1,96 @@
+import logging
+import threading
+
+from .clock import SYSTEM_CLOCK
+
+logger = logging.getLogger(__name__)
+
+
+class LazyResource:
+    """
+    Expensive value shared by jobs, e.g. a SparkSession. It is created on
+    first use and closed by the scheduler owning it after `idle_timeout`
+    seconds without users, the next use creates it again:
+
+        >>> session = LazyResource(create_session, close=lambda s: s.stop(), idle_timeout=600)
+        >>> scheduler.add_resource(session)
+        >>> def task():
+        ...     with session as spark:
+        ...         ...
+    """
+    def __init__(self, factory, close=None, idle_timeout=None, name=None, clock=None):
+        """
+        :param factory: function creating the value
+        :param close: function closing the value
+        :param idle_timeout: seconds without users before the value is closed,
+            never closed by the scheduler if not set
+        :param name: name used in logs, the factory name by default
+        :param clock: `Clock` measuring idle time
+        """
+        self.factory = factory
+        self.on_close = close
+        self.idle_timeout = idle_timeout
+        self.name = name or getattr(factory, "__name__", repr(factory))
+        self.clock = clock or SYSTEM_CLOCK
+        self.users = 0
+        self.last_used = None
+        self._value = None
+        self._created = False
+        self._lock = threading.RLock()
+
+    @property
+    def created(self):
+        return self._created
+
+    def get(self):
+        """
+        :return: the value, it is created if needed
+        """
+        with self._lock:
+            if not self._created:
+                started = self.clock.monotonic()
+                self._value = self.factory()
+                self._created = True
+                logger.info(f"Resource {self.name} created in {self.clock.monotonic() - started:.2f}s")
+            self.last_used = self.clock.monotonic()
+            return self._value
+
+    def __enter__(self):
+        with self._lock:
+            value = self.get()
+            self.users += 1
+            return value
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        with self._lock:
+            self.users -= 1
+            self.last_used = self.clock.monotonic()
+
+    def expire(self, now=None):
+        """
+        Closes the value if it is not used for `idle_timeout` seconds.
+
+        :param now: monotonic time
+        :return: True if the value was closed
+        """
+        with self._lock:
+            if not self._created or self.users or self.idle_timeout is None:
+                return False
+            now = self.clock.monotonic() if now is None else now
+            if now - self.last_used < self.idle_timeout:
+                return False
+            logger.info(f"Resource {self.name} is idle for {now - self.last_used:.0f}s")
+            self.close()
+            return True
+
+    def close(self):
+        with self._lock:
+            if not self._created:
+                return
+            value, self._value, self._created = self._value, None, False
+            if self.on_close:
+                self.on_close(value)
+            logger.info(f"Resource {self.name} closed")
+
+    def __repr__(self):
+        return f"<LazyResource name={self.name!r} created={self._created}>"
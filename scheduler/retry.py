@@ -0,0 +1,43 @@
+import random
+
+
+class RetryPolicy:
+    """
+    Retries of a failed task with exponential backoff:
+
+        >>> Task(download, "download", job, retry=RetryPolicy(max_attempts=5, retry_on=(IOError,)))
+
+    :param max_attempts: max number of attempts including the first one
+    :param backoff: seconds before the second attempt
+    :param multiplier: factor of the backoff for every next attempt
+    :param max_backoff: max seconds between attempts
+    :param jitter: fraction of the backoff taken off at random, so tasks
+        failed at once are not retried at once
+    :param retry_on: exception types to retry, other failures are final
+    """
+    def __init__(self, max_attempts=3, backoff=1.0, multiplier=2.0, max_backoff=300.0, jitter=0.5,
+                 retry_on=(Exception,)):
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts must be at least 1, got {max_attempts}")
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.multiplier = multiplier
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_on = tuple(retry_on)
+
+    def should_retry(self, attempt, exc):
+        """
+        :param attempt: number of the failed attempt starting from 1
+        """
+        return attempt < self.max_attempts and isinstance(exc, self.retry_on)
+
+    def delay(self, attempt):
+        """
+        :return: seconds to wait after the failed attempt
+        """
+        delay = min(self.max_backoff, self.backoff * self.multiplier ** (attempt - 1))
+        return delay - random.uniform(0, delay * self.jitter)
+
+    def __repr__(self):
+        return f"<RetryPolicy max_attempts={self.max_attempts} backoff={self.backoff}>"
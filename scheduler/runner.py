@@ -0,0 +1,610 @@
+import asyncio
+import functools
+import heapq
+import itertools
+import logging
+import statistics
+import threading
+import time
+
+from collections import ChainMap
+from concurrent.futures import CancelledError, Executor, Future, FIRST_COMPLETED, wait
+
+from .metrics import max_rss, notify
+from .task import FanOut, JobDeadlineError, Task, TaskRun, SkipDownstream, execute, execute_async
+
+logger = logging.getLogger(__name__)
+
+
+class InlineExecutor(Executor):
+    """
+    Runs submitted callables immediately in the calling thread.
+    """
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+        return future
+
+
+class _PoolCall:
+    """
+    Call holding resources of the pool until it is over. The loop cancels
+    its own future of an executor call at once, while the call may still be
+    running, so resources are released by the call itself, or by `cancel`
+    if the call is cancelled before it started.
+    """
+    def __init__(self, func, pool, resources):
+        self.func = func
+        self.pool = pool
+        self.resources = resources
+        self.started = False
+        self.released = False
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            if self.released:
+                raise CancelledError()
+            self.started = True
+        try:
+            return self.func()
+        finally:
+            self.release()
+
+    def cancel(self, future):
+        if future.cancelled():
+            with self._lock:
+                if self.started:
+                    return
+            self.release()
+
+    def release(self):
+        with self._lock:
+            if self.released:
+                return
+            self.released = True
+        self.pool.release(self.resources)
+
+
+class JobRunner:
+    """
+    Runs tasks of a job dispatching every task to the executor as soon as
+    all of its upstream tasks are completed.
+
+    Statuses and metrics of tasks are kept by the runner in `task_runs`,
+    tasks of the job are not changed, so runs of one job may overlap.
+    They are changed only by the thread (or the event loop) calling `run`
+    (`run_async`), executor workers just call task functions.
+    Ready tasks are started by priority, then by the length of the longest
+    chain of tasks they start, so the critical path is not delayed by
+    short side branches. A task needing `resources` of the job pool is
+    started only while they fit; other ready tasks may go first meanwhile.
+
+    A `FanOut` is expanded into sub-tasks kept by the runner in
+    `sub_tasks`, so the job and its DAG are the same for every run.
+
+    Failed tasks with a `RetryPolicy` are put back to the ready queue
+    after their backoff, so waiting for a retry does not hold a worker.
+
+    When the job deadline is passed, running coroutines are cancelled and
+    other tasks of the run are cancelled too. Tasks with a timeout are not
+    given more time than remains before the deadline; functions run
+    without a timeout can't be stopped and are abandoned.
+
+    With a `RunHistory`, tasks are expected to take as long as they took
+    on recent runs, which orders ready tasks and predicts the run time.
+    Durations of tasks run are appended to the history when the run ends.
+
+    :param hooks: `RunHooks` notified in addition to the job hooks
+    :param fire_time: scheduled time of the run to measure its queue latency
+    """
+    def __init__(self, job, executor=None, max_concurrency=None, hooks=(), fire_time=None):
+        self.job = job
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.hooks = list(job.hooks) + list(hooks)
+        self.fire_time = fire_time
+        self.started = None
+        self.stats = None
+        self.submitted = dict()
+        self.durations = dict()
+        self.task_runs = {task_id: TaskRun(task) for task_id, task in job.tasks.items()}
+        self.sub_tasks = dict()
+        self.tasks = ChainMap(self.sub_tasks, job.tasks)
+        # sub-tasks by their fan-out, and the fan-out by its sub-task
+        self.expansions = dict()
+        self.parents = dict()
+        self.in_degree = job.dag.in_degree()
+        self.pool = job.pool
+        if self.pool is not None:
+            for task in job.tasks.values():
+                self.pool.check(task.resources)
+                if isinstance(task, FanOut):
+                    self.pool.check(task.map_options["resources"])
+        self._counter = itertools.count()
+        self.history = job.history
+        self.estimates = dict()
+        if self.history is not None:
+            if job.name is None:
+                raise ValueError(f"Job {job} must have a name to keep its history")
+            self.estimates = self.history.estimates(job.name)
+        # tasks never run before are expected to take as long as a typical task
+        self.default_estimate = statistics.median(self.estimates.values()) if self.estimates else 1
+        self.path_lengths = self.estimate_path_lengths()
+        self.ready = []
+        for task_id, degree in self.in_degree.items():
+            if degree == 0:
+                self.push_ready(task_id)
+        self.blocked = False
+        self.releases = None
+        self.running = dict()
+        self.attempts = dict()
+        self.delayed = []
+        self.deadline = None
+        self.error = None
+        self.state = job.state
+        self.run_state = None
+        self.expected_time = None
+        self.results = dict()
+        self.cache_keys = dict()
+        self.consumed = set(task_id for task in job.tasks.values() for task_id in task.inputs)
+
+    def begin(self):
+        self.started = self.job.clock.time()
+        if self.job.deadline is not None:
+            self.deadline = self.job.clock.monotonic() + self.job.deadline
+        self.check_overrun()
+        if self.state is None:
+            return
+        if self.job.name is None:
+            raise ValueError(f"Job {self.job} must have a name to keep its state")
+        self.run_state = self.state.begin_run(self.job.name)
+        if self.run_state.resumed:
+            logger.info(f"Job {self.job} resumes run {self.run_state.run_id}")
+
+    def end(self, completed):
+        if self.run_state is not None:
+            self.state.end_run(self.run_state.run_id, self.state.COMPLETED if completed else self.state.FAILED)
+        critical_path, critical_path_time = self.critical_path()
+        self.stats = dict(
+            started=self.started,
+            wall_time=self.job.clock.time() - self.started,
+            status=Task.COMPLETED if completed else Task.FAILED,
+            critical_path=critical_path,
+            critical_path_time=critical_path_time,
+            process_max_rss=max_rss(),
+        )
+        if self.fire_time is not None:
+            self.stats["queue_latency"] = self.started - self.fire_time
+        if self.expected_time is not None:
+            self.stats["expected_time"] = self.expected_time
+        self.append_history()
+        notify(self.hooks, "job_finished", self.job, self.stats)
+
+    def estimate(self, task_id):
+        """
+        :return: expected run time of the task, every task counts the same without history
+        """
+        return self.estimates.get(task_id, self.default_estimate)
+
+    def estimate_path_lengths(self):
+        """
+        :return: dict of expected run times of the longest chains of tasks by their first task
+        """
+        lengths = dict()
+        for task_id in reversed(list(self.job.dag.travers())):
+            downstream = (lengths[dep_id] for dep_id in self.job.dag.direct_downstream(task_id))
+            lengths[task_id] = self.estimate(task_id) + max(downstream, default=0)
+        return lengths
+
+    def push_ready(self, task_id):
+        task = self.tasks[task_id]
+        key = (-task.priority, -self.path_lengths.get(task_id, 0), next(self._counter), task_id)
+        heapq.heappush(self.ready, key)
+
+    def critical_path(self):
+        """
+        :return: (task ids, seconds) of the longest chain of tasks by wall time
+        """
+        return self.longest_path(lambda task_id: self.durations.get(task_id, 0))
+
+    def expected_critical_path(self):
+        """
+        :return: (task ids, seconds) of the longest chain of tasks by their estimates
+        """
+        return self.longest_path(self.estimate)
+
+    def longest_path(self, duration):
+        lengths = dict()
+        previous = dict()
+        for task_id in self.job.dag.travers():
+            upstream = self.job.dag.direct_upstream(task_id)
+            if task_id in self.expansions:
+                # sub-tasks go after all inputs of the fan-out
+                sub_task_upstream = max(upstream, key=lengths.__getitem__, default=None)
+                for sub_task in self.expansions[task_id]:
+                    previous[sub_task.id] = sub_task_upstream
+                    lengths[sub_task.id] = duration(sub_task.id) + (
+                        lengths[sub_task_upstream] if sub_task_upstream is not None else 0)
+                upstream = [sub_task.id for sub_task in self.expansions[task_id]] or upstream
+            upstream = max(upstream, key=lengths.__getitem__, default=None)
+            previous[task_id] = upstream
+            lengths[task_id] = duration(task_id) + (lengths[upstream] if upstream is not None else 0)
+        if not lengths:
+            return [], 0
+        task_id = max(lengths, key=lengths.__getitem__)
+        total = lengths[task_id]
+        path = []
+        while task_id is not None:
+            path.append(task_id)
+            task_id = previous[task_id]
+        return path[::-1], total
+
+    def interval(self):
+        """
+        :return: seconds before the next fire time of the job, None if it is not known
+        """
+        if self.job.unit is not None:
+            return self.job.period
+        if self.job.calendar is not None and self.fire_time is not None:
+            next_fire_time = self.job.next_fire_time(self.fire_time)
+            if next_fire_time is not None:
+                return next_fire_time - self.fire_time
+        return None
+
+    def check_overrun(self):
+        """
+        Warns if the run is expected to last past the next fire time. The
+        expectation is the longer of recent completed runs of the job, runs
+        with skipped tasks left out, and the critical path by task estimates
+        with every task run.
+        """
+        if self.history is None:
+            return
+        expected = [self.history.expected_duration(self.job.name)]
+        if self.estimates:
+            expected.append(self.expected_critical_path()[1])
+        self.expected_time = max((t for t in expected if t is not None), default=None)
+        interval = self.interval()
+        if interval and self.expected_time is not None and self.expected_time > interval:
+            logger.warning(f"Job {self.job} is expected to take {self.expected_time:.1f} seconds, "
+                           f"longer than its interval of {interval} seconds")
+
+    def append_history(self):
+        if self.history is None:
+            return
+        tasks = [(task_id, self.durations.get(task_id), self.task_runs[task_id].status)
+                 for task_id in self.submitted]
+        status = self.stats["status"]
+        # runs with nothing to do are not taken as the expected run time
+        if status == Task.COMPLETED and any(task_run.status == Task.SKIPPED for task_run in self.task_runs.values()):
+            status = Task.SKIPPED
+        try:
+            self.history.record(self.job.name, self.started, self.stats["wall_time"], status, tasks)
+        except Exception as exc:
+            logger.error(f"History of job {self.job} is not recorded:", exc_info=exc)
+
+    def record(self, task_run, result=None):
+        if self.run_state is not None:
+            self.state.set_status(self.run_state.run_id, task_run.id, task_run.status, result)
+
+    def run(self):
+        if self.executor is None:
+            self.executor = InlineExecutor()
+            self.max_concurrency = 1
+
+        def submit(task, args):
+            future = self.executor.submit(execute, task.task, *args, timeout=self.timeout(task))
+            self.free_when_done(task, future)
+            return future
+
+        self.begin()
+        try:
+            while self.ready or self.running or self.delayed:
+                self.submit_ready(submit)
+                timeout = self.wait_timeout()
+                waiting = set(self.running)
+                if self.blocked:
+                    waiting.add(self.pool.released(self.releases))
+                if waiting:
+                    done, _ = wait(waiting, timeout=timeout, return_when=FIRST_COMPLETED)
+                else:
+                    if self.delayed:
+                        self.job.clock.blocking_sleep(timeout)
+                    done = ()
+                if not self.check_deadline():
+                    for future in done:
+                        if future in self.running:
+                            self.finish(self.running.pop(future), future)
+                self.release_delayed()
+        except BaseException:
+            self.cancel_running()
+            self.end(completed=False)
+            raise
+        self.end(completed=self.error is None)
+        if self.error:
+            raise self.error
+        return self.results
+
+    async def run_async(self):
+        """
+        Runs coroutine tasks on the current event loop and other tasks
+        in the executor (the loop default executor if not set).
+        """
+        loop = asyncio.get_event_loop()
+
+        def submit(task, args):
+            if task.is_coroutine:
+                future = asyncio.ensure_future(execute_async(task.task, *args, timeout=self.timeout(task)))
+                # a cancelled coroutine is done when it has stopped
+                self.free_when_done(task, future)
+                return future
+            call = functools.partial(execute, task.task, *args, timeout=self.timeout(task))
+            if self.pool is None or not task.resources:
+                return loop.run_in_executor(self.executor, call)
+            call = _PoolCall(call, self.pool, task.resources)
+            future = loop.run_in_executor(self.executor, call)
+            future.add_done_callback(call.cancel)
+            return future
+
+        self.begin()
+        try:
+            while self.ready or self.running or self.delayed:
+                self.submit_ready(submit)
+                timeout = self.wait_timeout()
+                waiting = set(self.running)
+                if self.blocked:
+                    waiting.add(asyncio.wrap_future(self.pool.released(self.releases)))
+                if waiting:
+                    done, _ = await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                else:
+                    if self.delayed:
+                        await self.job.clock.sleep(timeout)
+                    done = ()
+                if not self.check_deadline():
+                    for future in done:
+                        if future in self.running:
+                            self.finish(self.running.pop(future), future)
+                self.release_delayed()
+        except BaseException:
+            self.cancel_running()
+            self.end(completed=False)
+            raise
+        self.end(completed=self.error is None)
+        if self.error:
+            raise self.error
+        return self.results
+
+    def cancel_running(self):
+        # resources are released when cancelled calls are over, see `free_when_done`
+        for future in self.running:
+            future.cancel()
+
+    def admit(self, task):
+        """
+        :return: True if resources needed by the task are taken from the pool
+        """
+        return self.pool is None or not task.resources or self.pool.acquire(task.resources)
+
+    def free_when_done(self, task, future):
+        """
+        Releases resources of the task when its call is over. A cancelled
+        call of a thread may still be running, so it holds them till then.
+        """
+        if self.pool is not None and task.resources:
+            future.add_done_callback(lambda _: self.pool.release(task.resources))
+
+    def remaining(self):
+        """
+        :return: seconds before the deadline or None if there is no deadline
+        """
+        if self.deadline is None:
+            return None
+        return max(0, self.deadline - self.job.clock.monotonic())
+
+    def timeout(self, task):
+        remaining = self.remaining()
+        if task.timeout is None:
+            return None
+        return task.timeout if remaining is None else min(task.timeout, remaining)
+
+    def wait_timeout(self):
+        """
+        :return: seconds before the next retry or the deadline, None to wait for tasks only
+        """
+        timeouts = [self.remaining()]
+        if self.delayed:
+            timeouts.append(max(0, self.delayed[0][0] - self.job.clock.monotonic()))
+        timeouts = [timeout for timeout in timeouts if timeout is not None]
+        return min(timeouts) if timeouts else None
+
+    def release_delayed(self):
+        now = self.job.clock.monotonic()
+        while self.delayed and self.delayed[0][0] <= now:
+            _, _, task_id = heapq.heappop(self.delayed)
+            self.push_ready(task_id)
+
+    def check_deadline(self):
+        """
+        Cancels the run if the deadline is passed, tasks finished at the
+        deadline are cancelled as well.
+
+        :return: True if the run is cancelled
+        """
+        if self.deadline is None or self.job.clock.monotonic() < self.deadline:
+            return False
+        error = JobDeadlineError(f"Job {self.job} is not completed within {self.job.deadline} seconds")
+        logger.error(str(error))
+        self.cancel_running()
+        for task_run in list(self.running.values()) + [self.task_runs[task_id] for _, _, task_id in self.delayed]:
+            task_run.cancel()
+            self.record(task_run)
+            self.cancel_downstream(task_run)
+        for *_, task_id in self.ready:
+            self.cancel_downstream(self.task_runs[task_id])
+            self.task_runs[task_id].cancel()
+            self.record(self.task_runs[task_id])
+        self.running.clear()
+        self.delayed.clear()
+        self.ready.clear()
+        if self.error is None:
+            self.error = error
+        return True
+
+    @property
+    def saturated(self):
+        return self.max_concurrency is not None and len(self.running) >= self.max_concurrency
+
+    def submit_ready(self, submit):
+        blocked = []
+        self.releases = self.pool.releases if self.pool is not None else None
+        while self.ready and not self.saturated:
+            task = self.tasks[heapq.heappop(self.ready)[-1]]
+            reducing = task.id in self.expansions
+            task_run = self.task_runs[task.id]
+            if not reducing and self.completed_before(task):
+                logger.info(f"Task {task} was completed by run {self.run_state.run_id}, skipped")
+                self.complete(task_run, self.run_state.results.get(task.id))
+                continue
+            if reducing:
+                args = [[self.results[sub_task.id] for sub_task in self.expansions[task.id]]]
+            else:
+                args = task.arguments(self.results)
+            if not reducing:
+                hit, result = self.cached(task, args)
+                if hit:
+                    logger.info(f"Task {task} result is taken from cache, skipped")
+                    self.complete(task_run, result)
+                    continue
+                if isinstance(task, FanOut):
+                    self.expand(task, args)
+                    continue
+            if not self.admit(task):
+                blocked.append(task)
+                continue
+            task_run.set_running()
+            self.record(task_run)
+            self.attempts[task.id] = self.attempts.get(task.id, 0) + 1
+            # compared with the start time taken by the worker, so it is not virtual
+            self.submitted[task.id] = time.time()
+            self.running[submit(task, args)] = task_run
+        for task in blocked:
+            self.push_ready(task.id)
+        self.blocked = bool(blocked)
+
+    def expand(self, task, args):
+        """
+        Adds sub-tasks of the fan-out to the run, the fan-out itself is
+        ready again when all of them are completed.
+        """
+        try:
+            sub_tasks = task.expand(args)
+        except Exception as exc:
+            self.fail(self.task_runs[task.id], exc)
+            return
+        logger.info(f"Task {task} is expanded into {len(sub_tasks)} tasks")
+        self.expansions[task.id] = sub_tasks
+        self.in_degree[task.id] = len(sub_tasks)
+        for sub_task in sub_tasks:
+            self.sub_tasks[sub_task.id] = sub_task
+            self.parents[sub_task.id] = task.id
+            self.task_runs[sub_task.id] = TaskRun(sub_task)
+            self.in_degree[sub_task.id] = 0
+            self.path_lengths[sub_task.id] = self.estimate(sub_task.id) + self.path_lengths[task.id]
+            self.consumed.add(sub_task.id)
+            self.push_ready(sub_task.id)
+        if not sub_tasks:
+            self.push_ready(task.id)
+
+    def completed_before(self, task):
+        return (
+            task.idempotent
+            and self.run_state is not None
+            and self.run_state.statuses.get(task.id) == Task.COMPLETED
+            and (task.id in self.run_state.results or task.id not in self.consumed)
+        )
+
+    def cached(self, task, args):
+        if task.cache is None:
+            return False, None
+        key = task.cache.key(task, args)
+        if key is None:
+            return False, None
+        self.cache_keys[task.id] = key
+        return task.cache.get(key)
+
+    def complete(self, task_run, result):
+        task_run.complete()
+        self.results[task_run.id] = result
+        self.record(task_run, result)
+        self.release(task_run)
+
+    def finish(self, task_run, future):
+        task = task_run.task
+        exc = future.exception()
+        if exc is None:
+            result, task_run.metrics = future.result()
+            task_run.metrics["queue_latency"] = task_run.metrics["started"] - self.submitted[task.id]
+            task_run.metrics["attempts"] = self.attempts[task.id]
+            self.durations[task.id] = task_run.metrics["wall_time"]
+            logger.debug(f"Task {task} metrics: {task_run.metrics}")
+            if task.id in self.cache_keys:
+                task.cache.put(self.cache_keys[task.id], result)
+            self.complete(task_run, result)
+        elif isinstance(exc, SkipDownstream):
+            logger.info(f"Task {task} skips its downstream tasks: {exc}")
+            task_run.complete()
+            self.record(task_run)
+            self.skip_downstream(task_run)
+        elif task.should_retry(self.attempts[task.id], exc):
+            delay = task.retry_delay(self.attempts[task.id], exc)
+            task_run.reset()
+            self.record(task_run)
+            heapq.heappush(self.delayed, (self.job.clock.monotonic() + delay, next(self._counter), task.id))
+            return
+        else:
+            self.fail(task_run, exc)
+        notify(self.hooks, "task_finished", self.job, task_run)
+
+    def fail(self, task_run, exc):
+        error = task_run.fail(exc)
+        self.record(task_run)
+        self.cancel_downstream(task_run)
+        if self.error is None:
+            self.error = error
+
+    def direct_downstream(self, task_id):
+        if task_id in self.parents:
+            return (self.parents[task_id],)
+        return self.job.dag.direct_downstream(task_id)
+
+    def downstream(self, task_id):
+        if task_id in self.parents:
+            return self.job.dag.downstream(self.parents[task_id]) | {self.parents[task_id]}
+        return self.job.dag.downstream(task_id)
+
+    def release(self, task_run):
+        for task_id in self.direct_downstream(task_run.id):
+            self.in_degree[task_id] -= 1
+            if self.in_degree[task_id] == 0:
+                self.push_ready(task_id)
+
+    def skip_downstream(self, task_run):
+        for task_id in self.downstream(task_run.id):
+            dep_run = self.task_runs[task_id]
+            if dep_run.pending:
+                dep_run.skip()
+                self.record(dep_run)
+
+    def cancel_downstream(self, task_run):
+        for task_id in self.downstream(task_run.id):
+            dep_run = self.task_runs[task_id]
+            if dep_run.pending:
+                logger.warning(f"Task {dep_run.task} cancelled since {task_run.task} failed")
+                dep_run.cancel()
+                self.record(dep_run)
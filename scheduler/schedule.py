@@ -0,0 +1,312 @@
+"""
+Schedules computing fire times of jobs.
+
+`CronSchedule` compiles a cron expression into bitmasks of allowed
+seconds, minutes, hours, days, months and weekdays. The next fire time is
+found by jumping between set bits, so it costs a few operations per
+skipped day rather than a scan of every second:
+
+    >>> schedule = CronSchedule("30 9 * * MON-FRI", timezone="Europe/Berlin")
+    >>> schedule.next_after(time.time())
+    >>> list(schedule.fire_times(time.time(), 5))
+"""
+import datetime
+
+from .utils import estimate_next_call
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+# a fire time is searched for at most this number of days
+MAX_DAYS = 366 * 8
+
+ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+WEEKDAYS = ["SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT"]
+
+ONE_SECOND = datetime.timedelta(seconds=1)
+ONE_DAY = datetime.timedelta(days=1)
+
+
+class Schedule:
+    def next_after(self, t):
+        """
+        :return: the first fire time strictly after `t` or None if there is none
+        """
+        raise NotImplementedError()
+
+    def previous(self, t):
+        """
+        :return: the last fire time not after `t` or None if there is none
+        """
+        raise NotImplementedError()
+
+    def fire_times(self, t, count):
+        """
+        Yields up to `count` fire times after `t`.
+        """
+        for _ in range(count):
+            t = self.next_after(t)
+            if t is None:
+                return
+            yield t
+
+
+class IntervalSchedule(Schedule):
+    """
+    Fire times `offset` seconds after every multiple of `period` since the epoch.
+    """
+    def __init__(self, period, offset=0):
+        self.period = period
+        self.offset = offset
+
+    def next_after(self, t):
+        fire_time = estimate_next_call(t, self.period) - self.period + self.offset
+        if fire_time <= t:
+            fire_time += self.period
+        return fire_time
+
+    def previous(self, t):
+        return self.next_after(t) - self.period
+
+    def __repr__(self):
+        return f"<IntervalSchedule period={self.period} offset={self.offset}>"
+
+
+def _timezone(timezone):
+    if timezone is None:
+        return datetime.timezone.utc
+    if isinstance(timezone, datetime.tzinfo):
+        return timezone
+    if ZoneInfo is None:
+        raise ValueError(f"Time zone names need Python 3.9+, pass a tzinfo instead of {timezone!r}")
+    return ZoneInfo(timezone)
+
+
+def _parse_value(value, names, low):
+    value = value.upper()
+    if value in names:
+        return names.index(value) + low
+    return int(value)
+
+
+def _parse_field(field, low, high, names=()):
+    """
+    :return: bitmask of values allowed by the cron field
+    """
+    mask = 0
+    for part in field.split(","):
+        value_range, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if value_range == "*":
+            start, end = low, high
+        else:
+            start, _, end = value_range.partition("-")
+            start = _parse_value(start, names, low)
+            end = _parse_value(end, names, low) if end else (high if step > 1 else start)
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f"Invalid cron field {field!r}, values must be in {low}-{high}")
+        for value in range(start, end + 1, step):
+            mask |= 1 << value
+    return mask
+
+
+def _next_bit(mask, start):
+    """
+    :return: the lowest set bit not below `start` or None
+    """
+    mask >>= start
+    if not mask:
+        return None
+    return start + (mask & -mask).bit_length() - 1
+
+
+def _prev_bit(mask, start):
+    """
+    :return: the highest set bit not above `start` or None
+    """
+    mask &= (2 << start) - 1
+    return mask.bit_length() - 1 if mask else None
+
+
+def _bits_up(mask, start):
+    bit = _next_bit(mask, start)
+    while bit is not None:
+        yield bit
+        bit = _next_bit(mask, bit + 1)
+
+
+def _bits_down(mask, start):
+    bit = _prev_bit(mask, start)
+    while bit is not None:
+        yield bit
+        bit = _prev_bit(mask, bit - 1) if bit else None
+
+
+class CronSchedule(Schedule):
+    """
+    Cron expression with 5 fields (minute hour day month weekday) or 6
+    fields with seconds first. Fields take `*`, values, ranges `a-b`, steps
+    `/n` and lists; months and weekdays also take names (JAN, MON).
+    As in cron, if both day and weekday are restricted either matches.
+
+    Fire times are computed in `timezone` (UTC by default). Local times
+    skipped by a DST change do not fire, repeated ones fire once.
+
+    :param blackouts: windows without fire times, pairs of `datetime.time`
+        for daily windows (may wrap midnight) or of naive `datetime` in
+        `timezone` for periods
+    """
+    def __init__(self, expression, timezone=None, blackouts=()):
+        self.expression = expression
+        self.timezone = _timezone(timezone)
+        self.blackouts = list(blackouts)
+        fields = ALIASES.get(expression.strip().lower(), expression).split()
+        if len(fields) == 5:
+            fields = ["0"] + fields
+        if len(fields) != 6:
+            raise ValueError(f"Cron expression {expression!r} must have 5 or 6 fields")
+        second, minute, hour, day, month, weekday = fields
+        self.seconds = _parse_field(second, 0, 59)
+        self.minutes = _parse_field(minute, 0, 59)
+        self.hours = _parse_field(hour, 0, 23)
+        self.days = _parse_field(day, 1, 31)
+        self.months = _parse_field(month, 1, 12, MONTHS)
+        weekdays = _parse_field(weekday, 0, 7, WEEKDAYS)
+        # 7 is Sunday too
+        self.weekdays = (weekdays | weekdays >> 7) & 0x7f
+        self.any_day = day == "*"
+        self.any_weekday = weekday == "*"
+
+    def next_after(self, t):
+        start = self._local(t).replace(microsecond=0) + ONE_SECOND
+        horizon = start + MAX_DAYS * ONE_DAY
+        while start < horizon:
+            candidate = self._next_match(start)
+            if candidate is None:
+                return None
+            window = self._blackout(candidate)
+            if window is not None:
+                start = max(window[1], candidate + ONE_SECOND)
+                continue
+            fire_time = self._timestamp(candidate)
+            if fire_time is not None and fire_time > t:
+                return fire_time
+            start = candidate + ONE_SECOND
+        return None
+
+    def previous(self, t):
+        start = self._local(t).replace(microsecond=0)
+        horizon = start - MAX_DAYS * ONE_DAY
+        while start > horizon:
+            candidate = self._prev_match(start)
+            if candidate is None:
+                return None
+            window = self._blackout(candidate)
+            if window is not None:
+                start = min(window[0], candidate) - ONE_SECOND
+                continue
+            fire_time = self._timestamp(candidate)
+            if fire_time is not None and fire_time <= t:
+                return fire_time
+            start = candidate - ONE_SECOND
+        return None
+
+    def _local(self, t):
+        return datetime.datetime.fromtimestamp(t, self.timezone).replace(tzinfo=None)
+
+    def _timestamp(self, local):
+        """
+        :return: timestamp of the local time or None if it does not exist
+        """
+        aware = local.replace(tzinfo=self.timezone)
+        if aware.astimezone(datetime.timezone.utc).astimezone(self.timezone).replace(tzinfo=None) != local:
+            return None
+        return aware.timestamp()
+
+    def _day_matches(self, date):
+        day = self.days >> date.day & 1
+        weekday = self.weekdays >> (date.isoweekday() % 7) & 1
+        if self.any_day or self.any_weekday:
+            return bool(day and weekday)
+        return bool(day or weekday)
+
+    def _next_match(self, start):
+        date, clock = start.date(), (start.hour, start.minute, start.second)
+        for _ in range(MAX_DAYS):
+            if not self.months >> date.month & 1:
+                month = _next_bit(self.months, date.month + 1)
+                year = date.year if month is not None else date.year + 1
+                date = datetime.date(year, month or _next_bit(self.months, 1), 1)
+                clock = (0, 0, 0)
+                continue
+            if self._day_matches(date):
+                found = self._time_on_or_after(*clock)
+                if found is not None:
+                    return datetime.datetime.combine(date, datetime.time(*found))
+            date, clock = date + ONE_DAY, (0, 0, 0)
+        return None
+
+    def _prev_match(self, start):
+        date, clock = start.date(), (start.hour, start.minute, start.second)
+        for _ in range(MAX_DAYS):
+            if not self.months >> date.month & 1:
+                month = _prev_bit(self.months, date.month - 1)
+                year = date.year if month is not None else date.year - 1
+                month = month or _prev_bit(self.months, 12)
+                # the last day of the month
+                date = datetime.date(year + month // 12, month % 12 + 1, 1) - ONE_DAY
+                clock = (23, 59, 59)
+                continue
+            if self._day_matches(date):
+                found = self._time_on_or_before(*clock)
+                if found is not None:
+                    return datetime.datetime.combine(date, datetime.time(*found))
+            date, clock = date - ONE_DAY, (23, 59, 59)
+        return None
+
+    def _time_on_or_after(self, hour, minute, second):
+        for h in _bits_up(self.hours, hour):
+            for m in _bits_up(self.minutes, minute if h == hour else 0):
+                s = _next_bit(self.seconds, second if (h, m) == (hour, minute) else 0)
+                if s is not None:
+                    return h, m, s
+        return None
+
+    def _time_on_or_before(self, hour, minute, second):
+        for h in _bits_down(self.hours, hour):
+            for m in _bits_down(self.minutes, minute if h == hour else 59):
+                s = _prev_bit(self.seconds, second if (h, m) == (hour, minute) else 59)
+                if s is not None:
+                    return h, m, s
+        return None
+
+    def _blackout(self, local):
+        """
+        :return: (start, end) of the blackout window containing the local time or None
+        """
+        for start, end in self.blackouts:
+            if isinstance(start, datetime.datetime):
+                window = (start, end)
+            else:
+                date = local.date()
+                if start > end and local.time() < end:
+                    date -= ONE_DAY
+                window = (datetime.datetime.combine(date, start),
+                          datetime.datetime.combine(date + ONE_DAY if start > end else date, end))
+            if window[0] <= local < window[1]:
+                return window
+        return None
+
+    def __repr__(self):
+        return f"<CronSchedule {self.expression!r} timezone={self.timezone}>"
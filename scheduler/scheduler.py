@@ -1,7 +1,13 @@
+import asyncio
+import heapq
+import itertools
 import logging
 import time
 
+from .clock import SYSTEM_CLOCK
 from .job import Job
+from .metrics import notify
+from .resource import LazyResource
 from .task import TaskFailedError
 from .utils import estimate_next_call, to_string
 
@@ -14,42 +20,260 @@ class HeartbeatDetails:
         self.call_time = call_time
 
 
-class Scheduler:
-    def __init__(self, on_job_failed=None, on_heartbeat=None):
+class AsyncScheduler:
+    """
+    Runs due jobs concurrently on one event loop. Coroutine tasks are
+    awaited on the loop, other tasks are run in `executor` (the loop
+    default executor if not set).
+
+    Scheduled jobs are kept in a heap keyed on their next fire time, so
+    a heartbeat costs O(log n) per fired job instead of a scan of all jobs.
+
+    :param pool: `ResourcePool` shared by tasks of registered jobs
+    :param history: `RunHistory` kept for registered jobs with a name
+    """
+    # Sleeps are split into chunks of at most this length to notice wall clock jumps
+    MAX_SLEEP = 60
+    CLOCK_JUMP_TOLERANCE = 1
+
+    def __init__(self, on_job_failed=None, on_heartbeat=None, executor=None, clock=None, pool=None, history=None):
         self.jobs = set()
         self.on_job_failed = on_job_failed
         self.on_heartbeat = on_heartbeat
+        self.executor = executor
         self.should_stop = False
+        self.running = set()
+        self.timers = []
+        self.resources = []
+        self.hooks = []
+        self.clock = clock or SYSTEM_CLOCK
+        self.pool = pool
+        self.history = history
+        self._counter = itertools.count()
 
     def register(self, job: Job):
         if job in self.jobs:
             raise KeyError(f"Such job {job} is already registered")
         self.jobs.add(job)
+        job.clock = self.clock
+        if job.pool is None:
+            job.pool = self.pool
+        if job.history is None and job.name is not None:
+            job.history = self.history
+        if job.scheduled:
+            self._schedule(job, job.next_fire_time(self.clock.time()))
+
+    def add_resource(self, resource: LazyResource):
+        """
+        Makes the scheduler expire the idle resource on heartbeats and close
+        it when the scheduler stops.
+        """
+        self.resources.append(resource)
+
+    def _schedule(self, job, fire_time):
+        if fire_time is None:
+            logger.warning(f"Job {job} has no more fire times")
+            return
+        heapq.heappush(self.timers, (job.start_time(fire_time), next(self._counter), fire_time, job))
 
-    def run(self, delay=1):
-        while not self.should_stop:
-            details = self._heartbeat(delay)
-            if self.on_heartbeat:
-                self.on_heartbeat(details)
+    def _reschedule_all(self, t):
+        timers, self.timers = self.timers, []
+        for _, _, _, job in timers:
+            self._schedule(job, job.next_fire_time(t))
 
-    def _heartbeat(self, delay):
-        t = time.time()
+    async def run(self, delay=None):
+        """
+        Runs jobs at their fire times until `should_stop` is set.
+
+        :param delay: if set, heartbeats are also fired every `delay` seconds
+            when there are no jobs to run
+        :return:
+        """
+        try:
+            while not self.should_stop:
+                details = await self._heartbeat(delay)
+                if self.on_heartbeat:
+                    self.on_heartbeat(details)
+        finally:
+            await self.join()
+            self.close_resources()
+
+    async def _heartbeat(self, delay):
+        t = self.clock.time()
         logger.debug(f"Now is {to_string(t)}")
-        call_time = estimate_next_call(t, delay)
+        call_time = self._next_call_time(t, delay)
         logger.debug(f"Call time {to_string(call_time)}")
-        time.sleep(call_time - t)
-        self.run_pending()
+        await self._sleep_until(call_time)
+        self._run_due(self.clock.time())
+        self._expire_resources()
         return HeartbeatDetails(t, call_time)
 
-    def run_pending(self):
+    def _expire_resources(self):
+        for resource in self.resources:
+            try:
+                resource.expire()
+            except Exception as exc:
+                logger.error(f"Resource {resource} closing failed:", exc_info=exc)
+
+    def close_resources(self):
+        for resource in self.resources:
+            try:
+                resource.close()
+            except Exception as exc:
+                logger.error(f"Resource {resource} closing failed:", exc_info=exc)
+
+    def _next_call_time(self, t, delay):
+        call_time = estimate_next_call(t, delay) if delay else t + self.MAX_SLEEP
+        if self.timers:
+            call_time = min(call_time, self.timers[0][0])
+        return call_time
+
+    async def _sleep_until(self, call_time):
+        """
+        Sleeps on the monotonic clock until the wall clock reaches `call_time`.
+        If the wall clock is set back, fire times are estimated again.
+        """
+        while True:
+            t = self.clock.time()
+            if t >= call_time:
+                return
+            started = self.clock.monotonic()
+            await self.clock.sleep(min(call_time - t, self.MAX_SLEEP))
+            now = self.clock.time()
+            if now - t < self.clock.monotonic() - started - self.CLOCK_JUMP_TOLERANCE:
+                logger.warning(f"Wall clock was set back to {to_string(now)}")
+                self._reschedule_all(now)
+                return
+
+    def _run_due(self, t):
+        while self.timers and self.timers[0][0] <= t:
+            _, _, fire_time, job = heapq.heappop(self.timers)
+            fire_times = list(job.fire_times(fire_time, t))
+            self._schedule(job, job.next_fire_time(fire_times[-1]))
+            self._fire(job, fire_times[-1], 1 if job.coalesce else len(fire_times))
+
+    def _fire(self, job, fire_time, runs=1):
+        if runs > 1:
+            logger.warning(f"Job {job} missed {runs - 1} runs, catching up")
+        job.last_fire_time = fire_time
+        if job.instances >= job.max_instances and job.skip_if_running:
+            logger.warning(f"Job {job} is still running, run at {to_string(fire_time)} skipped")
+            return
+        job.backlog = 1 if job.coalesce else job.backlog + runs
+        self._start(job)
+
+    def _start(self, job):
+        while job.backlog and job.instances < job.max_instances:
+            job.backlog -= 1
+            job.instances += 1
+            self._spawn(self._run_instance(job))
+
+    async def _run_instance(self, job):
+        try:
+            await self.run_job(job, job.last_fire_time)
+        finally:
+            job.instances -= 1
+            self._start(job)
+
+    def _spawn(self, coro):
+        future = asyncio.ensure_future(coro)
+        self.running.add(future)
+        future.add_done_callback(self.running.discard)
+
+    async def run_pending(self):
+        started = time.perf_counter()
+        fired = []
         for job in self.jobs:
             if job.should_run:
-                self.run_job(job)
+                fired.append(job)
+                self._fire(job, job.next_run)
+        await self.join()
+        notify(self.hooks, "pending_finished", fired, time.perf_counter() - started)
 
-    def run_job(self, job: Job):
+    async def join(self):
+        """
+        Waits for all job runs including the queued ones.
+        """
+        while self.running:
+            await asyncio.wait(self.running)
+
+    async def run_job(self, job: Job, fire_time=None):
         try:
-            job.run()
+            await job.run_async(self.executor, hooks=self.hooks, fire_time=fire_time)
         except TaskFailedError:
             logger.error(f"Job {job} stream interrupted")
-            if self.on_job_failed:
-                self.on_job_failed(job)
+        except Exception:
+            # spawned runs are not awaited by anyone, so the error is not raised further
+            logger.error(f"Job {job} failed", exc_info=True)
+        else:
+            return
+        if self.on_job_failed:
+            self.on_job_failed(job)
+
+
+class Scheduler:
+    """
+    Blocking interface of `AsyncScheduler`, every call runs it on a new
+    event loop.
+    """
+    def __init__(self, on_job_failed=None, on_heartbeat=None, executor=None, clock=None, pool=None, history=None):
+        self.scheduler = AsyncScheduler(on_job_failed, on_heartbeat, executor, clock, pool, history)
+
+    @property
+    def jobs(self):
+        return self.scheduler.jobs
+
+    @property
+    def on_job_failed(self):
+        return self.scheduler.on_job_failed
+
+    @on_job_failed.setter
+    def on_job_failed(self, on_job_failed):
+        self.scheduler.on_job_failed = on_job_failed
+
+    @property
+    def on_heartbeat(self):
+        return self.scheduler.on_heartbeat
+
+    @on_heartbeat.setter
+    def on_heartbeat(self, on_heartbeat):
+        self.scheduler.on_heartbeat = on_heartbeat
+
+    @property
+    def resources(self):
+        return self.scheduler.resources
+
+    @property
+    def hooks(self):
+        return self.scheduler.hooks
+
+    @property
+    def should_stop(self):
+        return self.scheduler.should_stop
+
+    @should_stop.setter
+    def should_stop(self, should_stop):
+        self.scheduler.should_stop = should_stop
+
+    def register(self, job: Job):
+        self.scheduler.register(job)
+
+    def add_resource(self, resource: LazyResource):
+        self.scheduler.add_resource(resource)
+
+    def run(self, delay=None):
+        self._run_until_complete(self.scheduler.run(delay))
+
+    def run_pending(self):
+        self._run_until_complete(self.scheduler.run_pending())
+
+    def run_job(self, job: Job):
+        self._run_until_complete(self.scheduler.run_job(job))
+
+    @staticmethod
+    def _run_until_complete(coro):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
@@ -0,0 +1,162 @@
+"""
+Replays schedules of jobs on virtual time, e.g. a week of runs of
+thousands of jobs in seconds, to plan worker counts and find jobs sharing
+fire times:
+
+    >>> simulation = Simulation(jobs, duration=lambda job: 120, workers=4)
+    >>> report = simulation.run(start, days=7)
+    >>> report.max_concurrency, report.collisions()
+
+Task functions are not called, a run of a job lasts `duration(job)`
+virtual seconds.
+"""
+import asyncio
+import logging
+
+from collections import defaultdict
+
+from .clock import VirtualClock, VirtualTimeLoop
+from .scheduler import AsyncScheduler
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 60 * 60
+
+
+class SimulatedRun:
+    def __init__(self, job, fire_time, start, end):
+        self.job = job
+        self.fire_time = fire_time
+        self.start = start
+        self.end = end
+
+    @property
+    def wait(self):
+        return self.start - self.fire_time
+
+    def __repr__(self):
+        return f"<SimulatedRun job={self.job.name!r} fire_time={self.fire_time} start={self.start} end={self.end}>"
+
+
+class SimulationReport:
+    """
+    :param runs: `SimulatedRun` list in the order of their starts
+    :param skipped: (job, fire time) pairs skipped since the job was running
+    """
+    def __init__(self, runs, skipped):
+        self.runs = runs
+        self.skipped = skipped
+
+    @property
+    def max_concurrency(self):
+        """
+        Max number of runs in progress at once, i.e. workers needed to
+        start every run at its fire time.
+        """
+        events = sorted([(run.start, 1) for run in self.runs] + [(run.end, -1) for run in self.runs],
+                        key=lambda event: (event[0], event[1]))
+        running = peak = 0
+        for _, change in events:
+            running += change
+            peak = max(peak, running)
+        return peak
+
+    @property
+    def max_wait(self):
+        return max((run.wait for run in self.runs), default=0)
+
+    def collisions(self, min_jobs=2):
+        """
+        :return: dict of lists of jobs by fire times shared by at least `min_jobs` jobs
+        """
+        slots = defaultdict(list)
+        for run in self.runs:
+            slots[run.fire_time].append(run.job)
+        return {fire_time: jobs for fire_time, jobs in sorted(slots.items()) if len(jobs) >= min_jobs}
+
+    def __repr__(self):
+        return f"<SimulationReport runs={len(self.runs)} skipped={len(self.skipped)}>"
+
+
+class SimulatedScheduler(AsyncScheduler):
+    """
+    `AsyncScheduler` recording runs instead of running tasks. At most
+    `workers` runs are in progress at once, others wait for a worker.
+    """
+    def __init__(self, clock, duration, workers=None):
+        super().__init__(clock=clock)
+        self.duration = duration
+        self.workers = asyncio.Semaphore(workers) if workers else None
+        self.runs = []
+        self.skipped = []
+
+    def _fire(self, job, fire_time, runs=1):
+        if job.instances >= job.max_instances and job.skip_if_running:
+            self.skipped.append((job, fire_time))
+        super()._fire(job, fire_time, runs)
+
+    async def run_job(self, job, fire_time=None):
+        if self.workers is None:
+            await self._simulate(job, fire_time)
+            return
+        async with self.workers:
+            await self._simulate(job, fire_time)
+
+    async def _simulate(self, job, fire_time):
+        start = self.clock.time()
+        job.last_run = start
+        await self.clock.sleep(self.duration(job))
+        self.runs.append(SimulatedRun(job, fire_time, start, self.clock.time()))
+
+
+class Simulation:
+    """
+    :param jobs: scheduled jobs, their clocks and run counters are replaced
+        for the run and restored after it
+    :param duration: function returning virtual seconds of a job run, 0 by default
+    :param workers: max number of runs at once, unlimited if not set
+    """
+    # attributes of jobs changed by the simulated scheduler
+    JOB_STATE = ("clock", "pool", "history", "instances", "backlog", "last_run", "last_fire_time")
+
+    def __init__(self, jobs, duration=None, workers=None):
+        self.jobs = list(jobs)
+        self.duration = duration or (lambda job: 0)
+        self.workers = workers
+
+    def run(self, start, seconds=None, days=None):
+        """
+        Replays fire times after `start` for `seconds` (or `days`) of virtual time.
+
+        :return: `SimulationReport` of runs fired in the period
+        """
+        end = start + (seconds if seconds is not None else days * DAY)
+        clock = VirtualClock(start)
+        loop = VirtualTimeLoop(clock)
+        saved = [{name: getattr(job, name) for name in self.JOB_STATE} for job in self.jobs]
+        try:
+            scheduler = loop.run_until_complete(self._run(clock, end))
+        finally:
+            loop.close()
+            for job, state in zip(self.jobs, saved):
+                for name, value in state.items():
+                    setattr(job, name, value)
+        runs = sorted((run for run in scheduler.runs if run.fire_time <= end), key=lambda run: run.start)
+        skipped = [(job, fire_time) for job, fire_time in scheduler.skipped if fire_time <= end]
+        logger.info(f"Simulated {len(runs)} runs of {len(self.jobs)} jobs")
+        return SimulationReport(runs, skipped)
+
+    async def _run(self, clock, end):
+        scheduler = SimulatedScheduler(clock, self.duration, self.workers)
+        for job in self.jobs:
+            job.instances = job.backlog = 0
+            job.last_run = job.last_fire_time = None
+            scheduler.register(job)
+
+        def on_heartbeat(details):
+            if clock.time() >= end:
+                scheduler.should_stop = True
+
+        scheduler.on_heartbeat = on_heartbeat
+        await scheduler.run()
+        return scheduler
@@ -0,0 +1,156 @@
+import os
+import pickle
+import socket
+import time
+
+from .storage import SQLiteStorage
+
+
+class RunState:
+    """
+    State of a job run: `statuses` and `results` keep task statuses and
+    results recorded by the run before it was interrupted (empty for a new run).
+    """
+    def __init__(self, run_id, statuses=None, results=None, resumed=False):
+        self.run_id = run_id
+        self.statuses = statuses or dict()
+        self.results = results or dict()
+        self.resumed = resumed
+
+
+class StateBackend:
+    """
+    Keeps task statuses of job runs, so a failed or interrupted run is
+    resumed from the first incomplete task.
+    """
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    def begin_run(self, job_name) -> RunState:
+        """
+        Resumes the last run of the job if it is failed or was interrupted,
+        otherwise starts a new one.
+        """
+        raise NotImplementedError()
+
+    def set_status(self, run_id, task_id, status, result=None):
+        """
+        :param result: result of the completed task
+        """
+        raise NotImplementedError()
+
+    def end_run(self, run_id, status):
+        raise NotImplementedError()
+
+
+class SQLiteStateBackend(SQLiteStorage, StateBackend):
+    """
+    A run marked as running is resumed only when the process running it
+    is known to be gone: a process of the same host that is not alive, or
+    a process of another host whose run has not recorded a task status
+    for `lease` seconds. Otherwise a new run is started.
+
+    :param lease: seconds, longer than any task of the job takes
+    :param keep_runs: number of finished runs kept for every job, older
+        runs and their task states are deleted
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job TEXT NOT NULL,
+            status TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            started REAL NOT NULL,
+            finished REAL
+        );
+        CREATE INDEX IF NOT EXISTS runs_job ON runs (job, id);
+        CREATE TABLE IF NOT EXISTS task_states (
+            run_id INTEGER NOT NULL,
+            task_id TEXT NOT NULL,
+            status TEXT NOT NULL,
+            result BLOB,
+            updated REAL NOT NULL,
+            PRIMARY KEY (run_id, task_id)
+        );
+    """
+
+    def __init__(self, path, timeout=30, lease=3600, keep_runs=100):
+        super().__init__(path, timeout)
+        self.host = socket.gethostname()
+        self.owner = f"{self.host}:{os.getpid()}"
+        self.lease = lease
+        self.keep_runs = keep_runs
+
+    def begin_run(self, job_name):
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT id, status, owner FROM runs WHERE job = ? ORDER BY id DESC LIMIT 1", (job_name,)).fetchone()
+            if row and self._resumable(connection, *row):
+                run_id = row[0]
+                connection.execute(
+                    "UPDATE runs SET status = ?, owner = ?, finished = NULL WHERE id = ?",
+                    (self.RUNNING, self.owner, run_id))
+                rows = connection.execute(
+                    "SELECT task_id, status, result FROM task_states WHERE run_id = ?", (run_id,)).fetchall()
+                statuses = {task_id: status for task_id, status, _ in rows}
+                results = {task_id: pickle.loads(result) for task_id, _, result in rows if result is not None}
+                return RunState(run_id, statuses, results, resumed=True)
+            cursor = connection.execute(
+                "INSERT INTO runs (job, status, owner, started) VALUES (?, ?, ?, ?)",
+                (job_name, self.RUNNING, self.owner, time.time()))
+            return RunState(cursor.lastrowid)
+
+    def _resumable(self, connection, run_id, status, owner):
+        if status == self.FAILED:
+            return True
+        if status != self.RUNNING or owner == self.owner:
+            return False
+        host, _, pid = owner.rpartition(":")
+        if host == self.host and pid.isdigit():
+            return not _alive(int(pid))
+        updated, = connection.execute(
+            "SELECT MAX(updated) FROM (SELECT started AS updated FROM runs WHERE id = ? "
+            "UNION ALL SELECT updated FROM task_states WHERE run_id = ?)", (run_id, run_id)).fetchone()
+        return time.time() - updated > self.lease
+
+    def set_status(self, run_id, task_id, status, result=None):
+        dumped = None
+        if status == self.COMPLETED:
+            try:
+                dumped = pickle.dumps(result)
+            except Exception:
+                # the task is run again on resume if its result is needed
+                pass
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO task_states (run_id, task_id, status, result, updated) VALUES (?, ?, ?, ?, ?)",
+                (run_id, task_id, status, dumped, time.time()))
+
+    def end_run(self, run_id, status):
+        with self._connection() as connection:
+            connection.execute(
+                "UPDATE runs SET status = ?, finished = ? WHERE id = ?", (status, time.time(), run_id))
+            self._prune(connection, run_id)
+
+    def _prune(self, connection, run_id):
+        job_name, = connection.execute("SELECT job FROM runs WHERE id = ?", (run_id,)).fetchone()
+        row = connection.execute(
+            "SELECT id FROM runs WHERE job = ? ORDER BY id DESC LIMIT 1 OFFSET ?",
+            (job_name, self.keep_runs)).fetchone()
+        if row is None:
+            return
+        old_runs = "SELECT id FROM runs WHERE job = ? AND id <= ? AND status != ?"
+        connection.execute(
+            f"DELETE FROM task_states WHERE run_id IN ({old_runs})", (job_name, row[0], self.RUNNING))
+        connection.execute(f"DELETE FROM runs WHERE id IN ({old_runs})", (job_name, row[0], self.RUNNING))
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -0,0 +1,39 @@
+import sqlite3
+import threading
+
+
+class SQLiteStorage:
+    """
+    Base of SQLite backed storages. Every thread uses its own connection,
+    so one storage object can be shared by threads of the scheduler.
+    """
+    SCHEMA = ""
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connect().executescript(self.SCHEMA)
+
+    def _connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def _connection(self):
+        return _Transaction(self._connect())
+
+
+class _Transaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
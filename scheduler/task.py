@@ -1,62 +1,243 @@
+import asyncio
+import hashlib
 import logging
+import multiprocessing
+import pickle
+import subprocess
+import sys
+import time
+import traceback
+
+from multiprocessing import spawn
+from multiprocessing.connection import Connection
+from types import MappingProxyType
+
+from .cache import code_version
+from .metrics import collect, current_async_task, max_rss, thread_time
 
 logger = logging.getLogger(__name__)
 
+# shared by tasks without resources or metrics, so every task does not keep empty dicts
+EMPTY = MappingProxyType(dict())
+
+
+def call(func, *args):
+    """
+    Calls the task function. Coroutine functions are run on a new event loop.
+    """
+    if asyncio.iscoroutinefunction(func):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(func(*args))
+        finally:
+            loop.close()
+    return func(*args)
+
+
+def execute(func, *args, timeout=None):
+    """
+    Calls the task function collecting metrics it reports. With `timeout`
+    the function is called in a child process killed when the time is
+    out, so a hung call does not hold the worker; the function, its
+    arguments and result have to be picklable then.
+
+    :return: (result, metrics)
+    """
+    if timeout is not None:
+        return _execute_isolated(timeout, func, *args)
+    started, wall_started, cpu_started = time.time(), time.perf_counter(), thread_time()
+    with collect() as metrics:
+        result = call(func, *args)
+    metrics.update(started=started, wall_time=time.perf_counter() - wall_started,
+                   cpu_time=thread_time() - cpu_started, process_max_rss=max_rss())
+    return result, metrics
+
+
+def _isolated_main():
+    fd, call = pickle.load(sys.stdin.buffer)
+    func, args = pickle.loads(call)
+    _execute_child(Connection(fd, readable=False), func, *args)
+
+
+def _execute_child(connection, func, *args):
+    try:
+        result = (True, execute(func, *args))
+    except BaseException as exc:
+        result = (False, exc)
+    try:
+        connection.send(result)
+    except Exception:
+        if result[0]:
+            raise
+        exc = result[1]
+        connection.send((False, RuntimeError("".join(traceback.format_exception_only(type(exc), exc)))))
+    finally:
+        connection.close()
+
+
+# the child reads how to prepare itself as the "spawn" start method does, then the call
+_CHILD = ("import pickle, sys; from multiprocessing import spawn; spawn.prepare(pickle.load(sys.stdin.buffer)); "
+          "from scheduler.task import _isolated_main; _isolated_main()")
+
+
+def _execute_isolated(timeout, func, *args):
+    """
+    Runs the call in a new interpreter prepared like a "spawn" child. It is
+    not forked, so locks held by other threads of the worker are not copied,
+    and it is not a multiprocessing child, so daemonic pool workers may
+    start it too.
+    """
+    call = pickle.dumps((func, args))
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    preparation = spawn.get_preparation_data("isolated")
+    preparation["authkey"] = bytes(preparation["authkey"])
+    payload = pickle.dumps(preparation) + pickle.dumps((sender.fileno(), call))
+    process = subprocess.Popen([sys.executable, "-c", _CHILD], stdin=subprocess.PIPE, pass_fds=(sender.fileno(),))
+    sender.close()
+    try:
+        try:
+            with process.stdin:
+                process.stdin.write(payload)
+        except BrokenPipeError:
+            pass
+        if not receiver.poll(timeout):
+            raise TaskTimeoutError(f"{func!r} timed out after {timeout} seconds")
+        try:
+            ok, value = receiver.recv()
+        except EOFError:
+            process.wait()
+            raise TaskFailedError(f"{func!r} process exited with code {process.returncode}") from None
+    finally:
+        if process.poll() is None:
+            process.terminate()
+        process.wait()
+        receiver.close()
+    if not ok:
+        raise value
+    return value
+
+
+async def execute_async(func, *args, timeout=None):
+    """
+    Awaits the coroutine function collecting metrics it reports. Metrics
+    are kept per asyncio task, so concurrent coroutines do not mix them.
+    With `timeout` the coroutine is cancelled when the time is out.
+
+    :return: (result, metrics)
+    """
+    if timeout is not None:
+        try:
+            return await asyncio.wait_for(execute_async(func, *args), timeout)
+        except asyncio.TimeoutError:
+            raise TaskTimeoutError(f"{func!r} timed out after {timeout} seconds") from None
+    started, wall_started = time.time(), time.perf_counter()
+    with collect(current_async_task()) as metrics:
+        result = await func(*args)
+    # CPU time of the loop thread is shared by all coroutines, it is not measured
+    metrics.update(started=started, wall_time=time.perf_counter() - wall_started, process_max_rss=max_rss())
+    return result, metrics
+
 
 class TaskFailedError(Exception):
     ...
 
 
+class TaskTimeoutError(TimeoutError):
+    ...
+
+
+class JobDeadlineError(TaskFailedError):
+    """
+    Raised when a job run is not completed within the job deadline.
+    """
+
+
+class SkipDownstream(Exception):
+    """
+    Raised by a task to complete it and skip all of its downstream tasks,
+    e.g. when there is no new data to process.
+    """
+
+
 class Task:
+    """
+    Definition of a task. Status and metrics of a task belong to a run of
+    its job (see `TaskRun`), so concurrent runs share tasks. Tasks keep
+    no `__dict__`, so jobs with many tasks stay small.
+    """
+    __slots__ = ("task", "id", "job", "on_failed", "idempotent", "inputs", "cache", "version", "retry",
+                 "timeout", "resources", "priority")
+
     COMPLETED = "completed"
     FAILED = "failed"
     PENDING = "pending"
     RUNNING = "running"
+    CANCELLED = "cancelled"
+    SKIPPED = "skipped"
 
-    def __init__(self, task, task_id, job, on_failed=None):
+    def __init__(self, task, task_id, job, on_failed=None, idempotent=False, inputs=(), cache=None, version=None,
+                 retry=None, timeout=None, resources=None, priority=0):
+        """
+        :param task: function or coroutine function taking results of `inputs`
+        :param task_id: task id unique within the job
+        :param job: job of the task
+        :param on_failed: callback called with the `TaskRun` of the failed task
+        :param idempotent: outputs of the completed task stay valid, so it is
+            not run again when the job resumes a failed or interrupted run
+        :param inputs: tasks (or their ids) whose results are passed to the
+            task as positional arguments, they are set before the task
+        :param cache: `ResultCache`, the task is not run if it has a result
+            for the same inputs and version
+        :param version: version of the task code used in cache keys,
+            hash of the function code by default
+        :param retry: `RetryPolicy` of the failed task, one attempt if not set
+        :param timeout: seconds the task may run; a function is called in a
+            child process killed when the time is out, a coroutine is cancelled
+        :param resources: dict of amounts of `ResourcePool` resources the task
+            needs, e.g. {"spark": 1, "memory": 4}
+        :param priority: ready tasks with higher priority are started first
+        """
         self.task = task
         self.id = task_id
         self.job = job
         self.job.add_task(self)
-        self.status = Task.PENDING
         self.on_failed = on_failed
+        self.idempotent = idempotent
+        self.inputs = tuple(t.id if isinstance(t, Task) else t for t in inputs)
+        self.cache = cache
+        self.version = version
+        self.retry = retry
+        self.timeout = timeout
+        self.resources = resources or EMPTY
+        self.priority = priority
+        for task_id in self.inputs:
+            self.job.tasks[task_id].set_upstream(self)
 
     @property
-    def completed(self):
-        return self.status == Task.COMPLETED
-
-    @property
-    def pending(self):
-        return self.status == Task.PENDING
-
-    # @property
-    # def running(self):
-    #     return self.status == Task.RUNNING
+    def is_coroutine(self):
+        return asyncio.iscoroutinefunction(self.task)
 
-    def set_running(self):
-        self.status = Task.RUNNING
+    def run(self, *args):
+        """
+        Runs the task alone in the calling thread, see `TaskRun.run`.
 
-    def complete(self):
-        self.status = Task.COMPLETED
+        :return: result of the task
+        """
+        return TaskRun(self).run(*args)
 
-    def fail_task(self):
-        self.status = Task.FAILED
+    def should_retry(self, attempt, exc):
+        return self.retry is not None and self.retry.should_retry(attempt, exc)
 
-    def run(self):
-        self.set_running()
-        try:
-            self.task()
-        except Exception as exc:
-            logger.error(f"Task {self} failed:", exc_info=exc)
-            self.fail_task()
-            if self.on_failed:
-                self.on_failed(self)
-            raise TaskFailedError(exc)
-        else:
-            self.complete()
+    def retry_delay(self, attempt, exc):
+        delay = self.retry.delay(attempt)
+        logger.warning(f"Task {self} attempt {attempt} failed: {exc!r}, retry in {delay:.1f} seconds")
+        return delay
 
-    def reset(self):
-        self.status = Task.PENDING
+    def arguments(self, results):
+        """
+        :return: positional arguments of the task function taken from `results` by task id
+        """
+        return [results[task_id] for task_id in self.inputs]
 
     def set_upstream(self, task):
         """
@@ -75,4 +256,175 @@ class Task:
         return self.job.upstream(self)
 
     def __repr__(self):
-        return f"<Task id={self.id!r} status={self.status}>"
+        return f"<Task id={self.id!r}>"
+
+
+class TaskRun:
+    """
+    Status and metrics of a task in one run of its job.
+    """
+    __slots__ = ("task", "status", "metrics")
+
+    def __init__(self, task):
+        self.task = task
+        self.status = Task.PENDING
+        self.metrics = EMPTY
+
+    @property
+    def id(self):
+        return self.task.id
+
+    @property
+    def completed(self):
+        return self.status == Task.COMPLETED
+
+    @property
+    def pending(self):
+        return self.status == Task.PENDING
+
+    def set_running(self):
+        self.status = Task.RUNNING
+        self.metrics = dict()
+
+    def complete(self):
+        self.status = Task.COMPLETED
+
+    def cancel(self):
+        self.status = Task.CANCELLED
+
+    def skip(self):
+        self.status = Task.SKIPPED
+
+    def reset(self):
+        self.status = Task.PENDING
+
+    def fail(self, exc):
+        logger.error(f"Task {self.task} failed:", exc_info=exc)
+        self.status = Task.FAILED
+        if self.task.on_failed:
+            self.task.on_failed(self)
+        return TaskFailedError(exc)
+
+    def run(self, *args):
+        """
+        Calls the task function with `args`, retrying it by the task policy.
+
+        :return: result of the task
+        """
+        task = self.task
+        attempt = 0
+        while True:
+            attempt += 1
+            self.set_running()
+            try:
+                result, self.metrics = execute(task.task, *args, timeout=task.timeout)
+            except SkipDownstream:
+                self.complete()
+                raise
+            except Exception as exc:
+                if not task.should_retry(attempt, exc):
+                    raise self.fail(exc)
+                time.sleep(task.retry_delay(attempt, exc))
+            else:
+                self.metrics["attempts"] = attempt
+                self.complete()
+                return result
+
+    def __repr__(self):
+        return f"<TaskRun id={self.id!r} status={self.status}>"
+
+
+class FanOut(Task):
+    """
+    Task expanded at run time into one sub-task per work item. The first
+    of `inputs` returns the items, `task` is called with an item followed
+    by results of the other inputs. Sub-tasks belong to the run only, the
+    job and its DAG are not changed, and run concurrently; `reduce` is
+    then called with the list of their results in the order of items and
+    its result is the result of the fan-out:
+
+        >>> shards = Task(list_shards, "shards", job)
+        >>> counts = FanOut(count_rows, "counts", job, inputs=[shards], reduce=sum,
+        ...                 retry=RetryPolicy(), resources={"spark": 1})
+
+    `retry`, `timeout` and `resources` are options of sub-tasks, the call
+    of `reduce` takes its own from `reduce_options`.
+    """
+    __slots__ = ("map", "key", "map_options")
+
+    def __init__(self, task, task_id, job, inputs, reduce=list, key=None, retry=None, timeout=None,
+                 resources=None, reduce_options=None, **kwargs):
+        """
+        :param task: function or coroutine function called for every item
+        :param inputs: tasks (or their ids), the first returns the items
+        :param reduce: function or coroutine function taking the list of results
+        :param key: function returning a string key of an item, a hash of
+            the item `repr` by default; sub-tasks are named by keys of their
+            items, so a resumed run matches results by items, not positions
+        :param retry: `RetryPolicy` of every sub-task
+        :param timeout: seconds every sub-task may run
+        :param resources: resources every sub-task needs
+        :param reduce_options: dict of `retry`, `timeout` and `resources` of
+            the call of `reduce`, none by default
+        """
+        if not inputs:
+            raise ValueError(f"Fan-out {task_id!r} needs a task returning its items")
+        super().__init__(reduce, task_id, job, inputs=inputs, **kwargs, **(reduce_options or {}))
+        self.map = task
+        self.key = key or item_digest
+        self.map_options = dict(retry=retry, timeout=timeout, resources=resources or EMPTY)
+        if self.version is None:
+            # cached results are invalidated by changes of both functions
+            self.version = f"{code_version(task)}:{code_version(reduce)}"
+
+    def sub_task_ids(self, items):
+        """
+        :return: list of ids of sub-tasks of the items, repeated items are numbered
+        """
+        ids = []
+        seen = dict()
+        for item in items:
+            key = self.key(item)
+            seen[key] = seen.get(key, 0) + 1
+            ids.append(f"{self.id}[{key}]" if seen[key] == 1 else f"{self.id}[{key}#{seen[key]}]")
+        return ids
+
+    def expand(self, args):
+        """
+        :param args: results of inputs, the items first
+        :return: list of sub-tasks of the items, they are not added to the job
+        """
+        items, args = list(args[0]), args[1:]
+        return [FanOutItem(self, sub_task_id, [item] + list(args))
+                for sub_task_id, item in zip(self.sub_task_ids(items), items)]
+
+
+def item_digest(item):
+    return hashlib.sha1(repr(item).encode()).hexdigest()[:16]
+
+
+class FanOutItem(Task):
+    """
+    Sub-task of a `FanOut` called with its item and bound arguments. It
+    takes sub-task options of the fan-out and is not added to the job.
+    """
+    __slots__ = ("args", "fan_out")
+
+    def __init__(self, fan_out, task_id, args):
+        self.task = fan_out.map
+        self.id = task_id
+        self.job = fan_out.job
+        self.on_failed = fan_out.on_failed
+        self.idempotent = fan_out.idempotent
+        self.inputs = ()
+        self.cache = None
+        self.version = None
+        self.retry = fan_out.map_options["retry"]
+        self.timeout = fan_out.map_options["timeout"]
+        self.resources = fan_out.map_options["resources"]
+        self.priority = fan_out.priority
+        self.args = args
+        self.fan_out = fan_out
+
+    def arguments(self, results):
+        return self.args
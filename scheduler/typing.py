@@ -1,10 +1,12 @@
 class Unit:
     MINUTE = "minute"
     HOUR = "hour"
+    DAY = "day"
 
     SECONDS = {
         MINUTE: 60,
         HOUR: 3600,
+        DAY: 86400,
     }
 
     @classmethod
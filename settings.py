@@ -4,4 +4,32 @@ import dotenv
 dotenv.load_dotenv()
 
 RECIPES_URL = os.getenv("RECIPES_URL")
-WORKDIR = os.getenv("WORKDIR", "/tmp")
\ No newline at end of file
+WORKDIR = os.getenv("WORKDIR", "/tmp")
+STATE_DB = os.getenv("STATE_DB", os.path.join(WORKDIR, "state.db"))
+# durations of the last runs, used to order tasks and to warn about slow runs
+HISTORY_DB = os.getenv("HISTORY_DB", os.path.join(WORKDIR, "history.db"))
+# "fused" reads recipes JSON once and writes only meat recipes,
+# "staged" saves all recipes as ORC first and reads them back,
+# "sharded" takes RECIPES_URL as an index of shard URLs, one per line
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "fused")
+# save all recipes as ORC next to meat recipes in fused mode
+RAW_SNAPSHOT = os.getenv("RAW_SNAPSHOT", "false").lower() == "true"
+# "overwrite" rewrites meat recipes on every run,
+# "incremental" appends only new recipes as partitions
+OUTPUT_MODE = os.getenv("OUTPUT_MODE", "overwrite")
+SPARK_MASTER = os.getenv("SPARK_MASTER", "local[*]")
+SPARK_SHUFFLE_PARTITIONS = int(os.getenv("SPARK_SHUFFLE_PARTITIONS", "8"))
+SPARK_DRIVER_MEMORY = os.getenv("SPARK_DRIVER_MEMORY", "2g")
+SPARK_ARROW = os.getenv("SPARK_ARROW", "true").lower() == "true"
+# the session is stopped after this number of idle seconds
+SPARK_IDLE_TIMEOUT = float(os.getenv("SPARK_IDLE_TIMEOUT", "600"))
+# Prometheus metrics are served on http://localhost:METRICS_PORT/metrics if set
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# downloads are retried on failures and fail after this number of seconds without data
+DOWNLOAD_ATTEMPTS = int(os.getenv("DOWNLOAD_ATTEMPTS", "3"))
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", "60"))
+# max numbers of Spark tasks and of downloads running at once
+SPARK_SLOTS = int(os.getenv("SPARK_SLOTS", "2"))
+NETWORK_SLOTS = int(os.getenv("NETWORK_SLOTS", "8"))
+# a run of the pipeline is cancelled after this number of seconds if set
+JOB_DEADLINE = float(os.getenv("JOB_DEADLINE", "0")) or None
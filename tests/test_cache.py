@@ -0,0 +1,88 @@
+import pytest
+
+from scheduler import Job, Task
+from scheduler.cache import ResultCache, FileArtifact
+from scheduler.clock import VirtualClock
+
+
+@pytest.fixture
+def cache():
+    yield ResultCache(max_entries=2)
+
+
+def test_skip_task_with_same_inputs(cache, tmp_path):
+    path = tmp_path / "recipes.json"
+    calls = []
+
+    def download():
+        return FileArtifact(path)
+
+    def convert(recipes):
+        calls.append(recipes)
+        return len(path.read_bytes())
+
+    job = Job("recipes")
+    Task(download, "download", job)
+    Task(convert, "convert", job, inputs=["download"], cache=cache)
+
+    path.write_bytes(b"[]")
+    assert job.run()["convert"] == 2
+    assert job.run()["convert"] == 2
+    assert calls == [FileArtifact(path)]
+
+    path.write_bytes(b"[{}]")
+    assert job.run()["convert"] == 4
+    assert len(calls) == 2
+
+
+def test_artifact_is_hashed_when_made(tmp_path, monkeypatch):
+    path = tmp_path / "recipes.json"
+    path.write_bytes(b"[]")
+    artifact = FileArtifact(path)
+    fingerprint = artifact.fingerprint()
+
+    hashed = []
+    monkeypatch.setattr(FileArtifact, "_hash", lambda self: hashed.append(self) or "changed")
+    assert artifact.fingerprint() == fingerprint
+    assert hashed == []
+
+    path.write_bytes(b"[{}]")
+    assert artifact.fingerprint() == "changed"
+    assert FileArtifact(tmp_path / "missing.json").path.endswith("missing.json")
+
+
+def test_version(cache):
+    job = Job("job")
+    task = Task(lambda: 1, "task", job, cache=cache, version="1")
+    key = cache.key(task, [])
+    task.version = "2"
+    assert cache.key(task, []) != key
+
+
+def test_eviction(cache):
+    cache.put("foo", 1)
+    cache.put("bar", 2)
+    assert cache.get("foo") == (True, 1)
+    cache.put("baz", 3)
+    assert cache.get("bar") == (False, None)
+    assert cache.get("foo") == (True, 1)
+
+
+def test_ttl(mocker):
+    cache = ResultCache(ttl=10)
+    mocker.patch("time.time", return_value=100)
+    cache.put("foo", 1)
+    mocker.patch("time.time", return_value=110)
+    assert cache.get("foo") == (True, 1)
+    mocker.patch("time.time", return_value=111)
+    assert cache.get("foo") == (False, None)
+
+
+def test_ttl_on_virtual_clock():
+    clock = VirtualClock()
+    cache = ResultCache(ttl=10, clock=clock)
+    cache.put("foo", 1)
+    clock.advance(10)
+    assert cache.get("foo") == (True, 1)
+    clock.advance(1)
+    assert cache.get("foo") == (False, None)
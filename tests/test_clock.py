@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from scheduler import AsyncScheduler, Job, Task
+from scheduler.clock import VirtualClock, VirtualTimeLoop
+
+START = 1577836800.0  # 2020-01-01 00:00:00 UTC
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_virtual_clock_sleep(loop):
+    clock = VirtualClock(START)
+
+    loop.run_until_complete(clock.sleep(30))
+
+    assert clock.time() == START + 30
+    assert clock.monotonic() == 30
+
+
+def test_job_uses_scheduler_clock(loop):
+    clock = VirtualClock(START + 5)
+    runs = []
+    job = Job("job")
+    job.every().minute.at(second=10)
+    Task(lambda: runs.append(clock.time()), "task", job)
+    scheduler = AsyncScheduler(clock=clock)
+    scheduler.register(job)
+
+    def run_pending():
+        loop.run_until_complete(scheduler.run_pending())
+
+    assert job.clock is clock
+    assert scheduler.timers[0][0] == START + 10
+    run_pending()
+    assert runs == []
+
+    clock.advance(5)
+    run_pending()
+    run_pending()
+    assert runs == [START + 10]
+    assert job.last_run == START + 10
+
+
+def test_virtual_time_loop_orders_sleeps():
+    clock = VirtualClock(START)
+    woken = []
+
+    async def sleeper(seconds):
+        await clock.sleep(seconds)
+        woken.append((seconds, clock.time()))
+
+    async def main():
+        await asyncio.gather(sleeper(30), sleeper(10), sleeper(20))
+
+    loop = VirtualTimeLoop(clock)
+    try:
+        loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+    assert woken == [(10, START + 10), (20, START + 20), (30, START + 30)]
+
+
+def test_scheduler_runs_on_virtual_time():
+    clock = VirtualClock(START)
+    runs = []
+    job = Job("job")
+    job.every().hour.at(minute=30)
+    Task(lambda: runs.append(clock.time()), "task", job)
+    scheduler = AsyncScheduler(clock=clock)
+    scheduler.register(job)
+
+    def on_heartbeat(details):
+        if clock.time() >= START + 3 * 3600:
+            scheduler.should_stop = True
+
+    scheduler.on_heartbeat = on_heartbeat
+    loop = VirtualTimeLoop(clock)
+    try:
+        loop.run_until_complete(scheduler.run())
+    finally:
+        loop.close()
+
+    assert runs == [START + 1800, START + 5400, START + 9000]
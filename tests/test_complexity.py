@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("isodate")
+pytest.importorskip("pyspark")
+
+from pyspark.sql import SparkSession  # noqa: E402
+from pyspark.sql.functions import col  # noqa: E402
+
+from jobs.complexity import complexity, complexity_column  # noqa: E402
+
+
+DURATIONS = [
+    "PT10M", "PT20M", "PT50M", "PT10M1S", "PT1H", "PT1.5H", "PT1,5H", "PT0.5S", "PT29M59.5S",
+    "P1D", "P1W", "-PT50M", "+PT5M", "P0YT1M", "PT", "PT0M", "P0Y", "", "P", "PXYZ", "pt1h", " PT1H",
+]
+
+
+@pytest.fixture(scope="module")
+def spark():
+    spark = SparkSession.builder.master("local[1]").appName(__name__).getOrCreate()
+    yield spark
+    spark.stop()
+
+
+def test_complexity_column_matches_udf(spark):
+    data = [(prep_time, cook_time) for prep_time in DURATIONS for cook_time in DURATIONS]
+    df = spark.createDataFrame(data, ["prepTime", "cookTime"])
+
+    rows = df.select(
+        complexity("prepTime", "cookTime").alias("expected"),
+        complexity_column(col("prepTime"), col("cookTime")).alias("actual"),
+    ).collect()
+
+    assert [row.actual for row in rows] == [row.expected for row in rows]
+
+
+def test_complexity_column_nulls(spark):
+    df = spark.createDataFrame([(None, "PT10M"), ("P1Y", "PT10M")], "prepTime string, cookTime string")
+    rows = df.select(complexity_column(col("prepTime"), col("cookTime")).alias("complexity")).collect()
+    assert [row.complexity for row in rows] == [None, None]
@@ -1,6 +1,6 @@
 import pytest
 
-from scheduler.dag import DAG
+from scheduler.dag import DAG, CyclicDependenceError
 
 
 @pytest.fixture
@@ -18,3 +18,113 @@ def test_add_edge_not_existent(dag):
     with pytest.raises(KeyError) as exc_info:
         dag.add_edge("foo", "bar")
         assert exc_info.value == f"{'bar'!r} not exists"
+
+
+def test_travers_yields_each_node_once(dag):
+    for node in ("r00", "r01", "r10", "r11", "r12", "r13", "r20"):
+        dag.add_node(node)
+    for ind_node, dep_node in (("r20", "r10"), ("r20", "r11"), ("r20", "r12"), ("r20", "r13"),
+                               ("r10", "r00"), ("r11", "r00"), ("r12", "r00"), ("r12", "r01"),
+                               ("r13", "r01")):
+        dag.add_edge(ind_node, dep_node)
+
+    order = list(dag.travers())
+    assert sorted(order) == sorted(dag.graph)
+    for node in order:
+        assert all(order.index(dep_node) < order.index(node) for dep_node in dag.graph[node])
+
+
+def test_ready_sets(dag):
+    for node in ("r00", "r01", "r10", "r11", "r12", "r13", "r20"):
+        dag.add_node(node)
+    for ind_node, dep_node in (("r20", "r10"), ("r20", "r11"), ("r20", "r12"), ("r20", "r13"),
+                               ("r10", "r00"), ("r11", "r00"), ("r12", "r00"), ("r12", "r01"),
+                               ("r13", "r01")):
+        dag.add_edge(ind_node, dep_node)
+
+    assert list(dag.ready_sets()) == [{"r00", "r01"}, {"r10", "r11", "r12", "r13"}, {"r20"}]
+
+
+def test_travers_long_chain(dag):
+    size = 10000
+    for node in range(size):
+        dag.add_node(node)
+    for node in range(1, size):
+        dag.add_edge(node, node - 1)
+
+    assert list(dag.travers()) == list(range(size))
+
+
+def test_add_edge_keeps_topological_order(dag):
+    for node in ("foo", "bar", "baz"):
+        dag.add_node(node)
+    dag.add_edge("foo", "bar")
+    dag.add_edge("bar", "baz")
+
+    assert dag.order["baz"] < dag.order["bar"] < dag.order["foo"]
+    assert dag.is_upstream("foo", "baz") is True
+    assert dag.is_upstream("baz", "foo") is False
+
+    with pytest.raises(CyclicDependenceError):
+        dag.add_edge("baz", "foo")
+    with pytest.raises(CyclicDependenceError):
+        dag.add_edge("foo", "foo")
+
+
+def test_add_edges(dag):
+    for node in ("foo", "bar", "baz"):
+        dag.add_node(node)
+    dag.add_edges([("foo", "bar"), ("bar", "baz")])
+
+    assert dag.upstream("foo") == {"bar", "baz"}
+    assert list(dag.travers()) == ["baz", "bar", "foo"]
+
+
+def test_add_edges_cyclic_batch(dag):
+    for node in ("foo", "bar", "baz"):
+        dag.add_node(node)
+    dag.add_edge("foo", "bar")
+
+    with pytest.raises(CyclicDependenceError):
+        dag.add_edges([("bar", "baz"), ("baz", "foo")])
+
+    assert dag.graph == {"foo": {"bar"}, "bar": set(), "baz": set()}
+    assert dag.upstream("foo") == {"bar"}
+
+    with pytest.raises(KeyError):
+        dag.add_edges([("bar", "baz"), ("baz", "foobar")])
+    assert dag.graph["bar"] == set()
+
+
+def test_travers_after_changes(dag):
+    for node in ("a", "b", "c"):
+        dag.add_node(node)
+    dag.add_edge("b", "a")
+    assert list(dag.ready_sets()) == [{"a", "c"}, {"b"}]
+
+    dag.add_edge("c", "b")
+    assert list(dag.ready_sets()) == [{"a"}, {"b"}, {"c"}]
+
+    dag.add_node("d")
+    assert list(dag.ready_sets()) == [{"a", "d"}, {"b"}, {"c"}]
+
+
+def test_high_degree(dag):
+    dag.add_node("root")
+    for i in range(20):
+        dag.add_node(i)
+        dag.add_edge(i, "root")
+
+    assert dag.reverse["root"] == set(range(20))
+    assert len(dag.direct_downstream("root")) == 20
+    assert dag.direct_upstream(0) == ("root",)
+    assert dag.get_independent() == set(range(20))
+    assert dag.get_dependent() == {"root"}
+
+
+def test_views_are_read_only(dag):
+    dag.add_node("a")
+
+    assert dict(dag.order) == {"a": 0}
+    with pytest.raises(TypeError):
+        dag.graph["a"] = {"b"}
@@ -0,0 +1,144 @@
+import pickle
+import threading
+
+import pytest
+
+from scheduler import Job, Task
+from scheduler.distributed import BrokerExecutor, BrokerServer, SocketBroker, SQLiteBroker, Worker
+from scheduler.task import TaskFailedError
+
+
+seq = []
+
+
+def foo():
+    seq.append("foo")
+
+
+def bar():
+    seq.append("bar")
+
+
+def error_task():
+    raise Exception("TestException")
+
+
+@pytest.fixture
+def broker(tmp_path):
+    yield SQLiteBroker(str(tmp_path / "queue.db"))
+
+
+@pytest.fixture
+def workers(broker):
+    workers = [Worker(broker, poll_interval=0.01) for _ in range(2)]
+    threads = [threading.Thread(target=worker.run) for worker in workers]
+    for thread in threads:
+        thread.start()
+    yield workers
+    for worker in workers:
+        worker.stop()
+    for thread in threads:
+        thread.join()
+
+
+@pytest.fixture
+def cleanup_seq():
+    yield
+    seq.clear()
+
+
+@pytest.mark.usefixtures("workers", "cleanup_seq")
+def test_run_job(broker):
+    job = Job()
+    foo_task = Task(foo, "foo_task", job)
+    bar_task = Task(bar, "bar_task", job)
+    foo_task.set_upstream(bar_task)
+
+    with BrokerExecutor(broker, poll_interval=0.01) as executor:
+        job.run(executor=executor)
+
+    assert seq == ["foo", "bar"]
+
+
+@pytest.mark.usefixtures("workers")
+def test_failed_task(broker):
+    job = Job()
+    Task(error_task, "error_task", job)
+
+    with BrokerExecutor(broker, poll_interval=0.01) as executor:
+        with pytest.raises(TaskFailedError):
+            job.run(executor=executor)
+
+
+def test_requeue_lost(broker):
+    message_id = broker.put(pickle.dumps((foo, (), {})))
+    broker.heartbeat("dead")
+    assert broker.claim("dead") == (message_id, pickle.dumps((foo, (), {})))
+    assert broker.claim("alive") is None
+
+    assert broker.requeue_lost(timeout=60) == 0
+    assert broker.requeue_lost(timeout=-1) == 1
+    assert broker.claim("alive")[0] == message_id
+
+
+def test_cancel(broker):
+    message_id = broker.put(b"payload")
+    broker.cancel(message_id)
+    assert broker.claim("worker") is None
+
+
+@pytest.fixture
+def server(broker):
+    server = BrokerServer(broker, authkey=b"secret").start()
+    yield server
+    server.close()
+
+
+@pytest.mark.usefixtures("cleanup_seq")
+def test_run_job_on_socket_broker(broker, server):
+    worker = Worker(SocketBroker(server.address, b"secret"), poll_interval=0.01)
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+    job = Job()
+    Task(foo, "foo_task", job)
+    Task(error_task, "error_task", job)
+
+    try:
+        with BrokerExecutor(broker, poll_interval=0.01) as executor:
+            with pytest.raises(TaskFailedError):
+                job.run(executor=executor)
+    finally:
+        worker.stop()
+        thread.join()
+
+    assert seq == ["foo"]
+
+
+def test_socket_broker_needs_authkey(broker, server):
+    with pytest.raises(Exception):
+        SocketBroker(server.address, b"wrong").heartbeat("worker")
+    with pytest.raises(ValueError):
+        BrokerServer(broker)
+
+
+def test_cancel_claimed(broker):
+    message_id = broker.put(b"payload")
+    broker.heartbeat("worker")
+    broker.claim("worker")
+
+    broker.cancel(message_id)
+    broker.complete(message_id, b"result")
+
+    assert broker.fetch_results([message_id]) == {}
+    assert broker._connect().execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 0
+
+
+def test_cancel_claimed_by_lost_worker(broker):
+    message_id = broker.put(b"payload")
+    broker.heartbeat("dead")
+    broker.claim("dead")
+
+    broker.cancel(message_id)
+
+    assert broker.requeue_lost(timeout=-1) == 0
+    assert broker._connect().execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 0
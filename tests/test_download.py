@@ -0,0 +1,83 @@
+import threading
+
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from jobs.download import Downloader  # noqa: E402
+
+
+BODY = b'[{"name": "Chicken soup"}, {"name": "Goat cheese salad"}]'
+ETAG = '"v1"'
+
+
+class RecipesHandler(BaseHTTPRequestHandler):
+    # number of bytes sent before the connection is dropped, None to send everything
+    interrupt_at = None
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.end_headers()
+            return
+        start = 0
+        if self.headers.get("Range") and self.headers.get("If-Range") == ETAG:
+            start = int(self.headers["Range"][len("bytes="):-1])
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-Range", f"bytes {start}-{len(BODY) - 1}/{len(BODY)}")
+        else:
+            self.send_response(HTTPStatus.OK)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(BODY) - start))
+        self.end_headers()
+        end = len(BODY) if self.interrupt_at is None else self.interrupt_at
+        self.wfile.write(BODY[start:end])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    RecipesHandler.interrupt_at = None
+    RecipesHandler.requests = []
+    server = HTTPServer(("127.0.0.1", 0), RecipesHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/recipes.json"
+    server.shutdown()
+    server.server_close()
+
+
+def test_conditional_download(server, tmp_path):
+    path = str(tmp_path / "recipes.json")
+    downloader = Downloader()
+
+    assert downloader.download(server, path) is True
+    assert open(path, "rb").read() == BODY
+
+    assert downloader.download(server, path) is False
+    assert RecipesHandler.requests[-1]["If-None-Match"] == ETAG
+    assert open(path, "rb").read() == BODY
+
+
+def test_resume_interrupted_download(server, tmp_path):
+    path = str(tmp_path / "recipes.json")
+    downloader = Downloader()
+    downloader.CHUNK_SIZE = 4
+
+    RecipesHandler.interrupt_at = 10
+    with pytest.raises(Exception):
+        downloader.download(server, path)
+    part = open(f"{path}.part", "rb").read()
+    assert part and BODY.startswith(part)
+
+    RecipesHandler.interrupt_at = None
+    assert downloader.download(server, path) is True
+    assert RecipesHandler.requests[-1]["Range"] == f"bytes={len(part)}-"
+    assert open(path, "rb").read() == BODY
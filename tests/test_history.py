@@ -0,0 +1,146 @@
+import logging
+
+import pytest
+
+from scheduler import Job, Scheduler, Task
+from scheduler.history import SQLiteRunHistory
+from scheduler.runner import JobRunner
+from scheduler.task import SkipDownstream, TaskFailedError
+
+
+@pytest.fixture
+def history(tmp_path):
+    yield SQLiteRunHistory(str(tmp_path / "history.db"), size=3)
+
+
+def fail():
+    raise Exception("TestException")
+
+
+def test_ring_keeps_last_runs(history):
+    for i in range(5):
+        history.record("etl", i, 10 + i, "completed", [("extract", i, "completed"), ("load", None, "failed")])
+
+    assert history.job_durations("etl") == [12, 13, 14]
+    assert history.task_durations("etl") == {"extract": [2, 3, 4]}
+    assert history.estimates("etl") == {"extract": 3}
+    assert history.expected_duration("etl") == 13
+    assert history.expected_duration("other") is None
+    rows = history._connect().execute("SELECT COUNT(*) FROM task_history").fetchone()[0]
+    assert rows == 6
+
+
+def test_tasks_not_run_lately_are_forgotten(history):
+    history.record("etl", 0, 10, "completed", [("extract", 1, "completed"), ("process", 8, "completed")])
+    for i in range(1, 3):
+        history.record("etl", i, 1, "completed", [("extract", 1, "completed")])
+    assert history.task_durations("etl") == {"extract": [1, 1, 1], "process": [8]}
+
+    history.record("etl", 3, 1, "completed", [("extract", 1, "completed")])
+
+    assert history.task_durations("etl") == {"extract": [1, 1, 1]}
+    rows = history._connect().execute("SELECT COUNT(*) FROM task_history WHERE task_id = 'process'").fetchone()[0]
+    assert rows == 0
+
+
+def test_smaller_ring_ignores_older_slots(history, tmp_path):
+    for i in range(3):
+        history.record("etl", i, i, "completed", [("extract", i, "completed")])
+
+    smaller = SQLiteRunHistory(history.path, size=2)
+
+    assert smaller.job_durations("etl") == [1, 2]
+    assert smaller.task_durations("etl") == {"extract": [1, 2]}
+
+
+def test_run_appends_history(history):
+    job = Job("etl", history=history)
+    extract_task = Task(lambda: None, "extract", job)
+    load_task = Task(fail, "load", job)
+    extract_task.set_upstream(load_task)
+
+    with pytest.raises(TaskFailedError):
+        job.run()
+
+    assert list(history.task_durations("etl")) == ["extract"]
+    statuses = history._connect().execute("SELECT task_id, status FROM task_history ORDER BY task_id").fetchall()
+    assert statuses == [("extract", "completed"), ("load", "failed")]
+    assert history.job_durations("etl") == []
+
+
+def test_estimates_order_ready_tasks(history):
+    history.record("etl", 0, 100, "completed", [("slow", 60, "completed"), ("fast", 1, "completed")])
+    seq = []
+    job = Job("etl", history=history)
+    Task(lambda: seq.append("fast"), "fast", job)
+    Task(lambda: seq.append("slow"), "slow", job)
+    Task(lambda: seq.append("new"), "new", job)
+
+    runner = JobRunner(job)
+
+    assert runner.estimate("new") == 30.5
+    assert runner.expected_critical_path() == (["slow"], 60)
+    runner.run()
+    assert seq == ["slow", "new", "fast"]
+    assert runner.stats["expected_time"] == 100
+
+
+def test_overrun_warning(history, caplog):
+    history.record("etl", 0, 90, "completed", [("extract", 90, "completed")])
+    job = Job("etl", history=history)
+    job.every().minute
+    Task(lambda: None, "extract", job)
+
+    with caplog.at_level(logging.WARNING):
+        job.run()
+
+    assert "longer than its interval of 60 seconds" in caplog.text
+
+
+def test_runs_with_skipped_tasks_are_recorded_as_skipped(history):
+    def extract():
+        if runs.pop():
+            raise SkipDownstream("no new data")
+
+    runs = [False, True, True]
+    job = Job("etl", history=history)
+    extract_task = Task(extract, "extract", job)
+    extract_task.set_upstream(Task(lambda: None, "process", job))
+
+    for _ in range(3):
+        job.run()
+
+    statuses = history._connect().execute("SELECT status FROM job_history ORDER BY seq").fetchall()
+    assert statuses == [("skipped",), ("skipped",), ("completed",)]
+    assert len(history.job_durations("etl")) == 1
+
+
+def test_skipped_runs_do_not_hide_overrun(history, caplog):
+    history.record("etl", 0, 90, "completed", [("extract", 1, "completed"), ("process", 89, "completed")])
+    for i in range(1, 3):
+        history.record("etl", i, 1, "skipped", [("extract", 1, "completed"), ("process", None, "skipped")])
+    assert history.expected_duration("etl") == 90
+    job = Job("etl", history=history)
+    job.every().minute
+    Task(lambda: None, "extract", job)
+
+    with caplog.at_level(logging.WARNING):
+        job.run()
+
+    assert job.run_stats["expected_time"] == 90
+    assert "longer than its interval of 60 seconds" in caplog.text
+
+
+def test_history_needs_job_name(history):
+    with pytest.raises(ValueError):
+        JobRunner(Job(history=history))
+
+
+def test_scheduler_history(history):
+    scheduler = Scheduler(history=history)
+    named, unnamed = Job("etl"), Job()
+    scheduler.register(named)
+    scheduler.register(unnamed)
+
+    assert named.history is history
+    assert unnamed.history is None
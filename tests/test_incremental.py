@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+pytest.importorskip("pyspark")
+
+from pyspark.sql import SparkSession  # noqa: E402
+from pyspark.sql.functions import col, lit  # noqa: E402
+
+from jobs import incremental  # noqa: E402
+from jobs.incremental import load_output, write_incremental  # noqa: E402
+from jobs.manifest import Manifest  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def spark():
+    spark = SparkSession.builder.master("local[1]").appName(__name__).getOrCreate()
+    yield spark
+    spark.stop()
+
+
+def meat(records):
+    return records.where(col("meat")).withColumn("complexity", lit("easy"))
+
+
+def write(spark, path, rows, date="2020-01-01"):
+    records = spark.createDataFrame(rows, "name string, meat boolean")
+    return write_incremental(spark, records, path, meat, ingestion_date=date)
+
+
+def output(spark, path):
+    df = load_output(spark, path)
+    return sorted((row.name, row.ingestion_date) for row in df.collect()) if df is not None else []
+
+
+def test_new_unchanged_and_changed_records(spark, tmp_path):
+    path = str(tmp_path / "meat.orc")
+
+    assert write(spark, path, [("beef", True), ("salad", False)], "2020-01-01")["rows"] == 1
+    assert output(spark, path) == [("beef", "2020-01-01")]
+
+    assert write(spark, path, [("beef", True), ("salad", False)], "2020-01-02")["rows"] == 0
+    assert Manifest.read(path).version == 1
+
+    # salad is changed, pork is new
+    assert write(spark, path, [("beef", True), ("salad", True), ("pork", True)], "2020-01-03")["rows"] == 2
+    assert output(spark, path) == [("beef", "2020-01-01"), ("pork", "2020-01-03"), ("salad", "2020-01-03")]
+
+
+def test_new_records_without_output_are_remembered(spark, tmp_path):
+    path = str(tmp_path / "meat.orc")
+
+    write(spark, path, [("salad", False)])
+    manifest = Manifest.read(path)
+
+    assert manifest.files == []
+    assert len(manifest.keys) == 1
+    assert write(spark, path, [("salad", False)])["rows"] == 0
+    assert Manifest.read(path).version == manifest.version
+
+
+def test_key_directories_are_compacted(spark, tmp_path, monkeypatch):
+    monkeypatch.setattr(incremental, "MAX_KEY_DIRECTORIES", 2)
+    path = str(tmp_path / "meat.orc")
+
+    for name in ("beef", "pork", "lamb"):
+        write(spark, path, [(name, True)])
+    manifest = Manifest.read(path)
+
+    assert len(manifest.keys) == 1
+    assert os.listdir(os.path.join(path, "_keys")) == [os.path.basename(manifest.keys[0])]
+    assert write(spark, path, [("beef", True), ("pork", True), ("lamb", True)])["rows"] == 0
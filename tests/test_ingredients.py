@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("pyspark")
+
+from pyspark.sql import SparkSession  # noqa: E402
+from pyspark.sql.functions import col  # noqa: E402
+
+from jobs.ingredients import ingredient_category  # noqa: E402
+from meat_ingredients import MATCHER  # noqa: E402
+
+
+SAMPLES = [
+    "2 chicken breasts", "1 chick, chopped", "1 cup chickpeas", "lamb shoulder", "4 slices prosciutto",
+    "goat cheese", "goat-milk yogurt", "goat leg", "1 cornish game hen", "ground meat", "flour\nsugar\neggs",
+    "chicken", "chickpea", "duck", "foie gras", "graham crackers", "shallots", "gamey", "lamb", "prosciutto",
+    "rabbit", "sausage", "turkey", "goat  cheese", "goat. milk", "goat", "mutton", "pork", "veal",
+    "quail eggs", "ostrich", "goose", "meatballs", "tofu", "",
+    "1 lb ground beef\n2 pork chops", "bacon\nchicken stock", "sweetbreads", "venison\nduck fat",
+]
+
+
+@pytest.fixture(scope="module")
+def spark():
+    spark = SparkSession.builder.master("local[1]").appName(__name__).getOrCreate()
+    yield spark
+    spark.stop()
+
+
+def test_category_column_matches_matcher(spark):
+    df = spark.createDataFrame([(text,) for text in SAMPLES], "ingredients string")
+
+    rows = df.select(ingredient_category(col("ingredients")).alias("category")).collect()
+
+    assert [row.category for row in rows] == [MATCHER.match(text) for text in SAMPLES]
+
+
+def test_category_of_null(spark):
+    df = spark.createDataFrame([(None,)], "ingredients string")
+    assert df.select(ingredient_category(col("ingredients")).alias("category")).first().category is None
@@ -1,13 +1,16 @@
+import threading
 import time
 
 import pytest
 
-from datetime import datetime
+from datetime import datetime, timezone
 from unittest.mock import PropertyMock
 
 from scheduler.job import Job, Unit
-from scheduler.task import Task
+from scheduler.runner import JobRunner
+from scheduler.task import Task, TaskFailedError
 from scheduler.dag import CyclicDependenceError
+from scheduler.clock import VirtualClock
 
 
 seq = []
@@ -152,22 +155,38 @@ def test_should_run_with_last_update(job, mocker):
     assert job.should_run is False
 
 
-def test_reset_tasks(job):
-    Task(foo, "foo_task", job)
-    Task(bar, "bar_task", job)
-    Task(baz, "baz_task", job)
-    Task(foobar, "foobar", job)
+def test_concurrent_runs_keep_own_statuses():
+    job = Job("etl", max_instances=2)
+    barrier = threading.Barrier(2, timeout=5)
 
-    for task in job.tasks.values():
-        task.complete()
+    def extract():
+        barrier.wait()
+        if threading.current_thread().name == "failing":
+            raise Exception("TestException")
 
-    for task in job.tasks.values():
-        assert task.completed is True
+    extract_task = Task(extract, "extract", job)
+    load_task = Task(lambda: time.sleep(0.05), "load", job)
+    extract_task.set_upstream(load_task)
+    runners = dict(failing=JobRunner(job), passing=JobRunner(job))
+    errors = dict()
 
-    job.reset_tasks()
+    def run(name):
+        try:
+            runners[name].run()
+        except TaskFailedError as exc:
+            errors[name] = exc
 
-    for task in job.tasks.values():
-        assert task.pending is True
+    threads = [threading.Thread(target=run, args=(name,), name=name) for name in runners]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert list(errors) == ["failing"]
+    assert {task_id: run.status for task_id, run in runners["failing"].task_runs.items()} == {
+        "extract": Task.FAILED, "load": Task.CANCELLED}
+    assert {task_id: run.status for task_id, run in runners["passing"].task_runs.items()} == {
+        "extract": Task.COMPLETED, "load": Task.COMPLETED}
 
 
 @pytest.mark.usefixtures("cleanup_seq")
@@ -225,3 +244,41 @@ def test_complex_case(job):
     assert r11.upstream == {r00}
     assert r12.upstream == {r00, r01}
     assert r13.upstream == {r01}
+
+
+def test_next_fire_time(job):
+    job.every(2).minute.at(second=10)
+    t = datetime(2020, 1, 1, 10, 1, 30, tzinfo=timezone.utc).timestamp()
+    assert job.next_fire_time(t) - t == 40
+    assert job.next_fire_time(t + 40) - t == 160
+    assert job.next_fire_time(t - 81) - t == -80
+
+
+def test_pass_results(job):
+    foo_task = Task(lambda: 2, "foo_task", job)
+    bar_task = Task(lambda: 3, "bar_task", job)
+    baz_task = Task(lambda foo, bar: foo * bar, "baz_task", job, inputs=[foo_task, bar_task])
+
+    assert baz_task.upstream == {foo_task, bar_task}
+    assert job.run() == {"foo_task": 2, "bar_task": 3, "baz_task": 6}
+
+
+def test_schedule_every_day(job):
+    job.every().day.at(hour=3, minute=30)
+    assert job.unit == Unit.DAY
+    dt = datetime.utcfromtimestamp(job.next_fire_time(time.time()))
+    assert (dt.hour, dt.minute, dt.second) == (3, 30, 0)
+
+
+def test_cron(job):
+    job.cron("0 9 * * MON-FRI")
+    assert job.scheduled
+
+    t = datetime(2020, 1, 3, 10, tzinfo=timezone.utc).timestamp()
+    assert job.next_fire_time(t) == datetime(2020, 1, 6, 9, tzinfo=timezone.utc).timestamp()
+
+    job.clock = VirtualClock(t)
+    assert job.next_run == datetime(2020, 1, 3, 9, tzinfo=timezone.utc).timestamp()
+    assert job.should_run is True
+    job.last_fire_time = job.next_run
+    assert job.should_run is False
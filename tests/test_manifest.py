@@ -0,0 +1,52 @@
+import json
+import os
+
+import pytest
+
+from jobs.manifest import MANIFEST_NAME, Manifest
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    return str(tmp_path)
+
+
+def test_read_missing_manifest(dataset):
+    manifest = Manifest.read(dataset)
+
+    assert manifest.version == 0
+    assert manifest.files == []
+    assert manifest.keys == []
+
+
+def test_publish_adds_files(dataset):
+    first = Manifest.read(dataset).publish(dataset, files=["a=1/part-0.orc"], keys=["_keys/0"])
+    second = first.publish(dataset, files=["a=2/part-1.orc"], keys=["_keys/1"])
+
+    manifest = Manifest.read(dataset)
+    assert manifest.version == second.version == 2
+    assert manifest.files == ["a=1/part-0.orc", "a=2/part-1.orc"]
+    assert manifest.keys == ["_keys/0", "_keys/1"]
+    assert first.files == ["a=1/part-0.orc"]
+
+
+def test_publish_drops_keys(dataset):
+    manifest = Manifest.read(dataset).publish(dataset, keys=["_keys/0", "_keys/1"])
+    manifest.publish(dataset, keys=["_keys/2-compacted"], dropped_keys=["_keys/0", "_keys/1"])
+
+    assert Manifest.read(dataset).keys == ["_keys/2-compacted"]
+
+
+def test_publish_leaves_no_temporary_files(dataset):
+    Manifest.read(dataset).publish(dataset, files=["part-0.orc"])
+
+    assert os.listdir(dataset) == [MANIFEST_NAME]
+    with open(os.path.join(dataset, MANIFEST_NAME)) as f:
+        assert json.load(f)["files"] == ["part-0.orc"]
+
+
+def test_paths(dataset):
+    manifest = Manifest(1, files=["a=1/part-0.orc"], keys=["_keys/0"])
+
+    assert manifest.paths(dataset) == [os.path.join(dataset, "a=1/part-0.orc")]
+    assert manifest.paths(dataset, manifest.keys) == [os.path.join(dataset, "_keys/0")]
@@ -0,0 +1,33 @@
+import re
+
+import pytest
+
+from meat_ingredients import EXPRESSIONS, MATCHER
+
+
+@pytest.mark.parametrize("ingredients, category", [
+    ("2 chicken breasts", "chicken"),
+    ("1 chick, chopped", "chicken"),
+    ("1 cup chickpeas", None),
+    ("lamb shoulder", "lamb"),
+    ("4 slices prosciutto", "prosciutto"),
+    ("goat cheese", None),
+    ("goat-milk yogurt", None),
+    ("goat leg", "goat"),
+    ("1 cornish game hen", "cornish game hen"),
+    ("ground meat", "meat"),
+    ("flour\nsugar\neggs", None),
+])
+def test_match(ingredients, category):
+    assert MATCHER.match(ingredients) == category
+
+
+def test_same_rows_as_alternation():
+    alternation = re.compile("|".join(EXPRESSIONS))
+    texts = [
+        "chicken", "chickpea", "duck", "foie gras", "graham crackers", "shallots", "gamey", "lamb", "prosciutto",
+        "rabbit", "sausage", "turkey", "goat  cheese", "goat. milk", "goat", "mutton", "pork", "veal",
+        "quail eggs", "ostrich", "goose", "meatballs", "tofu", "",
+    ]
+    for text in texts:
+        assert (MATCHER.match(text) is not None) == (alternation.search(text) is not None), text
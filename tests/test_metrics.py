@@ -0,0 +1,191 @@
+import asyncio
+import time
+import urllib.request
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from scheduler import Job, Scheduler, Task
+from scheduler.metrics import MetricsRegistry, RunHooks, collect, report
+from scheduler.runner import JobRunner
+from scheduler.task import TaskFailedError, TaskRun
+
+BUILTIN = {"started", "wall_time", "cpu_time", "process_max_rss", "queue_latency", "attempts"}
+
+
+def error_func():
+    raise Exception("TestException")
+
+
+def reported(task_run):
+    return {key: value for key, value in task_run.metrics.items() if key not in BUILTIN}
+
+
+def test_task_run_collects_metrics():
+    def func():
+        report(rows=10)
+        report(bytes=100)
+
+    task_run = TaskRun(Task(func, "task", Job()))
+    task_run.run()
+
+    assert reported(task_run) == {"rows": 10, "bytes": 100}
+
+
+def test_metrics_are_cleared_on_new_run():
+    runs = []
+
+    def func():
+        if not runs:
+            report(rows=10)
+        runs.append(True)
+
+    task_run = TaskRun(Task(func, "task", Job()))
+    task_run.run()
+    task_run.run()
+
+    assert reported(task_run) == {}
+
+
+def test_job_run_keeps_metrics_per_task():
+    job = Job()
+    tasks = [Task(lambda i=i: report(index=i), f"task{i}", job) for i in range(8)]
+
+    with ThreadPoolExecutor(4) as executor:
+        runner = JobRunner(job, executor)
+        runner.run()
+
+    assert [reported(runner.task_runs[task.id]) for task in tasks] == [{"index": i} for i in range(8)]
+
+
+def test_run_async_keeps_metrics_of_concurrent_coroutines():
+    job = Job()
+
+    def make(i):
+        async def coroutine():
+            report(before=i)
+            await asyncio.sleep(0.01)
+            report(after=i)
+        return coroutine
+
+    tasks = [Task(make(i), f"task{i}", job) for i in range(4)]
+    runner = JobRunner(job)
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(runner.run_async())
+    finally:
+        loop.close()
+
+    assert [reported(runner.task_runs[task.id]) for task in tasks] == [{"before": i, "after": i} for i in range(4)]
+
+
+def test_report_outside_task_is_ignored():
+    report(rows=10)
+
+    with collect() as metrics:
+        pass
+    task_run = TaskRun(Task(lambda: None, "task", Job()))
+    task_run.run()
+
+    assert metrics == {}
+    assert reported(task_run) == {}
+
+
+def test_task_timing():
+    def func():
+        time.sleep(0.05)
+
+    task_run = TaskRun(Task(func, "task", Job()))
+    task_run.run()
+
+    assert task_run.metrics["wall_time"] >= 0.05
+    assert task_run.metrics["cpu_time"] < task_run.metrics["wall_time"]
+
+
+class Recorder(RunHooks):
+    def __init__(self):
+        self.tasks = []
+        self.runs = []
+
+    def task_finished(self, job, task):
+        self.tasks.append((task.id, task.status))
+
+    def job_finished(self, job, stats):
+        self.runs.append(stats)
+
+
+def test_hooks_and_critical_path():
+    recorder = Recorder()
+    job = Job("job", hooks=[recorder])
+    short = Task(lambda: time.sleep(0.01), "short", job)
+    long = Task(lambda: time.sleep(0.1), "long", job)
+    last = Task(lambda: None, "last", job)
+    long.set_upstream(last)
+    short.set_upstream(last)
+
+    with ThreadPoolExecutor(2) as executor:
+        job.run(executor=executor, fire_time=time.time() - 1)
+
+    assert sorted(recorder.tasks) == [("last", Task.COMPLETED), ("long", Task.COMPLETED), ("short", Task.COMPLETED)]
+    stats, = recorder.runs
+    assert stats is job.run_stats
+    assert stats["status"] == Task.COMPLETED
+    assert stats["critical_path"] == ["long", "last"]
+    assert 0.1 <= stats["critical_path_time"] <= stats["wall_time"]
+    assert stats["queue_latency"] >= 1
+
+
+def test_failing_hook_does_not_fail_run():
+    class Failing(RunHooks):
+        def task_finished(self, job, task):
+            raise RuntimeError("hook")
+
+    job = Job(hooks=[Failing()])
+    Task(lambda: None, "task", job)
+
+    assert job.run() == {"task": None}
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_registry_renders_prometheus_text(registry):
+    job = Job("job", hooks=[registry])
+    Task(lambda: None, "task", job)
+    Task(error_func, "error_task", job)
+
+    with pytest.raises(TaskFailedError):
+        job.run()
+
+    text = registry.render()
+    assert 'scheduler_task_runs_total{job="job",task="task",status="completed"} 1.0' in text
+    assert 'scheduler_task_runs_total{job="job",task="error_task",status="failed"} 1.0' in text
+    assert 'scheduler_job_runs_total{job="job",status="failed"} 1.0' in text
+    assert 'scheduler_task_wall_seconds_count{job="job",task="task"} 1.0' in text
+    assert 'scheduler_job_critical_path_seconds{job="job"}' in text
+
+
+def test_registry_serves_metrics(registry):
+    registry.pending_finished([], 0.5)
+    server = registry.serve(0, "127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert "scheduler_run_pending_seconds_sum 0.5" in response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_scheduler_hooks(registry):
+    scheduler = Scheduler()
+    scheduler.hooks.append(registry)
+    job = Job("job")
+    Task(lambda: None, "task", job)
+
+    scheduler.run_job(job)
+
+    assert 'scheduler_job_runs_total{job="job",status="completed"} 1.0' in registry.render()
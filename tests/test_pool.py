@@ -0,0 +1,186 @@
+import asyncio
+import functools
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from scheduler import AsyncScheduler, Job, Task
+from scheduler.pool import ResourcePool
+from scheduler.task import JobDeadlineError, TaskFailedError
+
+
+@pytest.fixture
+def pool():
+    yield ResourcePool(spark=1, memory=8)
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+
+class Tracker:
+    """
+    Records the max number of tasks of every kind running at once.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = dict()
+        self.max_running = dict()
+
+    def task(self, kind, seconds=0.05):
+        def run():
+            with self.lock:
+                self.running[kind] = self.running.get(kind, 0) + 1
+                self.max_running[kind] = max(self.max_running.get(kind, 0), self.running[kind])
+            time.sleep(seconds)
+            with self.lock:
+                self.running[kind] -= 1
+        return run
+
+
+def test_acquire_and_release(pool):
+    assert pool.acquire({"spark": 1, "memory": 4}) is True
+    assert pool.acquire({"memory": 4}) is True
+    assert pool.acquire({"memory": 1}) is False
+    assert pool.acquire({"network": 100}) is True
+
+    released = pool.released()
+    pool.release({"spark": 1, "memory": 4})
+
+    assert released.done()
+    assert pool.acquire({"spark": 1, "memory": 1}) is True
+
+
+def test_released_since(pool):
+    since = pool.releases
+    pool.acquire({"spark": 1})
+    pool.release({"spark": 1})
+
+    assert pool.released(since).done()
+    assert not pool.released(pool.releases).done()
+
+
+def test_requirements_over_capacity(pool):
+    job = Job(pool=pool)
+    Task(lambda: None, "huge", job, resources={"memory": 16})
+
+    with pytest.raises(ValueError):
+        job.run()
+
+
+def test_pool_limits_tasks(pool, executor):
+    tracker = Tracker()
+    job = Job(pool=pool)
+    for i in range(3):
+        Task(tracker.task("spark"), f"spark_{i}", job, resources={"spark": 1})
+    for i in range(3):
+        Task(tracker.task("network"), f"network_{i}", job)
+
+    job.run(executor=executor)
+
+    assert tracker.max_running == {"spark": 1, "network": 3}
+
+
+def test_pool_shared_by_runs(pool, executor):
+    tracker = Tracker()
+    jobs = [Job(f"job_{i}", pool=pool) for i in range(2)]
+    for job in jobs:
+        for i in range(2):
+            Task(tracker.task("spark"), f"spark_{i}", job, resources={"memory": 6})
+
+    threads = [threading.Thread(target=job.run, args=(executor,)) for job in jobs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert tracker.max_running == {"spark": 1}
+    assert pool.used["memory"] == 0
+
+
+def test_scheduler_pool(pool):
+    tracker = Tracker()
+    scheduler = AsyncScheduler(pool=pool)
+    jobs = [Job(f"job_{i}") for i in range(3)]
+    for job in jobs:
+        Task(tracker.task("spark"), "spark", job, resources={"spark": 1})
+        scheduler.register(job)
+
+    async def run_jobs():
+        await asyncio.gather(*(scheduler.run_job(job) for job in jobs))
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(run_jobs())
+    finally:
+        loop.close()
+
+    assert all(job.pool is pool for job in jobs)
+    assert tracker.max_running == {"spark": 1}
+
+
+def test_cancelled_tasks_hold_resources_till_they_stop(pool, executor):
+    stop = threading.Event()
+    job = Job(pool=pool, deadline=0.1)
+    Task(lambda: stop.wait(10), "spark", job, resources={"spark": 1})
+    Task(lambda: None, "waiting", job, resources={"spark": 1})
+
+    with pytest.raises((JobDeadlineError, TaskFailedError)):
+        job.run(executor=executor)
+
+    assert pool.used["spark"] == 1
+    released = pool.released(pool.releases)
+    stop.set()
+    released.result(10)
+    assert pool.used["spark"] == 0
+
+
+def test_cancelled_tasks_hold_resources_till_they_stop_async(pool, executor):
+    stop = threading.Event()
+    job = Job(pool=pool, deadline=0.1)
+    Task(lambda: stop.wait(10), "spark", job, resources={"spark": 1})
+    Task(functools.partial(asyncio.sleep, 60), "sleep", job, resources={"memory": 8})
+
+    loop = asyncio.new_event_loop()
+    try:
+        with pytest.raises((JobDeadlineError, TaskFailedError)):
+            loop.run_until_complete(job.run_async(executor))
+        loop.run_until_complete(asyncio.sleep(0))
+        assert pool.used == {"spark": 1, "memory": 0}
+        released = pool.released(pool.releases)
+        stop.set()
+        released.result(10)
+        assert pool.used["spark"] == 0
+    finally:
+        loop.close()
+
+
+def test_priority():
+    seq = []
+    job = Job()
+    Task(lambda: seq.append("low"), "low", job)
+    Task(lambda: seq.append("high"), "high", job, priority=10)
+
+    job.run()
+
+    assert seq == ["high", "low"]
+
+
+def test_longest_chain_first():
+    seq = []
+    job = Job()
+    Task(lambda: seq.append("side"), "side", job)
+    extract_task = Task(lambda: seq.append("extract"), "extract", job)
+    transform_task = Task(lambda: seq.append("transform"), "transform", job)
+    load_task = Task(lambda: seq.append("load"), "load", job)
+    extract_task.set_upstream(transform_task)
+    transform_task.set_upstream(load_task)
+
+    job.run()
+
+    assert seq == ["extract", "transform", "side", "load"]
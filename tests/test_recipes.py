@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+pytest.importorskip("isodate")
+pytest.importorskip("pyspark")
+
+from pyspark.sql import SparkSession  # noqa: E402
+
+from jobs.recipes import RECIPES_SCHEMAS, RECIPES_SCHEMA_VERSION, read_recipes, select_meat_recipes  # noqa: E402
+
+RECIPES_PATH = os.path.join(os.path.dirname(__file__), "data", "recipes.json")
+
+
+@pytest.fixture(scope="module")
+def spark():
+    spark = SparkSession.builder.master("local[1]").appName(__name__).getOrCreate()
+    yield spark
+    spark.stop()
+
+
+def test_read_recipes(spark):
+    recipes = read_recipes(spark, RECIPES_PATH)
+
+    assert recipes.schema == RECIPES_SCHEMAS[RECIPES_SCHEMA_VERSION]
+    assert recipes.count() == 6
+
+
+def test_select_meat_recipes(spark):
+    rows = select_meat_recipes(read_recipes(spark, RECIPES_PATH)).collect()
+
+    assert sorted((row.name, row.category, row.complexity) for row in rows) == [
+        ("Lamb Stew", "lamb", "hard"),
+        ("Meatballs", "meat", "medium"),
+        ("Prosciutto Toast", "prosciutto", "easy"),
+        ("Roast Chicken", "chicken", "hard"),
+    ]
@@ -0,0 +1,93 @@
+import pytest
+
+from scheduler import Scheduler
+from scheduler.resource import LazyResource
+
+
+class Value:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def created():
+    return []
+
+
+@pytest.fixture
+def resource(created):
+    def factory():
+        created.append(Value())
+        return created[-1]
+
+    return LazyResource(factory, close=Value.close, idle_timeout=10)
+
+
+def test_value_is_created_on_first_use(resource, created):
+    assert created == []
+    with resource as first:
+        with resource as second:
+            assert first is second
+    assert len(created) == 1
+    assert resource.created
+
+
+def test_idle_value_is_closed(resource, created):
+    with resource:
+        pass
+
+    assert resource.expire(resource.last_used + 5) is False
+    assert resource.expire(resource.last_used + 10) is True
+    assert created[0].closed
+    assert not resource.created
+
+    with resource as value:
+        assert value is created[1]
+
+
+def test_used_value_is_not_closed(resource, created):
+    with resource:
+        assert resource.expire(resource.last_used + 100) is False
+    assert not created[0].closed
+
+
+def test_value_without_idle_timeout_is_not_closed(created):
+    resource = LazyResource(Value, close=Value.close)
+    resource.get()
+
+    assert resource.expire(resource.last_used + 10 ** 6) is False
+
+
+def test_scheduler_closes_resources_on_stop(resource, created):
+    scheduler = Scheduler()
+    scheduler.add_resource(resource)
+    resource.get()
+
+    def on_heartbeat(details):
+        scheduler.should_stop = True
+
+    scheduler.on_heartbeat = on_heartbeat
+    scheduler.run(delay=0.01)
+
+    assert created[0].closed
+    assert scheduler.resources == [resource]
+
+
+def test_scheduler_expires_idle_resources(resource, created):
+    resource.idle_timeout = 0
+    scheduler = Scheduler()
+    scheduler.add_resource(resource)
+    resource.get()
+    closed = []
+
+    def on_heartbeat(details):
+        closed.append(created[0].closed)
+        scheduler.should_stop = True
+
+    scheduler.on_heartbeat = on_heartbeat
+    scheduler.run(delay=0.01)
+
+    assert closed == [True]
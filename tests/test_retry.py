@@ -0,0 +1,203 @@
+import asyncio
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from scheduler import Job, Task
+from scheduler.clock import VirtualClock
+from scheduler.retry import RetryPolicy
+from scheduler.runner import JobRunner
+from scheduler.task import JobDeadlineError, TaskFailedError, TaskRun, TaskTimeoutError
+
+
+def hang():
+    time.sleep(60)
+
+
+def answer():
+    return 42
+
+
+class Flaky:
+    def __init__(self, failures, exc_type=IOError):
+        self.failures = failures
+        self.exc_type = exc_type
+        self.calls = []
+
+    def __call__(self):
+        self.calls.append(time.monotonic())
+        if len(self.calls) <= self.failures:
+            raise self.exc_type("TestException")
+        return len(self.calls)
+
+
+@pytest.fixture
+def job():
+    job = Job()
+    yield job
+
+
+def test_policy_delay():
+    policy = RetryPolicy(max_attempts=5, backoff=1, multiplier=2, max_backoff=5, jitter=0)
+
+    assert [policy.delay(attempt) for attempt in range(1, 5)] == [1, 2, 4, 5]
+    assert policy.should_retry(4, IOError()) is True
+    assert policy.should_retry(5, IOError()) is False
+
+
+def test_policy_jitter_and_types():
+    policy = RetryPolicy(backoff=10, jitter=0.5, retry_on=(IOError,))
+
+    assert all(5 <= policy.delay(1) <= 10 for _ in range(100))
+    assert policy.should_retry(1, IOError()) is True
+    assert policy.should_retry(1, ValueError()) is False
+
+
+def test_run_retries(job):
+    flaky = Flaky(failures=2)
+    Task(flaky, "flaky", job, retry=RetryPolicy(backoff=0.01))
+    runner = JobRunner(job)
+
+    assert runner.run() == {"flaky": 3}
+    assert runner.task_runs["flaky"].metrics["attempts"] == 3
+
+
+def test_not_retryable_error_fails_at_once(job):
+    flaky = Flaky(failures=1, exc_type=ValueError)
+    Task(flaky, "flaky", job, retry=RetryPolicy(backoff=0.01, retry_on=(IOError,)))
+
+    with pytest.raises(TaskFailedError):
+        job.run()
+    assert len(flaky.calls) == 1
+
+
+def test_retry_does_not_hold_worker(job):
+    flaky = Flaky(failures=1)
+    finished = []
+    Task(flaky, "flaky", job, retry=RetryPolicy(backoff=0.2, jitter=0))
+    Task(lambda: finished.append(time.monotonic()), "other", job)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        job.run(executor=executor, max_concurrency=1)
+
+    assert flaky.calls[1] - flaky.calls[0] >= 0.2
+    assert finished[0] < flaky.calls[1]
+
+
+def test_task_run_retries(job):
+    flaky = Flaky(failures=1)
+    task_run = TaskRun(Task(flaky, "flaky", job, retry=RetryPolicy(backoff=0.01)))
+
+    assert task_run.run() == 2
+    assert task_run.completed is True
+
+
+def test_timeout_kills_function(job):
+    Task(hang, "hang", job, timeout=0.5)
+    runner = JobRunner(job)
+    started = time.monotonic()
+
+    with pytest.raises(TaskFailedError) as exc_info:
+        runner.run()
+
+    assert time.monotonic() - started < 10
+    assert isinstance(exc_info.value.args[0], TaskTimeoutError)
+    assert runner.task_runs["hang"].status == Task.FAILED
+
+
+def test_timeout_returns_result(job):
+    Task(answer, "answer", job, timeout=10)
+    runner = JobRunner(job)
+
+    assert runner.run() == {"answer": 42}
+    assert runner.task_runs["answer"].metrics["wall_time"] >= 0
+
+
+def test_timeout_in_process_pool(job):
+    Task(hang, "hang", job, timeout=0.5)
+    Task(answer, "answer", job, timeout=10)
+    runner = JobRunner(job, executor=ProcessPoolExecutor(max_workers=2))
+
+    with runner.executor, pytest.raises(TaskFailedError) as exc_info:
+        runner.run()
+
+    assert isinstance(exc_info.value.args[0], TaskTimeoutError)
+    assert runner.results["answer"] == 42
+
+
+def test_timeout_cancels_coroutine(job):
+    cancelled = []
+
+    async def wait():
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    Task(wait, "wait", job, timeout=0.1, retry=RetryPolicy(max_attempts=2, backoff=0.01))
+
+    loop = asyncio.new_event_loop()
+    try:
+        with pytest.raises(TaskFailedError):
+            loop.run_until_complete(job.run_async())
+    finally:
+        loop.close()
+    assert cancelled == [True, True]
+
+
+def test_deadline(job):
+    job.deadline = 0.5
+    hang_task = Task(hang, "hang", job, timeout=30)
+    after_task = Task(answer, "after", job)
+    hang_task.set_upstream(after_task)
+    runner = JobRunner(job)
+    started = time.monotonic()
+
+    with pytest.raises(JobDeadlineError):
+        runner.run()
+
+    assert time.monotonic() - started < 10
+    assert runner.task_runs["hang"].status == Task.CANCELLED
+    assert runner.task_runs["after"].status == Task.CANCELLED
+
+
+def test_deadline_cancels_retries(job):
+    job.deadline = 0.3
+    flaky = Flaky(failures=10)
+    Task(flaky, "flaky", job, retry=RetryPolicy(max_attempts=10, backoff=5))
+    runner = JobRunner(job)
+
+    with pytest.raises(JobDeadlineError):
+        runner.run()
+
+    assert len(flaky.calls) == 1
+    assert runner.task_runs["flaky"].status == Task.CANCELLED
+
+
+def test_retry_on_virtual_clock():
+    clock = VirtualClock(1000)
+    job = Job("job", clock=clock)
+    flaky = Flaky(failures=2)
+    Task(flaky, "flaky", job, retry=RetryPolicy(backoff=60, jitter=0))
+
+    started = time.monotonic()
+    assert job.run() == {"flaky": 3}
+
+    assert time.monotonic() - started < 10
+    assert clock.monotonic() >= 60 + 120
+
+
+def test_deadline_on_virtual_clock():
+    clock = VirtualClock(1000)
+    job = Job("job", clock=clock, deadline=600)
+    Task(Flaky(failures=100), "flaky", job, retry=RetryPolicy(max_attempts=100, backoff=60, jitter=0))
+    runner = JobRunner(job)
+
+    with pytest.raises(JobDeadlineError):
+        runner.run()
+
+    assert clock.monotonic() == 600
+    assert runner.task_runs["flaky"].status == Task.CANCELLED
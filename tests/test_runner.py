@@ -0,0 +1,224 @@
+import asyncio
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import pytest
+
+from scheduler import Job, Task
+from scheduler.retry import RetryPolicy
+from scheduler.runner import JobRunner
+from scheduler.task import FanOut, TaskFailedError, SkipDownstream
+
+
+def noop():
+    pass
+
+
+def error_task():
+    raise Exception("TestException")
+
+
+@pytest.fixture
+def job():
+    job = Job()
+    yield job
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+
+def test_run_independent_tasks_concurrently(job, executor):
+    barrier = threading.Barrier(2, timeout=5)
+    seq = []
+    foo_task = Task(barrier.wait, "foo_task", job)
+    bar_task = Task(barrier.wait, "bar_task", job)
+    baz_task = Task(lambda: seq.append("baz"), "baz_task", job)
+    foo_task.set_upstream(baz_task)
+    bar_task.set_upstream(baz_task)
+
+    job.run(executor=executor)
+
+    assert seq == ["baz"]
+
+
+def test_max_concurrency(job, executor):
+    lock = threading.Lock()
+    running = []
+    max_running = []
+
+    def task():
+        with lock:
+            running.append(True)
+            max_running.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+
+    for i in range(4):
+        Task(task, f"task_{i}", job)
+
+    job.run(executor=executor, max_concurrency=2)
+
+    assert len(max_running) == 4
+    assert max(max_running) == 2
+
+
+def test_failed_task_cancels_downstream(job, executor):
+    error = Task(error_task, "error_task", job)
+    foo_task = Task(noop, "foo_task", job)
+    bar_task = Task(noop, "bar_task", job)
+    baz_task = Task(noop, "baz_task", job)
+    error.set_upstream(foo_task)
+    foo_task.set_upstream(bar_task)
+
+    runner = JobRunner(job, executor)
+    with pytest.raises(TaskFailedError):
+        runner.run()
+
+    assert runner.task_runs[error.id].status == Task.FAILED
+    assert runner.task_runs[foo_task.id].status == Task.CANCELLED
+    assert runner.task_runs[bar_task.id].status == Task.CANCELLED
+    assert runner.task_runs[baz_task.id].status == Task.COMPLETED
+
+
+def test_process_pool(job):
+    foo_task = Task(noop, "foo_task", job)
+    bar_task = Task(noop, "bar_task", job)
+    foo_task.set_upstream(bar_task)
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        runner = JobRunner(job, executor)
+        runner.run()
+
+    assert runner.task_runs[foo_task.id].completed is True
+    assert runner.task_runs[bar_task.id].completed is True
+
+
+def test_skip_downstream(job, executor):
+    def extract():
+        raise SkipDownstream("no new data")
+
+    extract_task = Task(extract, "extract", job)
+    transform_task = Task(noop, "transform", job)
+    load_task = Task(noop, "load", job)
+    other_task = Task(noop, "other", job)
+    extract_task.set_upstream(transform_task)
+    transform_task.set_upstream(load_task)
+    other_task.set_upstream(load_task)
+
+    runner = JobRunner(job, executor)
+    runner.run()
+
+    assert runner.task_runs[extract_task.id].status == Task.COMPLETED
+    assert runner.task_runs[other_task.id].status == Task.COMPLETED
+    assert runner.task_runs[transform_task.id].status == Task.SKIPPED
+    assert runner.task_runs[load_task.id].status == Task.SKIPPED
+
+
+def test_fan_out(job, executor):
+    barrier = threading.Barrier(3, timeout=5)
+
+    def count(shard, factor):
+        barrier.wait()
+        return len(shard) * factor
+
+    shards_task = Task(lambda: ["a", "bb", "ccc"], "shards", job)
+    factor_task = Task(lambda: 10, "factor", job)
+    count_task = FanOut(count, "count", job, inputs=[shards_task, factor_task], reduce=sum)
+    Task(lambda total: total + 1, "total", job, inputs=[count_task])
+
+    results = job.run(executor=executor)
+
+    assert results["count"] == 60
+    assert results["total"] == 61
+    assert set(job.tasks) == {"shards", "factor", "count", "total"}
+    assert set(job.dag.graph) == set(job.tasks)
+
+
+def test_fan_out_items_change_between_runs(job):
+    items = [[1, 2], [], [3, 4, 5]]
+    items_task = Task(items.pop, "items", job)
+    FanOut(lambda item: item * 2, "double", job, inputs=[items_task])
+
+    assert job.run()["double"] == [6, 8, 10]
+    assert job.run()["double"] == []
+    assert job.run()["double"] == [2, 4]
+
+
+def test_fan_out_options(job):
+    policy = RetryPolicy(max_attempts=3)
+    items_task = Task(lambda: [1, 2], "items", job)
+    fan_out = FanOut(noop, "noop", job, inputs=[items_task], retry=policy, timeout=10, resources={"network": 1},
+                     reduce_options=dict(resources={"cpu": 1}))
+
+    sub_task = fan_out.expand([[1]])[0]
+
+    assert (sub_task.retry, sub_task.timeout, dict(sub_task.resources)) == (policy, 10, {"network": 1})
+    assert (fan_out.retry, fan_out.timeout, dict(fan_out.resources)) == (None, None, {"cpu": 1})
+
+
+def test_fan_out_failed_item_cancels_downstream(job, executor):
+    def check(item):
+        if item == 2:
+            raise Exception("TestException")
+        return item
+
+    items_task = Task(lambda: [1, 2, 3], "items", job)
+    check_task = FanOut(check, "check", job, inputs=[items_task])
+    load_task = Task(noop, "load", job)
+    check_task.set_upstream(load_task)
+
+    runner = JobRunner(job, executor)
+    with pytest.raises(TaskFailedError):
+        runner.run()
+
+    assert runner.task_runs[check_task.id].status == Task.CANCELLED
+    assert runner.task_runs[load_task.id].status == Task.CANCELLED
+    assert runner.results[check_task.sub_task_ids([1])[0]] == 1
+    assert set(job.tasks) == {"items", "check", "load"}
+
+
+def test_fan_out_async(job):
+    async def fetch(url):
+        await asyncio.sleep(0.01)
+        return url.upper()
+
+    urls_task = Task(lambda: ["a", "b"], "urls", job)
+    FanOut(fetch, "fetch", job, inputs=[urls_task], reduce=",".join)
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(job.run_async())
+    finally:
+        loop.close()
+
+    assert results["fetch"] == "A,B"
+
+
+def test_fan_out_concurrent_runs():
+    job = Job(max_instances=2)
+
+    async def fetch(url):
+        await asyncio.sleep(0.01)
+        return url.upper()
+
+    urls_task = Task(lambda: ["a", "b", "a"], "urls", job)
+    fetch_task = FanOut(fetch, "fetch", job, inputs=[urls_task], reduce=",".join)
+
+    async def run_jobs():
+        return await asyncio.gather(job.run_async(), job.run_async())
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(run_jobs())
+    finally:
+        loop.close()
+
+    assert [result["fetch"] for result in results] == ["A,B,A", "A,B,A"]
+    assert set(job.tasks) == {"urls", "fetch"}
+    assert len(set(fetch_task.sub_task_ids(["a", "b", "a"]))) == 3
@@ -0,0 +1,93 @@
+from datetime import datetime, time, timezone
+
+import pytest
+
+from scheduler.schedule import CronSchedule, IntervalSchedule
+
+
+def ts(*args, tz=timezone.utc, fold=0):
+    return datetime(*args, tzinfo=tz, fold=fold).timestamp()
+
+
+def utc(t):
+    return datetime.fromtimestamp(t, timezone.utc).replace(tzinfo=None)
+
+
+@pytest.mark.parametrize("expression, t, expected", [
+    ("*/15 * * * *", ts(2020, 1, 1, 10, 7), datetime(2020, 1, 1, 10, 15)),
+    ("*/15 * * * *", ts(2020, 1, 1, 10, 15), datetime(2020, 1, 1, 10, 30)),
+    ("0 9 * * MON-FRI", ts(2020, 1, 3, 10), datetime(2020, 1, 6, 9)),
+    ("30 2 29 2 *", ts(2020, 3, 1), datetime(2024, 2, 29, 2, 30)),
+    ("0 0 31 * *", ts(2020, 4, 1), datetime(2020, 5, 31)),
+    ("0 0 1 JAN,JUL *", ts(2020, 7, 2), datetime(2021, 1, 1)),
+    ("0 12 * * 7", ts(2020, 1, 1), datetime(2020, 1, 5, 12)),
+    ("*/20 * * * * *", ts(2020, 1, 1, 0, 0, 41), datetime(2020, 1, 1, 0, 1)),
+    ("@daily", ts(2020, 12, 31, 12), datetime(2021, 1, 1)),
+])
+def test_next_after(expression, t, expected):
+    assert utc(CronSchedule(expression).next_after(t)) == expected
+
+
+def test_day_or_weekday():
+    schedule = CronSchedule("0 0 13 * FRI")
+
+    assert [utc(t).day for t in schedule.fire_times(ts(2020, 3, 1), 4)] == [6, 13, 20, 27]
+
+
+def test_previous():
+    schedule = CronSchedule("0 9 * * MON-FRI")
+
+    assert utc(schedule.previous(ts(2020, 1, 6, 8))) == datetime(2020, 1, 3, 9)
+    assert schedule.previous(ts(2020, 1, 6, 9)) == ts(2020, 1, 6, 9)
+
+
+def test_fire_times():
+    schedule = CronSchedule("0 */6 * * *")
+
+    assert [utc(t).hour for t in schedule.fire_times(ts(2020, 1, 1, 1), 5)] == [6, 12, 18, 0, 6]
+
+
+def test_never_fires():
+    schedule = CronSchedule("0 0 30 2 *")
+
+    assert schedule.next_after(ts(2020, 1, 1)) is None
+    assert list(schedule.fire_times(ts(2020, 1, 1), 3)) == []
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "0 0 0 * *", "0 0 * 13 *", "5-1 * * * *", "*/0 * * * *"])
+def test_invalid_expression(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+def test_daily_blackout():
+    schedule = CronSchedule("0 * * * *", blackouts=[(time(22), time(6))])
+
+    assert [utc(t).hour for t in schedule.fire_times(ts(2020, 1, 1, 20), 4)] == [21, 6, 7, 8]
+    assert utc(schedule.previous(ts(2020, 1, 2, 3))) == datetime(2020, 1, 1, 21)
+
+
+def test_period_blackout():
+    schedule = CronSchedule("@daily", blackouts=[(datetime(2020, 12, 24), datetime(2020, 12, 27))])
+
+    assert utc(schedule.next_after(ts(2020, 12, 23, 12))) == datetime(2020, 12, 27)
+
+
+def test_dst():
+    zoneinfo = pytest.importorskip("zoneinfo")
+    tz = zoneinfo.ZoneInfo("Europe/Berlin")
+    schedule = CronSchedule("30 2 * * *", timezone="Europe/Berlin")
+
+    # 02:30 does not exist on 2020-03-29
+    assert schedule.next_after(ts(2020, 3, 28, 12, tz=tz)) == ts(2020, 3, 30, 2, 30, tz=tz)
+    # 02:30 happens twice on 2020-10-25
+    fire_times = list(schedule.fire_times(ts(2020, 10, 24, 12, tz=tz), 2))
+    assert fire_times == [ts(2020, 10, 25, 2, 30, tz=tz), ts(2020, 10, 26, 2, 30, tz=tz)]
+
+
+def test_interval_schedule():
+    schedule = IntervalSchedule(60, 10)
+
+    assert schedule.next_after(ts(2020, 1, 1, 0, 0, 5)) == ts(2020, 1, 1, 0, 0, 10)
+    assert schedule.next_after(ts(2020, 1, 1, 0, 0, 10)) == ts(2020, 1, 1, 0, 1, 10)
+    assert schedule.previous(ts(2020, 1, 1, 0, 0, 5)) == ts(2019, 12, 31, 23, 59, 10)
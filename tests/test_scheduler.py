@@ -1,9 +1,10 @@
+import asyncio
 import time
 
 import pytest
 
 from unittest.mock import PropertyMock
-from scheduler import Scheduler, Job, Task
+from scheduler import Scheduler, AsyncScheduler, Job, Task
 from scheduler.scheduler import HeartbeatDetails
 
 
@@ -94,3 +95,182 @@ def test_heartbeat(scheduler):
     assert len(heartbeats_seq) == 3
     for call_time in heartbeats_seq:
         assert call_time % 1 == 0.0
+
+
+def test_async_scheduler_runs_jobs_concurrently(mocker):
+    async_scheduler = AsyncScheduler()
+    events = []
+    bar_done = None
+
+    async def wait_bar():
+        await asyncio.wait_for(bar_done.wait(), timeout=5)
+        events.append("foo")
+
+    async def set_bar():
+        events.append("bar")
+        bar_done.set()
+
+    foo_job = Job("foo_job")
+    bar_job = Job("bar_job")
+    Task(wait_bar, "wait_bar", foo_job)
+    Task(set_bar, "set_bar", bar_job)
+    Task(foo, "foo_task", bar_job)
+    async_scheduler.register(foo_job)
+    async_scheduler.register(bar_job)
+
+    mocker.patch("scheduler.Job.next_run", new_callable=PropertyMock, return_value=time.time()-1)
+    async def run_pending():
+        nonlocal bar_done
+        bar_done = asyncio.Event()
+        await async_scheduler.run_pending()
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(run_pending())
+    finally:
+        loop.close()
+        seq.clear()
+
+    assert events == ["bar", "foo"]
+
+
+def test_async_scheduler_on_job_failed():
+    failed_seq = []
+    async_scheduler = AsyncScheduler(on_job_failed=failed_seq.append)
+
+    async def error_coroutine():
+        raise Exception("TestException")
+
+    j = Job(name="test")
+    Task(error_coroutine, "error_task", j)
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(async_scheduler.run_job(j))
+    finally:
+        loop.close()
+
+    assert failed_seq == [j]
+
+
+def test_async_scheduler_reports_other_errors(caplog):
+    failed_seq = []
+    async_scheduler = AsyncScheduler(on_job_failed=failed_seq.append)
+
+    class BrokenState:
+        def begin_run(self, job_name):
+            raise OSError("database is locked")
+
+    j = Job(name="test", state=BrokenState())
+    Task(foo, "foo", j)
+    async_scheduler.register(j)
+
+    async def fire():
+        async_scheduler._fire(j, time.time())
+        await async_scheduler.join()
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(fire())
+    finally:
+        loop.close()
+
+    assert failed_seq == [j]
+    assert "database is locked" in caplog.text
+    assert j.instances == 0
+
+
+@pytest.mark.usefixtures("cleanup_seq")
+def test_run_sleeps_until_fire_time(scheduler, mocker):
+    job = Job()
+    job.every().hour.at(minute=0)
+    Task(foo, "foo_task", job)
+    now = time.time()
+    mocker.patch.object(job, "next_fire_time", side_effect=lambda t: now + 0.1 if t < now + 0.1 else now + 3600)
+    scheduler.register(job)
+
+    heartbeats_seq = []
+
+    def on_heartbeat(details: HeartbeatDetails):
+        heartbeats_seq.append(details.call_time)
+        scheduler.should_stop = True
+
+    scheduler.on_heartbeat = on_heartbeat
+    scheduler.run()
+
+    assert heartbeats_seq == [now + 0.1]
+    assert seq == ["foo"]
+    assert scheduler.scheduler.timers[0][0] == now + 3600
+
+
+def run_policy(job, fire):
+    runs = []
+
+    async def task():
+        runs.append(True)
+        await asyncio.sleep(0.01)
+
+    Task(task, "task", job)
+
+    async def main():
+        async_scheduler = AsyncScheduler()
+        async_scheduler.register(job)
+        fire(async_scheduler)
+        await async_scheduler.join()
+        return async_scheduler
+
+    loop = asyncio.new_event_loop()
+    try:
+        async_scheduler = loop.run_until_complete(main())
+    finally:
+        loop.close()
+    return runs, async_scheduler
+
+
+def test_skip_if_running():
+    job = Job(max_instances=1)
+
+    def fire(async_scheduler):
+        async_scheduler._fire(job, 0)
+        async_scheduler._fire(job, 60)
+
+    runs, _ = run_policy(job, fire)
+    assert len(runs) == 1
+
+
+def test_queue_if_running():
+    job = Job(max_instances=1, skip_if_running=False)
+
+    def fire(async_scheduler):
+        async_scheduler._fire(job, 0)
+        async_scheduler._fire(job, 60)
+        async_scheduler._fire(job, 120)
+
+    runs, _ = run_policy(job, fire)
+    assert len(runs) == 2
+
+
+@pytest.mark.parametrize("coalesce, expected", [(True, 1), (False, 4)])
+def test_missed_runs(coalesce, expected):
+    job = Job(coalesce=coalesce)
+    job.every().minute.at(second=10)
+    fire_time = []
+
+    def fire(async_scheduler):
+        fire_time.append(async_scheduler.timers[0][0])
+        async_scheduler._run_due(fire_time[0] + 185)
+
+    runs, async_scheduler = run_policy(job, fire)
+    assert len(runs) == expected
+    assert async_scheduler.timers[0][0] == fire_time[0] + 240
+    assert job.last_fire_time == fire_time[0] + 180
+
+
+def test_jitter():
+    job = Job(jitter=5)
+    job.every().minute.at(second=10)
+    async_scheduler = AsyncScheduler()
+    async_scheduler.register(job)
+
+    start_time, _, fire_time, _ = async_scheduler.timers[0]
+    assert fire_time <= start_time <= fire_time + 5
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from scheduler import Job, Task
+from scheduler.clock import SYSTEM_CLOCK
+from scheduler.simulation import Simulation
+
+START = 1577836800.0  # 2020-01-01 00:00:00 UTC
+HOUR = 3600
+
+
+def make_job(name, minute, **kwargs):
+    job = Job(name, **kwargs)
+    job.every().hour.at(minute=minute)
+    Task(lambda: pytest.fail("tasks are not run in simulation"), "task", job)
+    return job
+
+
+def test_runs_and_collisions():
+    jobs = [make_job("a", 0), make_job("b", 0), make_job("c", 30)]
+
+    report = Simulation(jobs).run(START, seconds=2 * HOUR)
+
+    assert [(run.job.name, run.fire_time) for run in report.runs if run.job.name == "c"] == [
+        ("c", START + HOUR / 2), ("c", START + 3 * HOUR / 2)]
+    assert len(report.runs) == 6
+    assert list(report.collisions()) == [START + HOUR, START + 2 * HOUR]
+    assert sorted(job.name for job in report.collisions()[START + HOUR]) == ["a", "b"]
+
+
+def test_max_concurrency():
+    jobs = [make_job(f"job{i}", 0) for i in range(3)]
+
+    report = Simulation(jobs, duration=lambda job: 600).run(START, seconds=HOUR)
+
+    assert report.max_concurrency == 3
+    assert report.max_wait == 0
+    assert all(run.end - run.start == 600 for run in report.runs)
+
+
+def test_workers_limit():
+    jobs = [make_job(f"job{i}", 0) for i in range(3)]
+
+    report = Simulation(jobs, duration=lambda job: 600, workers=2).run(START, seconds=HOUR)
+
+    assert report.max_concurrency == 2
+    assert report.max_wait == 600
+
+
+def test_skipped_runs_of_long_job():
+    job = make_job("long", 0)
+
+    report = Simulation([job], duration=lambda job: 1.5 * HOUR).run(START, seconds=4 * HOUR)
+
+    assert [run.fire_time for run in report.runs] == [START + HOUR, START + 3 * HOUR]
+    assert report.skipped == [(job, START + 2 * HOUR), (job, START + 4 * HOUR)]
+
+
+def test_jobs_and_event_loop_are_restored():
+    job = make_job("job", 0)
+    job.last_run = 42
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        Simulation([job], duration=lambda job: 600).run(START, seconds=2 * HOUR)
+
+        assert asyncio.get_event_loop() is loop
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+    assert job.clock is SYSTEM_CLOCK
+    assert (job.instances, job.backlog, job.last_run, job.last_fire_time) == (0, 0, 42, None)
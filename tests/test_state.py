@@ -0,0 +1,190 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from scheduler import Job, Task
+from scheduler.state import SQLiteStateBackend
+from scheduler.task import FanOut, TaskFailedError
+
+
+@pytest.fixture
+def state(tmp_path):
+    yield SQLiteStateBackend(str(tmp_path / "state.db"))
+
+
+def make_job(state, seq, fail):
+    def extract():
+        seq.append("extract")
+
+    def transform():
+        seq.append("transform")
+
+    def load():
+        if fail:
+            raise Exception("TestException")
+        seq.append("load")
+
+    job = Job("etl", state=state)
+    extract_task = Task(extract, "extract", job, idempotent=True)
+    transform_task = Task(transform, "transform", job)
+    load_task = Task(load, "load", job, idempotent=True)
+    extract_task.set_upstream(transform_task)
+    transform_task.set_upstream(load_task)
+    return job
+
+
+def test_resume_failed_run(state):
+    seq = []
+    with pytest.raises(TaskFailedError):
+        make_job(state, seq, fail=True).run()
+    assert seq == ["extract", "transform"]
+
+    seq.clear()
+    make_job(state, seq, fail=False).run()
+    assert seq == ["transform", "load"]
+
+    seq.clear()
+    make_job(state, seq, fail=False).run()
+    assert seq == ["extract", "transform", "load"]
+
+
+def set_owner(state, run_id, owner):
+    with state._connection() as connection:
+        connection.execute("UPDATE runs SET owner = ? WHERE id = ?", (owner, run_id))
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", ""])
+    process.wait()
+    return process.pid
+
+
+def test_resume_interrupted_run(state):
+    run_state = state.begin_run("etl")
+    state.set_status(run_state.run_id, "extract", Task.COMPLETED)
+    state.set_status(run_state.run_id, "transform", Task.RUNNING)
+    set_owner(state, run_state.run_id, f"{state.host}:{dead_pid()}")
+
+    seq = []
+    make_job(state, seq, fail=False).run()
+    assert seq == ["transform", "load"]
+
+
+def test_run_of_live_process_is_not_taken_over(state):
+    run_state = state.begin_run("etl")
+    set_owner(state, run_state.run_id, f"{state.host}:{os.getppid()}")
+
+    assert state.begin_run("etl").resumed is False
+
+
+def test_run_of_other_host_is_taken_over_after_lease(state):
+    for job_name in ("fresh", "stale"):
+        run_state = state.begin_run(job_name)
+        state.set_status(run_state.run_id, "extract", Task.COMPLETED)
+        set_owner(state, run_state.run_id, "other-host:1")
+
+    assert state.begin_run("fresh").resumed is False
+    state.lease = 0
+    time.sleep(0.01)
+    assert state.begin_run("stale").resumed is True
+
+
+def test_finished_runs_are_pruned(tmp_path):
+    state = SQLiteStateBackend(str(tmp_path / "state.db"), keep_runs=2)
+    run_ids = []
+    for _ in range(4):
+        run_state = state.begin_run("etl")
+        state.set_status(run_state.run_id, "extract", Task.COMPLETED)
+        state.end_run(run_state.run_id, state.COMPLETED)
+        run_ids.append(run_state.run_id)
+
+    connection = state._connect()
+    assert [row[0] for row in connection.execute("SELECT id FROM runs ORDER BY id")] == run_ids[-2:]
+    assert connection.execute("SELECT COUNT(*) FROM task_states").fetchone()[0] == 2
+
+
+def test_running_run_is_not_resumed_by_its_process(state):
+    run_state = state.begin_run("etl")
+    state.set_status(run_state.run_id, "extract", Task.COMPLETED)
+
+    assert state.begin_run("etl").resumed is False
+
+
+def test_state_requires_job_name(state):
+    job = Job(state=state)
+    Task(lambda: None, "task", job)
+    with pytest.raises(ValueError):
+        job.run()
+
+
+def test_resume_passes_recorded_results(state):
+    calls = []
+
+    def make_job(fail):
+        def extract():
+            calls.append("extract")
+            return "recipes.json"
+
+        def load(path):
+            if fail:
+                raise Exception("TestException")
+            return path
+
+        job = Job("etl", state=state)
+        Task(extract, "extract", job, idempotent=True)
+        Task(load, "load", job, inputs=["extract"])
+        return job
+
+    with pytest.raises(TaskFailedError):
+        make_job(fail=True).run()
+
+    assert make_job(fail=False).run() == {"extract": "recipes.json", "load": "recipes.json"}
+    assert calls == ["extract"]
+
+
+def test_resume_fan_out(state):
+    calls = []
+
+    def make_job(fail):
+        def process(shard):
+            if fail and shard == "b":
+                raise Exception("TestException")
+            calls.append(shard)
+            return shard
+
+        job = Job("etl", state=state)
+        Task(lambda: ["a", "b"], "shards", job, idempotent=True)
+        FanOut(process, "process", job, inputs=["shards"], idempotent=True)
+        return job
+
+    with pytest.raises(TaskFailedError):
+        make_job(fail=True).run()
+
+    assert make_job(fail=False).run()["process"] == ["a", "b"]
+    assert calls == ["a", "b"]
+
+
+def test_resume_fan_out_with_changed_items(state):
+    calls = []
+
+    def make_job(items, fail):
+        def process(shard):
+            if fail and shard == "b":
+                raise Exception("TestException")
+            calls.append(shard)
+            return shard.upper()
+
+        job = Job("etl", state=state)
+        Task(lambda: items, "shards", job)
+        FanOut(process, "process", job, inputs=["shards"], idempotent=True)
+        return job
+
+    with pytest.raises(TaskFailedError):
+        make_job(["a", "b"], fail=True).run()
+
+    # the items task is run again and returns items in another order
+    assert make_job(["b", "a"], fail=False).run()["process"] == ["B", "A"]
+    assert calls == ["a", "b"]
@@ -1,7 +1,7 @@
 import pytest
 
 from scheduler import Task, Job
-from scheduler.task import TaskFailedError
+from scheduler.task import TaskFailedError, TaskRun
 
 
 def error_func():
@@ -21,3 +21,17 @@ def test_on_failed():
         task.run()
 
     assert len(failed_seq) == 1
+
+
+def test_run_coroutine():
+    seq = []
+
+    async def coroutine():
+        seq.append("coroutine")
+
+    job = Job()
+    task_run = TaskRun(Task(coroutine, "coroutine_task", job))
+    task_run.run()
+
+    assert seq == ["coroutine"]
+    assert task_run.completed is True
@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+pytest.importorskip("pyspark")
+
+from pyspark.sql import SparkSession  # noqa: E402
+
+from jobs.write_metrics import write_metrics  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def spark():
+    spark = SparkSession.builder.master("local[2]").appName(__name__).getOrCreate()
+    yield spark
+    spark.stop()
+
+
+def save(spark, df, path):
+    with write_metrics(spark, path) as metrics:
+        df.write.format("orc").save(path)
+    return metrics
+
+
+def test_rows_written(spark, tmp_path):
+    df = spark.range(1000).repartition(4).selectExpr("id", "cast(id as string) as name")
+    path = str(tmp_path / "out.orc")
+
+    metrics = save(spark, df, path)
+
+    assert metrics["rows"] == df.count()
+    assert metrics["bytes"] > 0
+    assert spark.read.format("orc").load(path).count() == 1000
+
+
+def test_concurrent_writes(spark, tmp_path):
+    frames = [spark.range(n).repartition(3) for n in (100, 2000)]
+    metrics = dict()
+
+    def write(i):
+        metrics[i] = save(spark, frames[i], str(tmp_path / f"out{i}.orc"))
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(len(frames))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(120)
+
+    assert [metrics[i]["rows"] for i in range(len(frames))] == [df.count() for df in frames]